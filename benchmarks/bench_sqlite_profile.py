@@ -0,0 +1,139 @@
+"""Multi-process read/write load on sqlite, with and without the pragmas.
+
+Reader and writer processes, like uwsgi workers, share a sqlite file for a
+while. Each profile starts from the same seeded file and prints the reads
+and writes per second, the slowest read and the failed operations:
+
+    python -m benchmarks.bench_sqlite_profile --readers 4 --writers 2 --seconds 10
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import sqlalchemy
+
+from sozluk.authorname import AuthorName
+from sozluk.entry import EntrySketch, EntryText
+from sozluk.storage.factory import open_storage
+from sozluk.topicname import TopicName
+
+PROFILES = {"defaults": "none", "tuned": ""}
+
+TOPICS = 200
+
+
+def sketch(topic: int, author: int, text: str) -> EntrySketch:
+    return EntrySketch(
+        topic=TopicName(f"baslik {topic}"),
+        author=AuthorName(f"yazar{author}"),
+        text=EntryText(text),
+    )
+
+
+def seed(path: Path, entries: int):
+    db = open_storage(f"sqlite:///{path}")
+    rng = random.Random(0)
+
+    for start in range(0, entries, 1000):
+        asyncio.run(
+            db.add_entries(
+                [
+                    sketch(rng.randrange(TOPICS), i % 100, f"tohum {i}")
+                    for i in range(start, min(start + 1000, entries))
+                ]
+            )
+        )
+
+    db.engine.dispose()
+
+
+def worker(url: str, pragmas: str, writer: int | None, seconds: float, results):
+    os.environ["SQLITE_PRAGMAS"] = pragmas
+    db = open_storage(url)
+    rng = random.Random(writer)
+    operations = failures = 0
+    slowest = 0.0
+
+    async def run():
+        nonlocal operations, failures, slowest
+        end = time.perf_counter() + seconds
+
+        while (start := time.perf_counter()) < end:
+            topic = rng.randrange(TOPICS)
+            try:
+                if writer is None:
+                    await db.get_topic_page(TopicName(f"baslik {topic}"))
+                else:
+                    text = f"girdi {writer} {operations}"
+                    await db.add_entry(sketch(topic, writer, text))
+            except sqlalchemy.exc.OperationalError:
+                failures += 1
+                continue
+
+            operations += 1
+            slowest = max(slowest, time.perf_counter() - start)
+
+    asyncio.run(run())
+    results.put((writer is None, operations, failures, slowest))
+
+
+def load(url: str, pragmas: str, readers: int, writers: int, seconds: float):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    roles = [None] * readers + list(range(writers))
+    processes = [
+        context.Process(target=worker, args=(url, pragmas, role, seconds, results))
+        for role in roles
+    ]
+
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    return outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--entries", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        seeded = Path(directory) / "seed.sqlite"
+        os.environ["SQLITE_PRAGMAS"] = "journal_mode=DELETE"
+        seed(seeded, args.entries)
+
+        for name, pragmas in PROFILES.items():
+            path = Path(directory) / f"{name}.sqlite"
+            shutil.copy(seeded, path)
+
+            outcomes = load(
+                f"sqlite:///{path}", pragmas, args.readers, args.writers, args.seconds
+            )
+
+            def total(reads: bool, field: int):
+                return sum(o[field] for o in outcomes if o[0] == reads)
+
+            slowest_read = max(o[3] for o in outcomes if o[0])
+            print(
+                f"{name}: {total(True, 1) / args.seconds:.0f} reads/s,"
+                f" {total(False, 1) / args.seconds:.0f} writes/s,"
+                f" slowest read {slowest_read * 1000:.0f}ms,"
+                f" {total(True, 2) + total(False, 2)} failed"
+            )
+
+
+if __name__ == "__main__":
+    main()
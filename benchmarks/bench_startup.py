@@ -0,0 +1,157 @@
+"""How long a worker takes to start, loading the app itself or forked.
+
+Prints the time to import sozluk.app, to create the app and to answer the
+first request, in a new interpreter. Then starts `--workers` workers the two
+ways uwsgi can: each importing and creating the app itself (--lazy-apps),
+or forked from a master that has done it once (the default), and prints
+how long it took until all of them had answered a request:
+
+    python -m benchmarks.bench_startup --workers 4 --repeat 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# run in a new interpreter, printing seconds to import, create and answer
+COLD_START = """
+import time
+
+started = time.perf_counter()
+from sozluk.app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+assert app.test_client().get("/").status_code == 200
+answered = time.perf_counter()
+
+print(imported - started, created - imported, answered - created)
+"""
+
+# run in a new interpreter, a master forking workers as uwsgi does
+MASTER = """
+import sys
+
+from benchmarks.bench_startup import fork_workers
+
+fork_workers(sys.argv[1], int(sys.argv[2]))
+"""
+
+
+def seed(path: Path) -> str:
+    # imported here, to keep them out of the interpreters started below
+    from sozluk.authorname import AuthorName
+    from sozluk.entry import EntrySketch, EntryText
+    from sozluk.storage.factory import open_storage
+    from sozluk.topicname import TopicName
+
+    url = f"sqlite:///{path}"
+    db = open_storage(url)
+    asyncio.run(
+        db.add_entries(
+            [
+                EntrySketch(
+                    topic=TopicName(f"baslik {i % 50}"),
+                    author=AuthorName(f"yazar{i % 20}"),
+                    text=EntryText(f"girdi {i}"),
+                )
+                for i in range(1000)
+            ]
+        )
+    )
+    db.engine.dispose()
+    return url
+
+
+def cold_start(url: str) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-c", COLD_START],
+        env={**os.environ, "DATABASE_URL": url},
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+
+
+def lazy_workers(url: str, workers: int) -> float:
+    """Seconds until `workers` interpreters have each loaded the app."""
+    started = time.perf_counter()
+
+    processes = [cold_start(url) for _ in range(workers)]
+    for process in processes:
+        process.communicate()
+
+    return time.perf_counter() - started
+
+
+def fork_workers(url: str, workers: int):
+    """Load the app, then fork `workers` that each answer a request."""
+    from sozluk.app import create_app
+
+    app = create_app(url)
+    children = []
+
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                response = app.test_client().get("/")
+                code = 0 if response.status_code == 200 else 1
+            finally:
+                os._exit(code)
+        children.append(pid)
+
+    for pid in children:
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+
+
+def forked_workers(url: str, workers: int) -> float:
+    """Seconds until a master has loaded the app and forked `workers` from it."""
+    started = time.perf_counter()
+
+    subprocess.run(
+        [sys.executable, "-c", MASTER, url, str(workers)],
+        env=os.environ,
+        check=True,
+    )
+
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["METRICS_DIR"] = str(Path(directory, "metrics"))
+        url = seed(Path(directory, "sozluk.sqlite"))
+
+        phases = [[], [], []]
+        for _ in range(args.repeat):
+            output, _ = cold_start(url).communicate()
+            for phase, seconds in zip(phases, output.split()):
+                phase.append(float(seconds))
+
+        for name, timings in zip(("import", "create_app", "first request"), phases):
+            print(f"{name:>16}: {statistics.median(timings) * 1000:8.1f}ms")
+
+        lazy = [lazy_workers(url, args.workers) for _ in range(args.repeat)]
+        forked = [forked_workers(url, args.workers) for _ in range(args.repeat)]
+
+        print(
+            f"{args.workers} workers ready, lazy: {statistics.median(lazy):.2f}s,"
+            f" forked: {statistics.median(forked):.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Mixed read/write throughput of the inline and the threaded storage backends.
+
+Runs the same workload of concurrent coroutines against both backends, each on
+a fresh sqlite file, and prints the achieved operations per second together
+with the longest time the event loop was blocked:
+
+    python -m benchmarks.bench_storage_concurrency --operations 2000
+"""
+
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from sozluk.authorname import AuthorName
+from sozluk.entry import EntrySketch, EntryText
+from sozluk.storage.factory import open_storage
+from sozluk.topicname import TopicName
+
+
+async def workload(db, operations: int, concurrency: int, write_ratio: float):
+    rng = random.Random(0)
+    topics = [TopicName(f"baslik {i}") for i in range(50)]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    for i, topic in enumerate(topics):
+        await db.add_entry(
+            EntrySketch(
+                topic=topic, author=AuthorName("tohum"), text=EntryText(f"tohum {i}")
+            )
+        )
+
+    async def operation(i: int):
+        async with semaphore:
+            topic = rng.choice(topics)
+            if rng.random() < write_ratio:
+                await db.add_entry(
+                    EntrySketch(
+                        topic=topic,
+                        author=AuthorName(f"yazar{i % 20}"),
+                        text=EntryText(f"girdi {i}"),
+                    )
+                )
+            else:
+                await db.get_topic(topic)
+
+    worst_lag = 0.0
+    done = asyncio.Event()
+
+    async def probe():
+        nonlocal worst_lag
+        while not done.is_set():
+            before = time.perf_counter()
+            await asyncio.sleep(0.001)
+            worst_lag = max(worst_lag, time.perf_counter() - before - 0.001)
+
+    probe_task = asyncio.create_task(probe())
+    start = time.perf_counter()
+    await asyncio.gather(*(operation(i) for i in range(operations)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await probe_task
+
+    return elapsed, worst_lag
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--operations", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, scheme in (("inline", "sqlite"), ("threaded", "threaded+sqlite")):
+            db = open_storage(f"{scheme}:///{Path(directory) / name}.sqlite")
+            elapsed, worst_lag = asyncio.run(
+                workload(db, args.operations, args.concurrency, args.write_ratio)
+            )
+            print(
+                f"{name:>8}: {args.operations} operations in {elapsed:.2f}s"
+                f" ({args.operations / elapsed:.0f} ops/s),"
+                f" event loop blocked for up to {worst_lag * 1000:.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
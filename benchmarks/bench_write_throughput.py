@@ -0,0 +1,63 @@
+"""Sequential add_entry throughput on a fresh sqlite file.
+
+A third of the entries open a new topic and every author writes a few
+entries, so topic and author creation are part of the measured path:
+
+    python -m benchmarks.bench_write_throughput --entries 2000
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+import sqlalchemy
+
+from sozluk.authorname import AuthorName
+from sozluk.entry import EntrySketch, EntryText
+from sozluk.storage.factory import open_storage
+from sozluk.topicname import TopicName
+
+
+async def workload(db, entries: int):
+    start = time.perf_counter()
+
+    for i in range(entries):
+        await db.add_entry(
+            EntrySketch(
+                topic=TopicName(f"baslik {i // 3}"),
+                author=AuthorName(f"yazar{i // 5}"),
+                text=EntryText(f"girdi {i}"),
+            )
+        )
+
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = open_storage(f"sqlite:///{Path(directory) / 'sozluk.sqlite'}")
+
+        statements = 0
+
+        @sqlalchemy.event.listens_for(db.engine, "before_cursor_execute")
+        def count(*args):
+            nonlocal statements
+            statements += 1
+
+        elapsed = asyncio.run(workload(db, args.entries))
+
+    print(
+        f"{args.entries} entries in {elapsed:.2f}s"
+        f" ({args.entries / elapsed:.0f} entries/s,"
+        f" {statements / args.entries:.1f} statements per entry)"
+    )
+
+
+if __name__ == "__main__":
+    main()
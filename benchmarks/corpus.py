@@ -0,0 +1,102 @@
+"""A deterministic, made-up sozluk to benchmark against.
+
+Topic popularity follows a zipf-like curve, so a few topics hold most of the
+entries like on a real sozluk. Entry texts are a few sentences of common
+words with "(bkz: ...)" and backtick references to other topics, entries and
+authors sprinkled in.
+"""
+
+import itertools
+import random
+from typing import Iterator
+
+from sozluk.authorname import AuthorName
+from sozluk.entry import EntrySketch, EntryText
+from sozluk.topicname import TopicName
+
+WORDS = (
+    "ve bir bu da de için çok ama gibi daha ne var yok ben sen o biz siz onlar"
+    " şey zaman gün yıl insan hayat dünya ev iş okul su çay kahve kedi köpek"
+    " kitap film müzik oyun şehir istanbul ankara izmir deniz yol araba otobüs"
+    " güzel kötü büyük küçük yeni eski iyi uzun kısa sıcak soğuk zor kolay"
+    " gelmek gitmek yapmak etmek olmak demek bilmek görmek sevmek istemek"
+    " düşünmek okumak yazmak içmek yemek uyumak çalışmak konuşmak anlamak"
+    " sabah akşam gece hafta ay bugün yarın dün şimdi sonra önce hep hiç"
+    " galiba belki aslında herhalde sanırım kesinlikle maalesef neyse işte"
+).split()
+
+# a topic's share of the entries goes down with its rank to this power
+POPULARITY_SKEW = 1.1
+
+
+class Corpus:
+    def __init__(self, entries: int, seed: int = 0):
+        self.entries = entries
+        self.rng = random.Random(seed)
+
+        self.topics = [
+            TopicName(name) for name in self._names(max(entries // 10, 10), 4, " ")
+        ]
+        self.authors = [
+            AuthorName(name) for name in self._names(max(entries // 50, 10), 2, "")
+        ]
+
+        self.topic_weights = list(
+            itertools.accumulate(
+                1 / rank**POPULARITY_SKEW for rank in range(1, len(self.topics) + 1)
+            )
+        )
+        self.author_weights = list(
+            itertools.accumulate(1 / rank for rank in range(1, len(self.authors) + 1))
+        )
+
+    def _names(self, count: int, longest: int, separator: str) -> list[str]:
+        names = {}
+        number = itertools.count(1)
+
+        while len(names) < count:
+            words = self.rng.sample(WORDS, self.rng.randint(1, longest))
+            name = separator.join(words)[:40]
+            if len(name) < 3 or name in names:
+                # keep names unique and searchable with trigrams
+                name = f"{name}{separator}{next(number)}"[:40].strip()
+            names[name] = None
+
+        return list(names)
+
+    def popular_topic(self, rank: int = 0) -> TopicName:
+        return self.topics[rank]
+
+    def popular_author(self, rank: int = 0) -> AuthorName:
+        return self.authors[rank]
+
+    def text(self, entry_number: int) -> EntryText:
+        rng = self.rng
+        words = []
+
+        for _ in range(rng.randint(1, 4)):
+            words.extend(rng.choices(WORDS, k=rng.randint(4, 20)))
+            words[-1] += rng.choice((".", ".", ".", "?", "!", "..."))
+
+            match rng.random():
+                case chance if chance < 0.25:
+                    words.append(f"(bkz: {rng.choice(self.topics)})")
+                case chance if chance < 0.35:
+                    words.append(f"`{rng.choice(self.topics)}`")
+                case chance if chance < 0.40 and entry_number > 1:
+                    words.append(f"(bkz: #{rng.randint(1, entry_number - 1)})")
+                case chance if chance < 0.45:
+                    words.append(f"(bkz: @{rng.choice(self.authors)})")
+
+        # a number keeps definitions of a popular topic unique
+        words.append(f"({entry_number})")
+        return EntryText(" ".join(words))
+
+    def __iter__(self) -> Iterator[EntrySketch]:
+        rng = self.rng
+
+        for number in range(1, self.entries + 1):
+            (topic,) = rng.choices(self.topics, cum_weights=self.topic_weights)
+            (author,) = rng.choices(self.authors, cum_weights=self.author_weights)
+
+            yield EntrySketch(topic=topic, author=author, text=self.text(number))
@@ -0,0 +1,273 @@
+"""Time every storage method, entry rendering and page renders on a corpus.
+
+For each corpus size a fresh sqlite file is filled from benchmarks.corpus,
+then every measurement is repeated and summarised. Results are written as
+json, and compared with an earlier run when a baseline is given:
+
+    python -m benchmarks.suite --sizes 10000 100000 --output results.json
+    python -m benchmarks.suite --sizes 10000 --baseline results.json
+
+Without --sizes the corpus holds 10k, 100k and 1M entries. The larger two
+take a while to generate.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import sqlalchemy
+
+from benchmarks.corpus import Corpus
+from sozluk.app import create_app
+from sozluk.entry import EntryID, EntrySketch, EntryText
+from sozluk.storage import SozlukStorage
+from sozluk.storage.factory import open_storage
+
+SIZES = (10_000, 100_000, 1_000_000)
+
+REPEAT = 50
+
+CHUNK_SIZE = 1000
+
+
+def summary(name: str, size: int, timings: list[float]) -> dict:
+    timings = sorted(timings)
+    return {
+        "name": name,
+        "size": size,
+        "runs": len(timings),
+        "median_ms": statistics.median(timings) * 1000,
+        "p90_ms": timings[int(len(timings) * 0.9)] * 1000,
+        "min_ms": timings[0] * 1000,
+    }
+
+
+def measure(function: Callable[[], object], repeat: int) -> list[float]:
+    timings = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+async def measure_async(
+    function: Callable[[], Awaitable[object]], repeat: int
+) -> list[float]:
+    timings = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await function()
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def fill(db: SozlukStorage, corpus: Corpus):
+    entries = iter(corpus)
+    start = time.perf_counter()
+
+    while chunk := list(itertools.islice(entries, CHUNK_SIZE)):
+        asyncio.run(db.add_entries(chunk))
+
+    return time.perf_counter() - start
+
+
+def storage_benchmarks(db: SozlukStorage, corpus: Corpus) -> dict[str, Callable]:
+    """A call of each storage method, keyed by its name."""
+    topic = corpus.popular_topic()
+    rare_topic = corpus.topics[-1]
+    author = corpus.popular_author()
+    middle = EntryID(corpus.entries // 2)
+    new_ids: list[EntryID] = []
+    written = itertools.count()
+
+    def new_entry() -> EntrySketch:
+        return EntrySketch(
+            topic=topic,
+            author=author,
+            text=EntryText(f"olcum girdisi {next(written)}"),
+        )
+
+    async def add_entry():
+        new_ids.append((await db.add_entry(new_entry()))[1])
+
+    async def add_entries():
+        responses = await db.add_entries([new_entry() for _ in range(10)])
+        new_ids.extend(entry_id for _, entry_id in responses)
+
+    async def del_entry():
+        await db.del_entry(new_ids.pop())
+
+    return {
+        "get_entry": lambda: db.get_entry(middle),
+        "get_entries": lambda: db.get_entries(after=middle, limit=1000),
+        "get_first_entry": db.get_first_entry,
+        "get_last_entry": db.get_last_entry,
+        "get_topic": lambda: db.get_topic(rare_topic),
+        "get_author": lambda: db.get_author(corpus.authors[-1]),
+        "get_topic_page": lambda: db.get_topic_page(topic, after=middle),
+        "get_author_page": lambda: db.get_author_page(author, before=middle),
+        "get_topic_version": lambda: db.get_topic_version(topic),
+        "get_author_version": lambda: db.get_author_version(author),
+        "get_entries_version": db.get_entries_version,
+        "get_data_version": db.get_data_version,
+        "topic_search_basic": lambda: db.topic_search_basic("ist", limit=50),
+        "get_latest_authors": lambda: db.get_latest_authors(limit=10),
+        "get_latest_topics": lambda: db.get_latest_topics(limit=10),
+        "get_random_entries": lambda: db.get_random_entries(limit=10),
+        "author_count": lambda: db.author_count,
+        "topic_count": lambda: db.topic_count,
+        "entry_count": lambda: db.entry_count,
+        "add_entry": add_entry,
+        "add_entries": add_entries,
+        # runs after the adds, deleting what they added
+        "del_entry": del_entry,
+    }
+
+
+def page_urls(corpus: Corpus, last_entry_id: int) -> dict[str, str]:
+    topic = corpus.popular_topic()
+    return {
+        "index": "/",
+        "topic": f"/topic/{topic}",
+        "topic_middle": f"/topic/{topic}?after={last_entry_id // 2}",
+        "author": f"/author/{corpus.popular_author()}",
+        "entry": f"/entry/{last_entry_id // 2}",
+        "topics": "/topics",
+        "authors": "/authors",
+        "search": "/search?query=ist",
+        "random": "/random",
+        "stats": "/stats",
+    }
+
+
+def run_size(size: int, directory: Path, repeat: int) -> list[dict]:
+    results = []
+    corpus = Corpus(size)
+    url = f"sqlite:///{directory / f'sozluk-{size}.sqlite'}"
+    db = open_storage(url)
+
+    elapsed = fill(db, corpus)
+    results.append(summary("fill.add_entries", size, [elapsed / size * CHUNK_SIZE]))
+    print(f"{size} entries filled in {elapsed:.1f}s", file=sys.stderr)
+
+    benchmarks = storage_benchmarks(db, corpus)
+    missing = SozlukStorage.__abstractmethods__ - benchmarks.keys()
+    if missing:
+        raise NotImplementedError(f"no benchmark for {sorted(missing)}")
+
+    async def run_storage():
+        for name, call in benchmarks.items():
+            timings = await measure_async(call, repeat)
+            results.append(summary(f"storage.{name}", size, timings))
+
+    asyncio.run(run_storage())
+
+    texts = [entry.text for entry in asyncio.run(db.get_entries(limit=repeat))]
+    rendered = itertools.cycle(texts)
+
+    def render():
+        next(rendered).render("/topic/", "/entry/", "/author/")
+
+    EntryText.render.cache_clear()
+    results.append(summary("render.cold", size, measure(render, len(texts))))
+    results.append(summary("render.warm", size, measure(render, repeat)))
+
+    app = create_app(url)
+    client = app.test_client()
+    last_entry_id = asyncio.run(db.get_last_entry()).identifier.value
+
+    for name, url in page_urls(corpus, last_entry_id).items():
+
+        def get():
+            response = client.get(url)
+            assert response.status_code == 200, (url, response.status_code)
+
+        results.append(summary(f"page.{name}", size, measure(get, repeat)))
+
+    db.engine.dispose()
+    app.extensions["sozluk"].db.engine.dispose()
+    return results
+
+
+def compare(results: list[dict], baseline: list[dict], threshold: float) -> int:
+    """Print how results changed against a baseline, counting regressions."""
+    before = {(result["name"], result["size"]): result for result in baseline}
+    regressions = 0
+
+    for result in results:
+        old = before.get((result["name"], result["size"]))
+        if old is None:
+            continue
+
+        ratio = result["median_ms"] / old["median_ms"] if old["median_ms"] else 1
+        flag = ""
+        if ratio > threshold:
+            flag = "  <- slower"
+            regressions += 1
+
+        print(
+            f"{result['size']:>8} {result['name']:<32}"
+            f" {old['median_ms']:9.3f}ms -> {result['median_ms']:9.3f}ms"
+            f" ({ratio:.2f}x){flag}"
+        )
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--output", type=Path, help="json file to write")
+    parser.add_argument("--baseline", type=Path, help="json file of an earlier run")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="median ratio over the baseline counted as a regression",
+    )
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            results.extend(run_size(size, Path(directory), args.repeat))
+
+    report = {
+        "python": platform.python_version(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "machine": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "results": results,
+    }
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())["results"]
+        regressions = compare(results, baseline, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    for result in results:
+        print(
+            f"{result['size']:>8} {result['name']:<32}"
+            f" median {result['median_ms']:9.3f}ms  p90 {result['p90_ms']:9.3f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,4 +2,7 @@
 
 set -e
 
-exec .venv/bin/uwsgi -w sozluk.app:app --http 0.0.0.0:8080 --master -p $((${THREADS:-$(nproc)}))
\ No newline at end of file
+.venv/bin/python -m sozluk.migrate
+
+# the app is loaded once in the master, which forks the workers from it
+exec .venv/bin/uwsgi -w sozluk.wsgi:app --http 0.0.0.0:8080 --master --enable-threads -p $((${THREADS:-$(nproc)}))
@@ -1,28 +1,58 @@
+import dataclasses
+import functools
+import io
 import logging
-from datetime import timedelta
+import tempfile
+from datetime import UTC, timedelta
 from http import HTTPStatus
 from os import getenv, urandom
+from pathlib import Path
 
-import psutil
 from flask import (
+    Blueprint,
     Flask,
+    Response,
     abort,
+    current_app,
     flash,
+    make_response,
     redirect,
     render_template,
     request,
     send_from_directory,
     session,
+    stream_with_context,
     url_for,
 )
 from flask_wtf import CSRFProtect
-from sqlalchemy import create_engine
+from werkzeug.local import LocalProxy
 
 from sozluk.authorname import AuthorName
+from sozluk.bulk import (
+    RecordFormatError,
+    add_records,
+    parse_text_record,
+    read_ndjson,
+    read_text_records,
+)
+from sozluk.conditionalget import not_modified, page_etag, with_validators
 from sozluk.entry import EntryID, EntrySketch, EntryText
+from sozluk.export import FORMATS as EXPORT_FORMATS
+from sozluk.export import read_entries
 from sozluk.forms import EntryForm, FocusForm, NukeEntryForm, SearchForm, ThemeForm
-from sozluk.storage import EntryAddResponse, EntryDeleteResponse
-from sozluk.storage.sqlalchemydatabase import SQLAlchemyDatabase
+from sozluk.metrics import (
+    CACHE_HITS,
+    CACHE_MISSES,
+    Metrics,
+    instrument_app,
+    instrument_engine,
+)
+from sozluk.profiling import Profiler, profile_app
+from sozluk.querybudget import query_budget, watch_queries
+from sozluk.randomentrypool import RandomEntryPool
+from sozluk.storage import EntryAddResponse, EntryDeleteResponse, SozlukStorage
+from sozluk.storage.cachingstorage import DEFAULT_TTL, CachingStorage
+from sozluk.storage.factory import open_storage
 from sozluk.themes import DEFAULT_THEME, THEMES
 from sozluk.topicname import TopicName
 from sozluk.turkishlowercasedstring import TurkishLowercasedString
@@ -30,25 +60,132 @@ from sozluk.turkishlowercasedstring import TurkishLowercasedString
 DEBUG = bool(getenv("DEBUG"))
 
 logging.basicConfig(level=logging.DEBUG if DEBUG else logging.INFO)
+logger = logging.getLogger(__name__)
 
 timezone = timedelta(hours=3)
 
 BUILD_COMMIT = getenv("VCS_TAG", "")
 
-url = getenv("DATABASE_URL", "sqlite:///sozluk.sqlite")
-engine = create_engine(url, echo=DEBUG)
-db = SQLAlchemyDatabase(engine)
+# views of the site, registered on every app that create_app() makes
+views = Blueprint("sozluk", __name__)
+
+csrf = CSRFProtect()
+
+
+@dataclasses.dataclass
+class Site:
+    """What the views of an app share."""
+
+    db: SozlukStorage
+    random_pool: RandomEntryPool | None = None
+
+    @functools.cached_property
+    def host_metrics(self):
+        # only /stats needs psutil
+        from sozluk.hostmetrics import HostMetricsSampler
+
+        return HostMetricsSampler(period=float(getenv("HOST_METRICS_PERIOD", "5")))
+
+
+def site() -> Site:
+    return current_app.extensions["sozluk"]
+
+
+db: SozlukStorage = LocalProxy(lambda: site().db)
+random_pool: RandomEntryPool | None = LocalProxy(lambda: site().random_pool)
+
+
+def create_app(database_url: str | None = None) -> Flask:
+    """Make the app, serving DATABASE_URL unless a database url is given.
+
+    The schema is left to sozluk.migrate, except with DEBUG, so that `flask
+    run` works on a new checkout. Loaded once in a uwsgi master, the app is
+    shared by the workers it forks: each of them opens its own database
+    connections, see create_storage_engine.
+    """
+    if database_url is None:
+        database_url = getenv("DATABASE_URL", "sqlite:///sozluk.sqlite")
+
+    storage = open_storage(database_url, echo=DEBUG, migrate=DEBUG)
+    engine = storage.engine
+    instrument_engine(engine)
+
+    cache_size = int(getenv("CACHE_SIZE", "0"))
+    if cache_size:
+        storage = CachingStorage(
+            storage, size=cache_size, ttl=float(getenv("CACHE_TTL", DEFAULT_TTL))
+        )
+
+    random_pool_size = int(getenv("RANDOM_POOL_SIZE", "0"))
+    pool = (
+        RandomEntryPool(
+            storage,
+            size=random_pool_size,
+            period=float(getenv("RANDOM_POOL_PERIOD", "60")),
+        )
+        if random_pool_size
+        else None
+    )
+
+    app = Flask(__name__)
+    app.extensions["sozluk"] = Site(db=storage, random_pool=pool)
+
+    app.config["SEND_FILE_MAX_AGE_DEFAULT"] = timedelta(hours=3).seconds
+
+    app.secret_key = getenv("SECRET_KEY", urandom(32).hex())
+    csrf.init_app(app)
 
-app = Flask(__name__)
+    # the workers of a uwsgi master share a directory to add up their metrics
+    metrics = Metrics(
+        directory=Path(
+            getenv("METRICS_DIR", Path(tempfile.gettempdir(), "sozluk-metrics"))
+        ),
+        period=float(getenv("METRICS_PERIOD", "5")),
+    )
+    instrument_app(app, metrics)
+
+    @metrics.add_collector
+    def collect_cache_counts(metrics: Metrics):
+        if isinstance(storage, CachingStorage):
+            for kind, hits in storage.hits.items():
+                metrics.set(CACHE_HITS, {"kind": kind}, hits)
+            for kind, misses in storage.misses.items():
+                metrics.set(CACHE_MISSES, {"kind": kind}, misses)
+
+    # off unless PROFILE_RATE or PROFILE_SLOWER_THAN is set, or a request
+    # carries a signed profile header
+    profile_slower_than = getenv("PROFILE_SLOWER_THAN")
+    profiler = Profiler(
+        directory=Path(
+            getenv("PROFILE_DIR", Path(tempfile.gettempdir(), "sozluk-profiles"))
+        ),
+        rate=float(getenv("PROFILE_RATE", "0")),
+        slower_than=float(profile_slower_than) if profile_slower_than else None,
+        interval=float(getenv("PROFILE_INTERVAL", "0.005")),
+        keep=int(getenv("PROFILE_KEEP", "100")),
+    )
+    profile_app(app, profiler)
+
+    app.before_request(revalidate_cache)
+
+    # registered after the revalidation above, so that the statements of a
+    # request are counted from its view on, against the budgets of the views
+    if DEBUG:
+        watch_queries(app, engine)
 
-app.config["SEND_FILE_MAX_AGE_DEFAULT"] = timedelta(hours=3).seconds
+    app.context_processor(inject_constants)
+    app.register_error_handler(404, error404)
 
+    app.register_blueprint(views)
 
-app.secret_key = getenv("SECRET_KEY", urandom(32).hex())
-csrf = CSRFProtect(app)
+    return app
+
+
+async def revalidate_cache():
+    if isinstance(db, CachingStorage):
+        await db.revalidate()
 
 
-@app.context_processor
 def inject_constants():
     return dict(
         app_name="sozluk",
@@ -59,17 +196,29 @@ def inject_constants():
     )
 
 
-@app.errorhandler(404)
+def page_cursor() -> tuple[EntryID | None, EntryID | None]:
+    """Read the entry cursor of a paginated page from the query string."""
+    before = request.args.get("before")
+    after = request.args.get("after")
+
+    return (
+        EntryID(int(before)) if before is not None else None,
+        EntryID(int(after)) if after is not None else None,
+    )
+
+
 async def error404(error):
     return render_template("404.html"), 404
 
 
-@app.route("/robots.txt")
+@views.route("/robots.txt")
+@query_budget(0)
 async def robots():
-    return send_from_directory(app.static_folder, "robots.txt")
+    return send_from_directory(current_app.static_folder, "robots.txt")
 
 
-@app.route("/")
+@views.route("/")
+@query_budget(0)
 async def index():
     return render_template(
         "index.html",
@@ -78,13 +227,14 @@ async def index():
     )
 
 
-@app.route("/add_entry", methods=["POST"])
+@views.route("/add_entry", methods=["POST"])
+@query_budget(9)
 async def add_entry():
     entry_form = EntryForm()
     if not entry_form.validate_on_submit():
         for _, error in entry_form.errors.items():
             flash(" ".join(error))
-        return redirect(url_for("index"))
+        return redirect(url_for("sozluk.index"))
 
     try:
         sketch = EntrySketch(
@@ -94,40 +244,43 @@ async def add_entry():
         )
     except ValueError:
         flash("bir seyleri yanlis yapmis olmalisin")
-        return redirect(url_for("index"))
+        return redirect(url_for("sozluk.index"))
 
     result, entry_id = await db.add_entry(sketch)
 
     match result:
         case EntryAddResponse.SUCCESS:
             flash("tebrikler! artik girdin yayinda.")
-            return redirect(url_for("entry", entry_id=entry_id.value))
+            return redirect(url_for("sozluk.entry", entry_id=entry_id.value))
         case EntryAddResponse.DEFINITION_EXISTS:
             flash("bu tanim zaten var.")
-            return redirect(url_for("topic", name=sketch.topic))
+            return redirect(url_for("sozluk.topic", name=sketch.topic))
         case something:
             raise NotImplementedError(something)
 
 
-@app.route("/del_entry", methods=["POST"])
+@views.route("/del_entry", methods=["POST"])
+@query_budget(12)
 async def del_entry():
     form = NukeEntryForm()
     if not form.validate_on_submit():
         for _, error in form.errors.items():
             flash(" ".join(error))
-        return redirect(url_for("index"))
+        return redirect(url_for("sozluk.index"))
     try:
         entry_id = EntryID(form.entry_id.data)
     except ValueError:
         flash("bir seyler ters gitti, silemedim.")
-        return redirect(url_for("index"))
+        return redirect(url_for("sozluk.index"))
 
     result = await db.del_entry(entry_id)
 
     match result:
         case EntryDeleteResponse.SUCCESS:
+            if random_pool:
+                random_pool.discard(entry_id)
             flash("artik yok.")
-            return redirect(url_for("index"))
+            return redirect(url_for("sozluk.index"))
         case EntryDeleteResponse.ENTRY_NOT_FOUND:
             flash("boyle bir girdi zaten yokmus, silmeme gerek kalmadi sanirim.")
             abort(404)
@@ -135,25 +288,38 @@ async def del_entry():
             raise NotImplementedError(something)
 
 
-@app.route("/entry/<entry_id>")
+@views.route("/entry/<entry_id>")
+@query_budget(1)
 async def entry(entry_id: str):
     try:
         entry_id = EntryID(int(entry_id))
     except ValueError:
         flash("boyle bir girdi numarasi olamaz ki")
-        return redirect(url_for("index"))
+        return redirect(url_for("sozluk.index"))
 
     target = await db.get_entry(entry_id)
 
     if not target:
         abort(404)
 
-    return render_template(
-        "entry.html", entry=target, risk=NukeEntryForm(), timezone=timezone
+    etag = page_etag("entry", entry_id.value)
+    last_modified = target.utc_time.replace(tzinfo=UTC)
+    if response := not_modified(etag, last_modified):
+        return response
+
+    return with_validators(
+        make_response(
+            render_template(
+                "entry.html", entry=target, risk=NukeEntryForm(), timezone=timezone
+            )
+        ),
+        etag,
+        last_modified,
     )
 
 
-@app.route("/topic/<name>")
+@views.route("/topic/<name>")
+@query_budget(5)
 async def topic(name):
     try:
         topic_name = TopicName(name)
@@ -161,17 +327,47 @@ async def topic(name):
         flash("baslik ismi kotu. boyle baslik olmaz olsun.")
         abort(404)
 
-    entries = await db.get_topic(topic_name)
+    try:
+        before, after = page_cursor()
+    except ValueError:
+        flash("kotu sayfa")
+        return redirect(url_for("sozluk.topic", name=topic_name))
+
+    version = await db.get_topic_version(topic_name)
+    etag = page_etag("topic", version)
+    if response := not_modified(etag, version.last_modified):
+        return response
+
+    entries_per_page = 25
+
+    page = await db.get_topic_page(
+        topic_name, before=before, after=after, limit=entries_per_page
+    )
+
+    if not page.entries and (before or after):
+        flash("cok gittin")
+        return redirect(url_for("sozluk.topic", name=topic_name))
 
     # do not throw 404 even if there are no entries.
     # since page shows an entry input field.
 
-    return render_template(
-        "topic.html", entries=entries, entry_form=EntryForm(), topic_name=topic_name
+    return with_validators(
+        make_response(
+            render_template(
+                "topic.html",
+                entries=page.entries,
+                page=page,
+                entry_form=EntryForm(),
+                topic_name=topic_name,
+            )
+        ),
+        etag,
+        version.last_modified,
     )
 
 
-@app.route("/author/<name>")
+@views.route("/author/<name>")
+@query_budget(5)
 async def author(name):
     try:
         author_name = AuthorName(name)
@@ -179,35 +375,45 @@ async def author(name):
         flash("yazar ismi cok kotu. boyle isim olmaz olsun")
         abort(404)
 
-    entries = await db.get_author(author_name)
+    try:
+        before, after = page_cursor()
+    except ValueError:
+        flash("kotu sayfa")
+        return redirect(url_for("sozluk.author", name=author_name))
 
-    if not entries:
-        abort(404)
+    version = await db.get_author_version(author_name)
+    etag = page_etag("author", version)
+    if response := not_modified(etag, version.last_modified):
+        return response
 
-    return render_template("author.html", entries=entries, author=author_name)
+    entries_per_page = 25
 
+    page = await db.get_author_page(
+        author_name, before=before, after=after, limit=entries_per_page
+    )
 
-@app.route("/stats")
-async def stats():
-    topic_list = await db.get_latest_topics()
-    if not topic_list:
-        first_entry = None
-        last_entry = None
-    else:
-        first_topic = topic_list[-1]
-        first_entry = (await db.get_topic(first_topic))[0]
+    if not page.entries:
+        if before or after:
+            flash("cok gittin")
+            return redirect(url_for("sozluk.author", name=author_name))
+        abort(404)
 
-        last_topic = topic_list[0]
-        last_entry = (await db.get_topic(last_topic))[-1]
+    return with_validators(
+        make_response(
+            render_template(
+                "author.html", entries=page.entries, page=page, author=author_name
+            )
+        ),
+        etag,
+        version.last_modified,
+    )
 
-    cpu_percentage = psutil.cpu_percent(interval=0.2)
-    cpu_count = psutil.cpu_count()
 
-    mem = psutil.virtual_memory()
-    ram_total_megabytes = int(mem.total / 1024 / 1024)
-    ram_used_megabytes = ram_total_megabytes - int(mem.available / 1024 / 1024)
-    ram_percentage = mem.percent
-    load_average = psutil.getloadavg()
+@views.route("/stats")
+@query_budget(5)
+async def stats():
+    first_entry = await db.get_first_entry()
+    last_entry = await db.get_last_entry()
 
     total_entry_count = db.entry_count
     total_topic_count = db.topic_count
@@ -219,33 +425,37 @@ async def stats():
         total_entry_count=await total_entry_count,
         total_topic_count=await total_topic_count,
         total_author_count=await total_author_count,
-        cpu_percentage=cpu_percentage,
-        cpu_count=cpu_count,
-        ram_total_megabytes=ram_total_megabytes,
-        ram_used_megabytes=ram_used_megabytes,
-        ram_percentage=ram_percentage,
-        load_average=load_average,
+        host=site().host_metrics.get(),
+        cache=db if isinstance(db, CachingStorage) else None,
     )
 
 
-@app.route("/theemoji")
+@views.route("/theemoji")
+@query_budget(0)
 async def theemoji():
     return render_template("theemoji.html")
 
 
-@app.route("/about")
+@views.route("/about")
+@query_budget(0)
 async def about():
     return render_template("about.html")
 
 
-@app.route("/random")
+@views.route("/random")
+# RANDOM_SAMPLE_ROUNDS draws of ids at worst, none with a random pool
+@query_budget(8)
 async def random():
-    random_entries = db.get_random_entries(limit=10)
+    if random_pool:
+        random_entries = random_pool.sample(limit=10)
+    else:
+        random_entries = db.get_random_entries(limit=10)
 
     return render_template("random.html", random_entries=await random_entries)
 
 
-@app.route("/search")
+@views.route("/search")
+@query_budget(1)
 async def search():
     form = SearchForm(request.args)
 
@@ -255,25 +465,49 @@ async def search():
     if not form.validate():
         for _, error in form.errors.items():
             flash(" ".join(error))
-        return redirect(url_for("index"))
+        return redirect(url_for("sozluk.index"))
 
     query = TurkishLowercasedString(form.query.data)
 
-    results = db.topic_search_basic(query)
+    page = request.args.get("page", "1")
+
+    try:
+        page = int(page)
+    except ValueError:
+        flash("kotu sayfa")
+        return redirect(url_for("sozluk.search", query=query))
+
+    if page <= 0:
+        flash("kucuk sayfa. seni gidi seni!")
+        return redirect(url_for("sozluk.search", query=query))
+
+    results_per_page = 50
+
+    # one more than needed, to see if there is a next page
+    results = await db.topic_search_basic(
+        query, offset=(page - 1) * results_per_page, limit=results_per_page + 1
+    )
 
     return render_template(
-        "search.html", result_topics=await results, query=query, search_form=form
+        "search.html",
+        result_topics=results[:results_per_page],
+        has_next_page=len(results) > results_per_page,
+        page=page,
+        query=query,
+        search_form=form,
     )
 
 
-@app.route("/authors")
+@views.route("/authors")
+@query_budget(1)
 async def authors():
     latest_authors = db.get_latest_authors(limit=None)
 
     return render_template("authors.html", authors=await latest_authors)
 
 
-@app.route("/topics")
+@views.route("/topics")
+@query_budget(4)
 async def topics():
     page = request.args.get("page", "1")
 
@@ -281,11 +515,16 @@ async def topics():
         page = int(page)
     except ValueError:
         flash("kotu sayfa")
-        return redirect(url_for("topics"))
+        return redirect(url_for("sozluk.topics"))
 
     if page <= 0:
         flash("kucuk sayfa. seni gidi seni!")
-        return redirect(url_for("topics"))
+        return redirect(url_for("sozluk.topics"))
+
+    version = await db.get_entries_version()
+    etag = page_etag("topics", version)
+    if response := not_modified(etag, version.last_modified):
+        return response
 
     topics_per_page = 10
 
@@ -297,11 +536,16 @@ async def topics():
         flash("cok gittin")
         abort(404)
 
-    return render_template("topics.html", topics=latest_topics, page=page)
+    return with_validators(
+        make_response(render_template("topics.html", topics=latest_topics, page=page)),
+        etag,
+        version.last_modified,
+    )
 
 
-@app.route("/settings", methods=["GET", "POST"])
+@views.route("/settings", methods=["GET", "POST"])
 @csrf.exempt
+@query_budget(0)
 async def settings():
     if "theme" not in session:
         session["theme"] = DEFAULT_THEME
@@ -316,28 +560,31 @@ async def settings():
     )
 
 
-@app.route("/theme", methods=["POST"])
+@views.route("/theme", methods=["POST"])
 @csrf.exempt
+@query_budget(0)
 async def theme():
     form = ThemeForm()
     if form.validate_on_submit():
         session["theme"] = form.theme.data
 
-    return redirect(url_for("settings"))
+    return redirect(url_for("sozluk.settings"))
 
 
-@app.route("/focus", methods=["POST"])
+@views.route("/focus", methods=["POST"])
 @csrf.exempt
+@query_budget(0)
 async def focus():
     form = FocusForm()
     if form.validate_on_submit():
         session["focus"] = form.focus.data
 
-    return redirect(url_for("settings"))
+    return redirect(url_for("sozluk.settings"))
 
 
-@app.route("/send", methods=["POST"])
+@views.route("/send", methods=["POST"])
 @csrf.exempt
+@query_budget(9)
 async def put():
     """A simple API for sending entries.
 
@@ -359,34 +606,14 @@ async def put():
 
     submission = request.data.decode()
 
-    print(submission)
-
-    parts = submission.split("\n")
-
-    if len(parts) < 3:
-        return "not enough lines", HTTPStatus.UNSUPPORTED_MEDIA_TYPE
-
-    topic_line = parts[0]
-    author_line = parts[1]
-    entry_text = "\n".join(parts[2:])
-    topic_name = topic_line.lstrip("topic: ")
-    author_name = author_line.lstrip("author: ")
-
-    if topic_name == topic_line:
-        return "check topic line (first line)", HTTPStatus.UNSUPPORTED_MEDIA_TYPE
-
-    if author_name == author_line:
-        return "check author line (second line)", HTTPStatus.UNSUPPORTED_MEDIA_TYPE
-
     try:
-        topic_name = TopicName(topic_name)
-        author_name = AuthorName(author_name)
-        entry_text = EntryText(entry_text)
+        sketch = parse_text_record(submission)
+    except RecordFormatError as e:
+        return str(e), HTTPStatus.UNSUPPORTED_MEDIA_TYPE
     except ValueError as e:
         return str(e), HTTPStatus.BAD_REQUEST
 
-    sketch = EntrySketch(topic=topic_name, author=author_name, text=entry_text)
-    print(sketch)
+    logger.info("entry sent to %s by %s", sketch.topic, sketch.author)
 
     db_response, entry_id = await db.add_entry(sketch)
 
@@ -395,3 +622,77 @@ async def put():
             return f"ok. entry_id={entry_id.value}"
         case EntryAddResponse.DEFINITION_EXISTS:
             return "definiton exists", HTTPStatus.CONFLICT
+
+
+@views.route("/send/batch", methods=["POST"])
+@csrf.exempt
+# per CHUNK_SIZE records
+@query_budget(10)
+def put_batch():
+    """Send many entries at once.
+
+    The request is either application/x-ndjson with a
+    {"topic": ..., "author": ..., "text": ...} object per line, or text/plain
+    with records like the ones of /send separated by lines holding only a "%".
+    The response has a json line for each record telling what became of it.
+    Like /export this view is not async: the records are read and added a
+    chunk at a time while the outcomes are being sent, so a batch of any
+    size takes the memory of a chunk.
+    """
+
+    match request.mimetype:
+        case "application/x-ndjson":
+            reader = read_ndjson
+        case "text/plain":
+            reader = read_text_records
+        case something:
+            return (
+                f"content-type expected to be application/x-ndjson or text/plain, got {something or 'nothing'} instead",
+                HTTPStatus.UNSUPPORTED_MEDIA_TYPE,
+            )
+
+    lines = io.TextIOWrapper(request.stream, encoding="utf-8", newline="")
+
+    # the request is kept around until the last outcome, its body being read
+    @stream_with_context
+    def outcome_lines():
+        records = 0
+        for outcome in add_records(db, reader(lines)):
+            records += 1
+            yield f"{outcome.to_json()}\n"
+
+        logger.info("%d records sent in a batch", records)
+
+    return Response(outcome_lines(), mimetype="application/x-ndjson")
+
+
+@views.route("/export")
+# per EXPORT_BATCH_SIZE entries, and one to find the end
+@query_budget(2)
+def export():
+    """Stream all entries in identifier order, as ndjson or as csv.
+
+    ?after= starts after an entry, to continue an earlier export. This view
+    is not async: the response is generated batch by batch while it is being
+    sent, after the view has returned.
+    """
+
+    export_format = request.args.get("format", "ndjson")
+    if export_format not in EXPORT_FORMATS:
+        return f"unknown format {export_format}", HTTPStatus.BAD_REQUEST
+
+    # 0 starts from the first entry, like --after 0 of python -m sozluk.export
+    try:
+        after = int(request.args.get("after") or 0)
+        after = EntryID(after) if after else None
+    except ValueError as e:
+        return str(e), HTTPStatus.BAD_REQUEST
+
+    lines, mimetype = EXPORT_FORMATS[export_format]
+
+    # the storage itself, the proxy is gone when the response is sent
+    return Response(
+        lines(read_entries(site().db, after)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=sozluk.{export_format}"},
+    )
@@ -0,0 +1,42 @@
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask(ABC):
+    """Runs `run_once` every `period` seconds in a daemon thread.
+
+    The thread is started on first use in each process, so a task created
+    before uwsgi forks its workers still runs in every worker.
+    """
+
+    def __init__(self, period: float):
+        self.period = period
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+
+        threading.Thread(
+            target=self._loop, name=type(self).__name__, daemon=True
+        ).start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.period)
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.exception(e)
+
+    @abstractmethod
+    def run_once(self):
+        pass
@@ -0,0 +1,179 @@
+import asyncio
+import dataclasses
+import json
+from enum import Enum
+from itertools import islice
+from typing import Iterable, Iterator
+
+from sozluk.authorname import AuthorName
+from sozluk.entry import EntryID, EntrySketch, EntryText
+from sozluk.storage import EntryAddResponse, SozlukStorage
+from sozluk.topicname import TopicName
+
+# records per transaction when adding many entries
+CHUNK_SIZE = 500
+
+# a line holding only this separates the records of a multi-record text
+RECORD_SEPARATOR = "%"
+
+
+class RecordFormatError(ValueError):
+    """A record that is not laid out as expected, as opposed to bad values."""
+
+
+class RecordResult(Enum):
+    CREATED = "created"
+    DUPLICATE = "duplicate"
+    INVALID = "invalid"
+
+
+@dataclasses.dataclass(kw_only=True)
+class RecordOutcome:
+    """What became of a record, numbered from one in the order of the input."""
+
+    record: int
+    result: RecordResult
+    entry_id: EntryID | None = None
+    error: str | None = None
+
+    def to_json(self) -> str:
+        outcome = {"record": self.record, "result": self.result.value}
+        if self.entry_id is not None:
+            outcome["entry_id"] = self.entry_id.value
+        if self.error is not None:
+            outcome["error"] = self.error
+        return json.dumps(outcome)
+
+
+def make_sketch(topic: object, author: object, text: object) -> EntrySketch:
+    return EntrySketch(
+        topic=TopicName(topic), author=AuthorName(author), text=EntryText(text)
+    )
+
+
+def parse_text_record(record: str) -> EntrySketch:
+    """Parse a record like the following:
+
+    topic: hello
+    author: me
+    an entry.
+
+    third line of the entry.
+    """
+    parts = record.split("\n")
+
+    if len(parts) < 3:
+        raise RecordFormatError("not enough lines")
+
+    topic_line, author_line = parts[0], parts[1]
+
+    if not topic_line.startswith("topic: "):
+        raise RecordFormatError("check topic line (first line)")
+
+    if not author_line.startswith("author: "):
+        raise RecordFormatError("check author line (second line)")
+
+    return make_sketch(
+        topic_line.removeprefix("topic: "),
+        author_line.removeprefix("author: "),
+        "\n".join(parts[2:]),
+    )
+
+
+def parse_json_record(record: str) -> EntrySketch:
+    """Parse a json object with "topic", "author" and "text" strings."""
+    try:
+        fields = json.loads(record)
+    except json.JSONDecodeError as e:
+        raise RecordFormatError(f"not json: {e}") from e
+
+    if not isinstance(fields, dict):
+        raise RecordFormatError("not a json object")
+
+    try:
+        values = [fields[key] for key in ("topic", "author", "text")]
+    except KeyError as e:
+        raise RecordFormatError(f"missing {e.args[0]}") from e
+
+    if not all(isinstance(value, str) for value in values):
+        raise RecordFormatError("topic, author and text should be strings")
+
+    return make_sketch(*values)
+
+
+def read_ndjson(lines: Iterable[str]) -> Iterator[EntrySketch | ValueError]:
+    """Parse a json record per line, blank lines are skipped."""
+    for line in lines:
+        if not line.strip():
+            continue
+
+        try:
+            yield parse_json_record(line)
+        except ValueError as e:
+            yield e
+
+
+def read_text_records(lines: Iterable[str]) -> Iterator[EntrySketch | ValueError]:
+    """Parse text records separated by lines holding only a "%".
+
+    Lines may end with "\n" or "\r\n".
+    """
+    record: list[str] = []
+
+    def parse() -> EntrySketch | ValueError:
+        try:
+            return parse_text_record("".join(record).strip("\n"))
+        except ValueError as e:
+            return e
+
+    for line in lines:
+        if line.endswith("\r\n"):
+            line = line[:-2] + "\n"
+
+        if line.rstrip("\n") == RECORD_SEPARATOR:
+            if "".join(record).strip():
+                yield parse()
+            record = []
+        else:
+            record.append(line)
+
+    if "".join(record).strip():
+        yield parse()
+
+
+def add_records(
+    storage: SozlukStorage,
+    records: Iterable[EntrySketch | ValueError],
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[RecordOutcome]:
+    """Add parsed records to the storage, a transaction per chunk.
+
+    Records are consumed lazily, so only a chunk of them is held at a time.
+    This is a plain generator so the outcomes can be sent while the records
+    are still being read, outside of any event loop.
+    """
+    records = iter(records)
+    number = 0
+
+    while chunk := list(islice(records, chunk_size)):
+        sketches = [record for record in chunk if isinstance(record, EntrySketch)]
+        responses = iter(asyncio.run(storage.add_entries(sketches)) if sketches else [])
+
+        for record in chunk:
+            number += 1
+
+            if isinstance(record, ValueError):
+                yield RecordOutcome(
+                    record=number, result=RecordResult.INVALID, error=str(record)
+                )
+                continue
+
+            match next(responses):
+                case EntryAddResponse.SUCCESS, entry_id:
+                    yield RecordOutcome(
+                        record=number, result=RecordResult.CREATED, entry_id=entry_id
+                    )
+                case EntryAddResponse.DEFINITION_EXISTS, _:
+                    yield RecordOutcome(record=number, result=RecordResult.DUPLICATE)
+                case something:
+                    raise NotImplementedError(something)
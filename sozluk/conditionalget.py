@@ -0,0 +1,55 @@
+import hashlib
+import time
+from datetime import datetime
+
+from flask import Response, current_app, request, session
+from werkzeug.http import is_resource_modified
+
+from sozluk.themes import DEFAULT_THEME
+
+
+def page_etag(*parts: object) -> str:
+    """Entity tag of a page showing some content, in this session.
+
+    Besides the content, a page depends on the query string, on the theme
+    and focus settings and on the csrf token of its forms. Tokens expire,
+    so a page is only reused within half of their lifetime.
+    """
+    csrf_period = current_app.config.get("WTF_CSRF_TIME_LIMIT") or 3600
+    key = (
+        *parts,
+        request.full_path,
+        session.get("theme", DEFAULT_THEME),
+        session.get("focus", False),
+        session.get("csrf_token"),
+        int(time.time() // (csrf_period / 2)),
+    )
+    return hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+
+
+def not_modified(etag: str, last_modified: datetime | None) -> Response | None:
+    """A 304 response if the client already has this version of the page.
+
+    Only If-None-Match is answered. The last modification time goes back
+    when the latest entry is deleted, so If-Modified-Since could be wrong.
+    Pages with flashed messages waiting for them are always rendered.
+    """
+    if session.get("_flashes") or "If-None-Match" not in request.headers:
+        return None
+
+    if is_resource_modified(request.environ, etag=etag):
+        return None
+
+    response = Response(status=304)
+    return with_validators(response, etag, last_modified)
+
+
+def with_validators(
+    response: Response, etag: str, last_modified: datetime | None
+) -> Response:
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # browsers would otherwise guess a lifetime from last-modified and show
+    # pages without asking whether they have changed
+    response.cache_control.no_cache = True
+    return response
@@ -2,9 +2,10 @@ import dataclasses
 import logging
 import re
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Type, TypeVar
 
-from emoji import emoji_count
+from emoji import EMOJI_DATA, emoji_count
 from markupsafe import escape
 
 from sozluk.authorname import AuthorName
@@ -15,12 +16,29 @@ logger = logging.getLogger(__name__)
 
 T = TypeVar("T", bound="EntrySketch")
 
-ENTRY_REFERENCE_PARSER = {
-    "(bkz: {})": re.compile(r"\(bkz: ((?:[#@]?[a-zığüşöç \d])+)?\)"),
-    "(ayrica bkz: {})": re.compile(r"\(ayrica bkz: ((?:[#@]?[a-zığüşöç \d])+)?\)"),
-    "(ayrıca bkz: {})": re.compile(r"\(ayrıca bkz: ((?:[#@]?[a-zığüşöç \d])+)?\)"),
-    "{}": re.compile(r"`([#@]?[a-zığüşöç \d]+)?`"),
-}
+# references are "(bkz: x)", "(ayrica bkz: x)", "(ayrıca bkz: x)" and "`x`"
+ENTRY_REFERENCE_PARSER = re.compile(
+    r"\((?P<see>bkz|ayrica bkz|ayrıca bkz): "
+    r"(?P<see_target>(?:[#@]?[a-zığüşöç \d])+)?\)"
+    r"|`(?P<code_target>[#@]?[a-zığüşöç \d]+)?`"
+)
+
+# rendered entries are cached per process, keyed by the text and the link
+# prefixes. a new parser ships with a new process, so the cache never holds
+# html from an older parser.
+RENDER_CACHE_SIZE = 4096
+
+# every emoji has a codepoint outside ascii, a text without any of theirs
+# holds no emoji, without asking the emoji library to tokenize it
+EMOJI_CODEPOINTS = frozenset(
+    character for character in "".join(EMOJI_DATA) if not character.isascii()
+)
+
+
+def has_emoji(text: str) -> bool:
+    if EMOJI_CODEPOINTS.isdisjoint(text):
+        return False
+    return emoji_count(text) != 0
 
 
 class EntryText(TurkishLowercasedString):
@@ -29,7 +47,7 @@ class EntryText(TurkishLowercasedString):
         o = str(o)
         o = o.lstrip().rstrip()
         o = o.replace("\r\n", "\n")
-        if emoji_count(o) != 0:
+        if has_emoji(o):
             raise ValueError("emojis in an entry text is not allowed")
         return super().__new__(cls, o)
 
@@ -37,19 +55,24 @@ class EntryText(TurkishLowercasedString):
         # escape for python format syntax
         string = self.replace("{", "{{").replace("}", "}}")
 
-        indexes = {}
+        matches = []
+
+        def replace(m: re.Match) -> str:
+            see, see_target, code_target = m.groups()
 
-        for replacement, parser in ENTRY_REFERENCE_PARSER.items():
-            for m in parser.finditer(string):
-                indexes[m.span()[0]] = m.group(1)
+            target = see_target if see else code_target
+            if target is None:
+                # nothing to link to, keep it as it is
+                return m.group(0)
 
-        matches = [v for k, v in sorted(indexes.items(), key=lambda item: item[0])]
+            matches.append(target)
+            return f"({see}: {{}})" if see else "{}"
 
-        for replacement, parser in ENTRY_REFERENCE_PARSER.items():
-            string = parser.sub(replacement, string)
+        string = ENTRY_REFERENCE_PARSER.sub(replace, string)
 
         return string, matches
 
+    @lru_cache(maxsize=RENDER_CACHE_SIZE)
     def render(self, topic_prefix="", entry_prefix="", author_prefix=""):
         try:
             string, matches = self.parse()
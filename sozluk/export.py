@@ -0,0 +1,117 @@
+"""Write all entries of the database out, in identifier order.
+
+python -m sozluk.export > sozluk.ndjson
+python -m sozluk.export --format csv --after 1200 > newer.csv
+
+--after skips the entries up to and including an identifier, so a backup
+can be continued from the last entry of the previous one. ndjson exports
+can be loaded into another instance with python -m sozluk.import.
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import logging
+import sys
+from os import getenv
+from typing import Iterable, Iterator
+
+from sozluk.entry import Entry, EntryID
+from sozluk.storage import SozlukStorage
+from sozluk.storage.factory import open_storage
+
+logger = logging.getLogger(__name__)
+
+# entries per query, each batch is read in a transaction of its own
+EXPORT_BATCH_SIZE = 1000
+
+FIELDS = ("id", "topic", "author", "utc_time", "text")
+
+
+def read_entries(
+    storage: SozlukStorage,
+    after: EntryID | None = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[Entry]:
+    """Read entries batch by batch, each batch starting after the last one.
+
+    This is a plain generator so it can be consumed while a response is
+    being sent, outside of any event loop.
+    """
+    while entries := asyncio.run(storage.get_entries(after, batch_size)):
+        yield from entries
+        after = entries[-1].identifier
+
+
+def entry_fields(entry: Entry) -> dict:
+    return {
+        "id": entry.identifier.value,
+        "topic": str(entry.topic),
+        "author": str(entry.author),
+        "utc_time": entry.utc_time.isoformat(),
+        "text": str(entry.text),
+    }
+
+
+def ndjson_lines(entries: Iterable[Entry]) -> Iterator[str]:
+    for entry in entries:
+        yield json.dumps(entry_fields(entry), ensure_ascii=False) + "\n"
+
+
+def csv_lines(entries: Iterable[Entry]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, FIELDS)
+
+    def flush() -> str:
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    writer.writeheader()
+    yield flush()
+
+    for entry in entries:
+        writer.writerow(entry_fields(entry))
+        yield flush()
+
+
+FORMATS = {
+    "ndjson": (ndjson_lines, "application/x-ndjson"),
+    "csv": (csv_lines, "text/csv"),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m sozluk.export")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--after", type=int, help="last entry id of a previous export")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    url = getenv("DATABASE_URL", "sqlite:///sozluk.sqlite")
+    db = open_storage(url)
+
+    lines, _ = FORMATS[args.format]
+    after = EntryID(args.after) if args.after else None
+
+    last = after
+
+    def entries():
+        nonlocal last
+        for entry in read_entries(db, after):
+            yield entry
+            last = entry.identifier
+
+    sys.stdout.writelines(lines(entries()))
+    sys.stdout.flush()
+
+    if last is not None:
+        logger.info("continue with --after %d", last.value)
+
+
+if __name__ == "__main__":
+    main()
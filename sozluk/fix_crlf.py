@@ -1,11 +1,11 @@
+import logging
 from os import getenv
 
-from sqlalchemy import create_engine
+from sozluk.storage.factory import open_storage
 
-from sozluk.storage.sqlalchemydatabase import SQLAlchemyDatabase
+logging.basicConfig(level=logging.INFO)
 
 url = getenv("DATABASE_URL", "sqlite:///sozluk.sqlite")
-engine = create_engine(url, echo=True)
-db = SQLAlchemyDatabase(engine)
+db = open_storage(url)
 
-db.fix_crlf()
+db.fix_crlf(restart=bool(getenv("RESTART")))
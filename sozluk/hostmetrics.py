@@ -0,0 +1,49 @@
+import dataclasses
+
+import psutil
+
+from sozluk.background import PeriodicTask
+
+
+@dataclasses.dataclass(kw_only=True, frozen=True)
+class HostMetrics:
+    cpu_percentage: float
+    cpu_count: int
+    ram_total_megabytes: int
+    ram_used_megabytes: int
+    ram_percentage: float
+    load_average: tuple[float, float, float]
+
+
+class HostMetricsSampler(PeriodicTask):
+    """Keeps the latest host metrics, sampled in the background.
+
+    Cpu usage is averaged over the sampling period, so no request has to
+    sleep to measure it.
+    """
+
+    def __init__(self, period: float = 5.0):
+        super().__init__(period)
+        self.latest: HostMetrics | None = None
+
+    def run_once(self):
+        mem = psutil.virtual_memory()
+        ram_total_megabytes = int(mem.total / 1024 / 1024)
+
+        self.latest = HostMetrics(
+            cpu_percentage=psutil.cpu_percent(interval=None),
+            cpu_count=psutil.cpu_count(),
+            ram_total_megabytes=ram_total_megabytes,
+            ram_used_megabytes=ram_total_megabytes - int(mem.available / 1024 / 1024),
+            ram_percentage=mem.percent,
+            load_average=psutil.getloadavg(),
+        )
+
+    def get(self) -> HostMetrics:
+        self.start()
+
+        if self.latest is None:
+            # first call in this process, the thread has not sampled yet
+            self.run_once()
+
+        return self.latest
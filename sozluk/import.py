@@ -0,0 +1,72 @@
+"""Add entries from a file to the database.
+
+python -m sozluk.import entries.ndjson
+python -m sozluk.import --format text entries.txt
+
+ndjson files hold a {"topic": ..., "author": ..., "text": ...} object per
+line, text files hold records in the format of /send separated by lines
+holding only a "%". "-" reads from the standard input. The outcome of each
+record is written to the standard output as a json line.
+"""
+
+import argparse
+import logging
+import sys
+from collections import Counter
+from os import getenv
+
+from sozluk.bulk import CHUNK_SIZE, add_records, read_ndjson, read_text_records
+from sozluk.storage.factory import open_storage
+
+logger = logging.getLogger(__name__)
+
+READERS = {"ndjson": read_ndjson, "text": read_text_records}
+
+
+def guess_format(path: str) -> str:
+    return "ndjson" if path.endswith((".ndjson", ".jsonl")) else "text"
+
+
+def run(db, lines, reader, chunk_size: int) -> Counter:
+    results = Counter()
+
+    for outcome in add_records(db, reader(lines), chunk_size):
+        results[outcome.result.value] += 1
+        print(outcome.to_json())
+
+        if outcome.record % chunk_size == 0:
+            logger.info("%d records done", outcome.record)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m sozluk.import")
+    parser.add_argument("file", help='file to import, "-" for standard input')
+    parser.add_argument("--format", choices=READERS, help="guessed from the name")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    url = getenv("DATABASE_URL", "sqlite:///sozluk.sqlite")
+    db = open_storage(url)
+
+    reader = READERS[args.format or guess_format(args.file)]
+
+    if args.file == "-":
+        results = run(db, sys.stdin, reader, args.chunk_size)
+    else:
+        with open(args.file, encoding="utf-8") as lines:
+            results = run(db, lines, reader, args.chunk_size)
+
+    logger.info(
+        "%d created, %d duplicate, %d invalid",
+        results["created"],
+        results["duplicate"],
+        results["invalid"],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+"""Request metrics of every worker, in the Prometheus text format.
+
+Each process counts into its own Metrics and writes them to a json file
+named after its pid every few seconds. collect() adds up the files of the
+processes that are still running, so /metrics shows all uwsgi workers
+whichever one answers it. The counts of a worker that exits are dropped with
+it, which Prometheus reads as a counter reset.
+"""
+
+import contextvars
+import dataclasses
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Iterable
+
+import psutil
+import sqlalchemy
+from flask import Flask, Response, before_render_template, request, template_rendered
+from sqlalchemy import event
+
+from sozluk.background import PeriodicTask
+from sozluk.querybudget import query_budget
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+@dataclasses.dataclass(frozen=True)
+class Metric:
+    name: str
+    help: str
+    # a histogram has buckets, a counter has none
+    buckets: tuple[float, ...] | None = None
+
+
+REQUEST_DURATION = Metric(
+    "sozluk_request_duration_seconds",
+    "Time to answer a request, without streaming its body.",
+    LATENCY_BUCKETS,
+)
+RESPONSES = Metric("sozluk_responses_total", "Responses by status.")
+REQUEST_QUERIES = Metric(
+    "sozluk_request_queries", "Database queries of a request.", QUERY_BUCKETS
+)
+REQUEST_QUERY_DURATION = Metric(
+    "sozluk_request_query_duration_seconds",
+    "Time a request spent in database queries.",
+    LATENCY_BUCKETS,
+)
+TEMPLATE_DURATION = Metric(
+    "sozluk_template_render_duration_seconds",
+    "Time a request spent rendering templates.",
+    LATENCY_BUCKETS,
+)
+CACHE_HITS = Metric("sozluk_cache_hits_total", "Reads answered by the cache.")
+CACHE_MISSES = Metric("sozluk_cache_misses_total", "Reads that missed the cache.")
+
+METRICS = (
+    REQUEST_DURATION,
+    RESPONSES,
+    REQUEST_QUERIES,
+    REQUEST_QUERY_DURATION,
+    TEMPLATE_DURATION,
+    CACHE_HITS,
+    CACHE_MISSES,
+)
+
+
+@dataclasses.dataclass
+class RequestTally:
+    """What a request has spent so far."""
+
+    started: float
+    queries: int = 0
+    query_seconds: float = 0.0
+    template_seconds: float = 0.0
+    template_started: float | None = None
+
+
+# the tally of the request being answered. Storage threads see it through
+# copies of the request's context, and add to the same tally.
+current_tally: contextvars.ContextVar[RequestTally | None] = contextvars.ContextVar(
+    "current_tally", default=None
+)
+
+
+def labels_of(labels: dict[str, str]) -> Labels:
+    return tuple(sorted(labels.items()))
+
+
+class Metrics(PeriodicTask):
+    """Counters and histograms of this process.
+
+    With a directory, a snapshot of them is written there every `period`
+    seconds, to be added up with the other processes by collect().
+    """
+
+    def __init__(self, directory: Path | None = None, period: float = 5.0):
+        super().__init__(period)
+        self.directory = directory
+        self._values_lock = threading.Lock()
+        self.counters: dict[tuple[str, Labels], float] = defaultdict(float)
+        # the observations in each bucket, then in +Inf, then their sum
+        self.histograms: dict[tuple[str, Labels], list[float]] = {}
+        self.collectors: list[Callable[["Metrics"], None]] = []
+
+    def inc(self, metric: Metric, labels: dict[str, str], value: float = 1):
+        self.start()
+        with self._values_lock:
+            self.counters[metric.name, labels_of(labels)] += value
+
+    def set(self, metric: Metric, labels: dict[str, str], value: float):
+        """Set a counter that is counted somewhere else."""
+        with self._values_lock:
+            self.counters[metric.name, labels_of(labels)] = value
+
+    def observe(self, metric: Metric, labels: dict[str, str], value: float):
+        self.start()
+        key = metric.name, labels_of(labels)
+        bucket = next(
+            (i for i, bound in enumerate(metric.buckets) if value <= bound),
+            len(metric.buckets),
+        )
+
+        with self._values_lock:
+            counts = self.histograms.setdefault(key, [0] * (len(metric.buckets) + 2))
+            counts[bucket] += 1
+            counts[-1] += value
+
+    def add_collector(
+        self, collector: Callable[["Metrics"], None]
+    ) -> Callable[["Metrics"], None]:
+        """Call collector to set counters before every snapshot."""
+        self.collectors.append(collector)
+        return collector
+
+    def snapshot(self) -> dict:
+        for collector in self.collectors:
+            collector(self)
+
+        with self._values_lock:
+            return {
+                "counters": [
+                    [name, list(labels), value]
+                    for (name, labels), value in self.counters.items()
+                ],
+                "histograms": [
+                    [name, list(labels), list(counts)]
+                    for (name, labels), counts in self.histograms.items()
+                ],
+            }
+
+    def _path(self, pid: int) -> Path:
+        return self.directory / f"{pid}.json"
+
+    def run_once(self):
+        process = psutil.Process()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        path = self._path(process.pid)
+        temporary = path.with_suffix(".tmp")
+        temporary.write_text(
+            json.dumps({"started": process.create_time(), **self.snapshot()})
+        )
+        os.replace(temporary, path)
+
+    def start(self):
+        if self.directory is not None:
+            super().start()
+
+    def collect(self) -> dict:
+        """The snapshots of all running processes, added up."""
+        snapshots = [self.snapshot()]
+
+        if self.directory is None or not self.directory.is_dir():
+            return merge(snapshots)
+
+        for path in self.directory.glob("*.json"):
+            pid = int(path.stem)
+            if pid == os.getpid():
+                continue
+
+            try:
+                snapshot = json.loads(path.read_text())
+            except (OSError, ValueError):
+                # removed or replaced meanwhile
+                continue
+
+            if not running(pid, snapshot["started"]):
+                path.unlink(missing_ok=True)
+                continue
+
+            snapshots.append(snapshot)
+
+        return merge(snapshots)
+
+    def render(self) -> str:
+        return render(self.collect(), METRICS)
+
+
+def running(pid: int, started: float) -> bool:
+    """Whether the process that wrote a snapshot is still running."""
+    try:
+        return psutil.Process(pid).create_time() == started
+    except psutil.Error:
+        return False
+
+
+def merge(snapshots: Iterable[dict]) -> dict:
+    counters: dict[tuple[str, Labels], float] = defaultdict(float)
+    histograms: dict[tuple[str, Labels], list[float]] = {}
+
+    for snapshot in snapshots:
+        for name, labels, value in snapshot["counters"]:
+            counters[name, tuple(map(tuple, labels))] += value
+
+        for name, labels, counts in snapshot["histograms"]:
+            key = name, tuple(map(tuple, labels))
+            total = histograms.setdefault(key, [0] * len(counts))
+            for i, count in enumerate(counts):
+                total[i] += count
+
+    return {
+        "counters": [[n, list(labels), v] for (n, labels), v in counters.items()],
+        "histograms": [[n, list(labels), c] for (n, labels), c in histograms.items()],
+    }
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def format_labels(labels: Iterable[tuple[str, str]]) -> str:
+    labels = ",".join(f'{name}="{escape(value)}"' for name, value in labels)
+    return f"{{{labels}}}" if labels else ""
+
+
+def format_number(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def render(snapshot: dict, metrics: Iterable[Metric]) -> str:
+    """A snapshot in the Prometheus text exposition format."""
+    counters = defaultdict(list)
+    for name, labels, value in snapshot["counters"]:
+        counters[name].append((labels, value))
+
+    histograms = defaultdict(list)
+    for name, labels, counts in snapshot["histograms"]:
+        histograms[name].append((labels, counts))
+
+    lines = []
+
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+
+        if metric.buckets is None:
+            lines.append(f"# TYPE {metric.name} counter")
+            for labels, value in sorted(counters[metric.name]):
+                lines.append(
+                    f"{metric.name}{format_labels(labels)} {format_number(value)}"
+                )
+            continue
+
+        lines.append(f"# TYPE {metric.name} histogram")
+        for labels, counts in sorted(histograms[metric.name]):
+            cumulative = 0
+            bounds = [*map(format_number, metric.buckets), "+Inf"]
+
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                bucket_labels = format_labels([*labels, ("le", bound)])
+                lines.append(f"{metric.name}_bucket{bucket_labels} {cumulative}")
+
+            lines.append(
+                f"{metric.name}_sum{format_labels(labels)} {format_number(counts[-1])}"
+            )
+            lines.append(f"{metric.name}_count{format_labels(labels)} {cumulative}")
+
+    return "\n".join(lines) + "\n"
+
+
+def instrument_engine(engine: sqlalchemy.Engine):
+    """Count the queries on an engine, and their time, into the current tally."""
+
+    # kept on the execution context, which goes away with a failed statement
+    # too, unlike the pooled connection
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(connection, cursor, statement, parameters, context, many):
+        context._sozluk_query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(connection, cursor, statement, parameters, context, many):
+        started = context._sozluk_query_started
+        tally = current_tally.get()
+
+        if tally is not None:
+            tally.queries += 1
+            tally.query_seconds += time.perf_counter() - started
+
+
+def instrument_app(app: Flask, metrics: Metrics):
+    """Time each request, its queries and templates, and serve them at /metrics."""
+
+    @app.before_request
+    def start_tally():
+        current_tally.set(RequestTally(started=time.perf_counter()))
+
+    def before_render(sender, template, context, **extra):
+        tally = current_tally.get()
+        if tally is not None:
+            tally.template_started = time.perf_counter()
+
+    def rendered(sender, template, context, **extra):
+        tally = current_tally.get()
+        if tally is not None and tally.template_started is not None:
+            tally.template_seconds += time.perf_counter() - tally.template_started
+            tally.template_started = None
+
+    before_render_template.connect(before_render, app, weak=False)
+    template_rendered.connect(rendered, app, weak=False)
+
+    @app.after_request
+    def record_tally(response: Response) -> Response:
+        tally = current_tally.get()
+        if tally is None:
+            return response
+
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        labels = {"route": route, "method": request.method}
+
+        metrics.observe(REQUEST_DURATION, labels, time.perf_counter() - tally.started)
+        metrics.inc(RESPONSES, {**labels, "status": str(response.status_code)})
+        metrics.observe(REQUEST_QUERIES, labels, tally.queries)
+        metrics.observe(REQUEST_QUERY_DURATION, labels, tally.query_seconds)
+        if tally.template_seconds:
+            metrics.observe(TEMPLATE_DURATION, labels, tally.template_seconds)
+
+        return response
+
+    @app.teardown_request
+    def end_tally(error: BaseException | None):
+        current_tally.set(None)
+
+    @app.route("/metrics")
+    @query_budget(0)
+    def metrics_endpoint():
+        return Response(metrics.render(), content_type=CONTENT_TYPE)
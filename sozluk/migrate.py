@@ -0,0 +1,16 @@
+"""Create missing tables and indexes of DATABASE_URL, and fill the new ones.
+
+Run before starting a new version of the site:
+
+    python -m sozluk.migrate
+"""
+
+import logging
+from os import getenv
+
+from sozluk.storage.factory import open_storage
+
+logging.basicConfig(level=logging.INFO)
+
+url = getenv("DATABASE_URL", "sqlite:///sozluk.sqlite")
+open_storage(url, migrate=True)
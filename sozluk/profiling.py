@@ -0,0 +1,237 @@
+"""Opt-in sampling profiler for requests.
+
+A profiled request has the stacks of every thread of its process sampled
+while it runs, since an async view runs in asgiref's event loop thread and
+its queries in storage threads, out of sight of a profiler like cProfile
+that follows one thread. The samples are written in the collapsed stack
+format that flamegraph.pl and speedscope read, one file per request, named
+after the time, the route and its parameters.
+
+A request is profiled when it is drawn by PROFILE_RATE, when it is slower
+than PROFILE_SLOWER_THAN seconds, or when it carries a PROFILE_HEADER signed
+with the app's secret key, which
+
+    SECRET_KEY=... python -m sozluk.profiling
+
+prints. Workers of uwsgi answer a request at a time, so the other threads
+of a process are working for the same request, or idle.
+"""
+
+import itertools
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import UTC, datetime
+from pathlib import Path
+from types import FrameType
+
+from flask import Flask, Response, current_app, request
+from itsdangerous import BadSignature, TimestampSigner
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Sozluk-Profile"
+
+# seconds a signed header is accepted for
+PROFILE_HEADER_AGE = 24 * 60 * 60
+
+UNSAFE = re.compile(r"[^\w.=-]+")
+
+
+def collapse(thread_name: str, frame: FrameType) -> str:
+    """A stack as "thread;outermost;...;innermost"."""
+    names = []
+
+    while frame is not None:
+        code = frame.f_code
+        name = f"{code.co_qualname} ({code.co_filename}:{code.co_firstlineno})"
+        # semicolons separate the frames
+        names.append(name.replace(";", ":"))
+        frame = frame.f_back
+
+    names.append(thread_name)
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """Samples the stacks of the other threads between begin() and end().
+
+    The sampling thread is started on first use in each process, and waits
+    without waking up while no request is profiled.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._active = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _start(self):
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+
+        threading.Thread(
+            target=self._loop, name=type(self).__name__, daemon=True
+        ).start()
+
+    def begin(self) -> bool:
+        """Start sampling, False if the samples belong to another request."""
+        with self._lock:
+            if self._active.is_set():
+                return False
+
+            self._start()
+            self.stacks = Counter()
+            self._active.set()
+            return True
+
+    def end(self) -> Counter[str]:
+        with self._lock:
+            self._active.clear()
+            return self.stacks
+
+    def _loop(self):
+        me = threading.get_ident()
+
+        while True:
+            self._active.wait()
+            # a request shorter than the interval costs no sample
+            time.sleep(self.interval)
+
+            frames = sys._current_frames()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+            with self._lock:
+                if self._active.is_set():
+                    for ident, frame in frames.items():
+                        if ident != me:
+                            name = names.get(ident, str(ident))
+                            self.stacks[collapse(name, frame)] += 1
+
+            del frames
+
+
+def header_signer(secret_key: str) -> TimestampSigner:
+    return TimestampSigner(secret_key, salt="sozluk.profiling")
+
+
+def signed(value: str | None, secret_key: str) -> bool:
+    """Whether a profile header is signed with the secret key, and recent."""
+    if not value:
+        return False
+
+    try:
+        header_signer(secret_key).unsign(value, max_age=PROFILE_HEADER_AGE)
+    except BadSignature:
+        logger.warning("bad %s header", PROFILE_HEADER)
+        return False
+
+    return True
+
+
+class Profiler:
+    """Decides which requests to profile, and keeps their last `keep` profiles."""
+
+    def __init__(
+        self,
+        directory: Path,
+        rate: float = 0.0,
+        slower_than: float | None = None,
+        interval: float = 0.005,
+        keep: int = 100,
+    ):
+        self.directory = directory
+        self.rate = rate
+        self.slower_than = slower_than
+        self.keep = keep
+        self.sampler = StackSampler(interval)
+        self._numbers = itertools.count()
+
+    def file_name(self, route: str, parameters: dict, elapsed: float) -> str:
+        tags = [route.strip("/").split("/")[0] or "index"]
+        tags.extend(f"{name}={value}" for name, value in parameters.items())
+
+        name = UNSAFE.sub("_", "-".join(tags))[:80]
+        moment = datetime.now(UTC).strftime("%Y%m%dT%H%M%S.%f")
+        # the number keeps apart the profiles of a moment
+        number = next(self._numbers)
+
+        return f"{moment}-{os.getpid()}-{number}-{name}-{elapsed * 1000:.0f}ms.folded"
+
+    def write(self, stacks: Counter[str], name: str) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        path = self.directory / name
+        path.write_text(
+            "".join(f"{stack} {count}\n" for stack, count in stacks.items())
+        )
+
+        self.rotate()
+        return path
+
+    def rotate(self):
+        """Remove all but the newest `keep` profiles."""
+        profiles = sorted(self.directory.glob("*.folded"), key=lambda p: p.name)
+
+        for path in profiles[: -self.keep]:
+            path.unlink(missing_ok=True)
+
+
+def profile_app(app: Flask, profiler: Profiler):
+    """Sample the requests that the profiler wants, and write their profiles."""
+
+    @app.before_request
+    def begin_profile():
+        forced = signed(request.headers.get(PROFILE_HEADER), current_app.secret_key)
+        kept = forced or random.random() < profiler.rate
+
+        # a request may turn out slow, so with a threshold all are sampled
+        if kept or profiler.slower_than is not None:
+            if profiler.sampler.begin():
+                request.environ["sozluk.profile"] = (time.perf_counter(), forced, kept)
+
+    @app.after_request
+    def end_profile(response: Response) -> Response:
+        started = request.environ.pop("sozluk.profile", None)
+        if started is None:
+            return response
+
+        started, forced, kept = started
+        stacks = profiler.sampler.end()
+        elapsed = time.perf_counter() - started
+
+        if not kept and elapsed < profiler.slower_than:
+            return response
+
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        path = profiler.write(
+            stacks, profiler.file_name(route, request.view_args or {}, elapsed)
+        )
+        logger.info("profiled %s in %s", request.path, path)
+
+        if forced:
+            response.headers["X-Sozluk-Profile-File"] = path.name
+
+        return response
+
+    @app.teardown_request
+    def stop_profile(error: BaseException | None):
+        if request.environ.pop("sozluk.profile", None) is not None:
+            profiler.sampler.end()
+
+
+def main():
+    secret_key = os.environ["SECRET_KEY"]
+    value = header_signer(secret_key).sign("profile").decode()
+    print(f"{PROFILE_HEADER}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Counting the SQL statements of requests and storage calls.
+
+Routes declare how many statements a request may run with @query_budget,
+and the tests hold every route to it through within_budget(). In
+development, watch_queries() warns about a request over its budget, and
+about a statement that runs again and again in one request, which is what
+a query per row looks like.
+"""
+
+import contextlib
+import dataclasses
+import logging
+import re
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, Iterator, TypeVar
+
+import sqlalchemy
+from flask import Flask, Response, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# runs of the same statement in a request that are warned about
+REPEATED_STATEMENT_LIMIT = 5
+
+PLACEHOLDERS = re.compile(r"\?(?:\s*,\s*\?)+")
+WHITESPACE = re.compile(r"\s+")
+
+View = TypeVar("View", bound=Callable)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def statement_shape(statement: str) -> str:
+    """A statement without what changes from run to run of the same query.
+
+    Lists of placeholders, like the ones of an expanding IN, become one.
+    """
+    return PLACEHOLDERS.sub("?", WHITESPACE.sub(" ", statement).strip())
+
+
+@dataclasses.dataclass
+class QueryCount:
+    statements: list[str] = dataclasses.field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self, limit: int = REPEATED_STATEMENT_LIMIT) -> dict[str, int]:
+        """Shapes of the statements that ran at least `limit` times."""
+        shapes = Counter(map(statement_shape, self.statements))
+        return {shape: runs for shape, runs in shapes.items() if runs >= limit}
+
+
+def query_budget(statements: int) -> Callable[[View], View]:
+    """Declare the most statements a request to a view may run."""
+
+    def declare(view: View) -> View:
+        view.query_budget = statements
+        return view
+
+    return declare
+
+
+@contextlib.contextmanager
+def count_queries(engine: sqlalchemy.Engine) -> Iterator[QueryCount]:
+    """Count the statements run on an engine within the block, by any thread."""
+    count = QueryCount()
+
+    def after_cursor_execute(connection, cursor, statement, *args):
+        count.statements.append(statement)
+
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    try:
+        yield count
+    finally:
+        event.remove(engine, "after_cursor_execute", after_cursor_execute)
+
+
+@contextlib.contextmanager
+def within_budget(
+    engine: sqlalchemy.Engine, budget: int, what: str = "the block"
+) -> Iterator[QueryCount]:
+    """Raise QueryBudgetExceeded if the block runs over `budget` statements."""
+    with count_queries(engine) as count:
+        yield count
+
+    if count.count > budget:
+        statements = "\n".join(count.statements)
+        raise QueryBudgetExceeded(
+            f"{what} ran {count.count} statements, over its budget of {budget}:\n"
+            f"{statements}"
+        )
+
+
+# statements of the request being answered
+current_count: ContextVar[QueryCount | None] = ContextVar("current_count", default=None)
+
+
+def watch_queries(
+    app: Flask,
+    engine: sqlalchemy.Engine,
+    repeated_limit: int = REPEATED_STATEMENT_LIMIT,
+):
+    """Log a warning for requests over their budget or repeating a statement.
+
+    Meant for development, every statement is kept until the request ends.
+    Statements run by before_request functions registered earlier are not
+    counted.
+    """
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(connection, cursor, statement, *args):
+        if (count := current_count.get()) is not None:
+            count.statements.append(statement)
+
+    @app.before_request
+    def start_count():
+        current_count.set(QueryCount())
+
+    @app.after_request
+    def check_count(response: Response) -> Response:
+        count = current_count.get()
+        if count is None:
+            return response
+
+        view = app.view_functions.get(request.endpoint)
+        budget = getattr(view, "query_budget", None)
+
+        if budget is not None and count.count > budget:
+            logger.warning(
+                "%s ran %d statements, over its budget of %d",
+                request.path,
+                count.count,
+                budget,
+            )
+
+        for shape, runs in count.repeated(repeated_limit).items():
+            logger.warning("%s ran %d times in %s", shape, runs, request.path)
+
+        return response
+
+    @app.teardown_request
+    def end_count(error: BaseException | None):
+        current_count.set(None)
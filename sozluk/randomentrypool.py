@@ -0,0 +1,37 @@
+import asyncio
+import random
+
+from sozluk.background import PeriodicTask
+from sozluk.entry import Entry, EntryID
+from sozluk.storage import SozlukStorage
+
+
+class RandomEntryPool(PeriodicTask):
+    """A pool of random entries, refilled in the background.
+
+    Requests draw from the pool, so their cost does not depend on the size
+    of the entries table.
+    """
+
+    def __init__(self, storage: SozlukStorage, size: int = 200, period: float = 60.0):
+        super().__init__(period)
+        self.storage = storage
+        self.size = size
+        self.entries: list[Entry] = []
+
+    def run_once(self):
+        self.entries = asyncio.run(self.storage.get_random_entries(limit=self.size))
+
+    async def sample(self, limit: int = 10) -> list[Entry]:
+        self.start()
+
+        if not self.entries:
+            # first call in this process, the thread has not filled the pool yet
+            self.entries = await self.storage.get_random_entries(limit=self.size)
+
+        entries = self.entries
+        return random.sample(entries, min(limit, len(entries)))
+
+    def discard(self, entry_id: EntryID):
+        """Forget a deleted entry until the next refill."""
+        self.entries = [entry for entry in self.entries if entry.identifier != entry_id]
@@ -0,0 +1,8 @@
+from os import getenv
+
+from sozluk.storage.factory import open_storage
+
+url = getenv("DATABASE_URL", "sqlite:///sozluk.sqlite")
+db = open_storage(url, echo=True)
+
+db.recount()
@@ -1,4 +1,6 @@
+import dataclasses
 from abc import ABC, abstractmethod
+from datetime import datetime
 from enum import Enum, auto
 
 from sozluk.authorname import AuthorName
@@ -16,6 +18,29 @@ class EntryAddResponse(Enum):
     DEFINITION_EXISTS = auto()
 
 
+@dataclasses.dataclass(kw_only=True)
+class EntryPage:
+    """A page of entries in ascending identifier order."""
+
+    entries: list[Entry]
+    has_previous: bool
+    has_next: bool
+
+
+@dataclasses.dataclass(frozen=True, kw_only=True)
+class ContentVersion:
+    """Identifies a state of a set of entries.
+
+    Identifiers are never reused, so the latest identifier and the number of
+    entries together change whenever an entry is added to or deleted from
+    the set.
+    """
+
+    last_entry_id: int
+    entry_count: int
+    last_modified: datetime | None
+
+
 class SozlukStorage(ABC):
     @abstractmethod
     async def add_entry(
@@ -23,10 +48,30 @@ class SozlukStorage(ABC):
     ) -> tuple[EntryAddResponse, EntryID | None]:
         pass
 
+    @abstractmethod
+    async def add_entries(
+        self, sketches: list[EntrySketch]
+    ) -> list[tuple[EntryAddResponse, EntryID | None]]:
+        """Add entries in one transaction, with a response for each of them."""
+
     @abstractmethod
     async def get_entry(self, entry_id: EntryID) -> Entry | None:
         pass
 
+    @abstractmethod
+    async def get_first_entry(self) -> Entry | None:
+        pass
+
+    @abstractmethod
+    async def get_last_entry(self) -> Entry | None:
+        pass
+
+    @abstractmethod
+    async def get_entries(
+        self, after: EntryID | None = None, limit: int = 1000
+    ) -> list[Entry]:
+        """Get entries in identifier order, starting after an entry."""
+
     @abstractmethod
     async def get_topic(self, topic_name: TopicName) -> list[Entry]:
         pass
@@ -35,11 +80,49 @@ class SozlukStorage(ABC):
     async def get_author(self, author_name: AuthorName) -> list[Entry]:
         pass
 
+    @abstractmethod
+    async def get_topic_page(
+        self,
+        topic_name: TopicName,
+        before: EntryID | None = None,
+        after: EntryID | None = None,
+        limit: int = 25,
+    ) -> EntryPage:
+        """Get entries of a topic that come before or after an entry.
+
+        Without a cursor, the first page is returned.
+        """
+
+    @abstractmethod
+    async def get_author_page(
+        self,
+        author_name: AuthorName,
+        before: EntryID | None = None,
+        after: EntryID | None = None,
+        limit: int = 25,
+    ) -> EntryPage:
+        """Get entries of an author that come before or after an entry.
+
+        Without a cursor, the first page is returned.
+        """
+
+    @abstractmethod
+    async def get_topic_version(self, topic_name: TopicName) -> ContentVersion:
+        pass
+
+    @abstractmethod
+    async def get_author_version(self, author_name: AuthorName) -> ContentVersion:
+        pass
+
+    @abstractmethod
+    async def get_entries_version(self) -> ContentVersion:
+        """Version of all entries, and of the topics and authors with them."""
+
     @abstractmethod
     async def topic_search_basic(
-        self, query: str, limit: int | None = None
+        self, query: str, limit: int | None = None, offset: int | None = None
     ) -> list[TopicName]:
-        """Get a list of topics that contains a substring"""
+        """Get a list of topics that contains a substring, prefix matches first"""
 
     @abstractmethod
     async def del_entry(self, entry_id: EntryID) -> EntryDeleteResponse:
@@ -72,6 +155,10 @@ class SozlukStorage(ABC):
     async def entry_count(self) -> int:
         pass
 
+    @abstractmethod
+    async def get_data_version(self) -> int:
+        """A number that goes up whenever the stored data changes."""
+
     @abstractmethod
     async def get_random_entries(self, limit: int = 10) -> list[Entry]:
         pass
@@ -0,0 +1,307 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from sozluk.authorname import AuthorName
+from sozluk.entry import Entry, EntryID, EntrySketch
+from sozluk.storage import (
+    ContentVersion,
+    EntryAddResponse,
+    EntryDeleteResponse,
+    EntryPage,
+    SozlukStorage,
+)
+from sozluk.topicname import TopicName
+
+T = TypeVar("T")
+
+# tag of the cached values that change with any added or deleted entry
+ANY_ENTRY = "any_entry"
+
+# seconds a value is served for at most, CACHE_TTL for the app
+DEFAULT_TTL = 60.0
+
+
+class TTLCache:
+    """A bounded least recently used cache whose values expire.
+
+    Values are stored with tags, and can be dropped by tag.
+    """
+
+    def __init__(self, size: int, ttl: float):
+        self.size = size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.values: OrderedDict[Hashable, tuple[float, object, tuple]] = OrderedDict()
+        self.tagged: dict[Hashable, set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def get(self, key: Hashable, default=None):
+        with self.lock:
+            item = self.values.get(key)
+
+            if item is None:
+                return default
+
+            expires, value, _ = item
+            if expires < time.monotonic():
+                self._drop(key)
+                return default
+
+            self.values.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: object, tags: tuple[Hashable, ...]):
+        with self.lock:
+            if key in self.values:
+                self._drop(key)
+
+            self.values[key] = time.monotonic() + self.ttl, value, tags
+            for tag in tags:
+                self.tagged.setdefault(tag, set()).add(key)
+
+            while len(self.values) > self.size:
+                self._drop(next(iter(self.values)))
+
+    def invalidate(self, tag: Hashable):
+        with self.lock:
+            for key in self.tagged.get(tag, set()).copy():
+                self._drop(key)
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+            self.tagged.clear()
+
+    def _drop(self, key: Hashable):
+        _, _, tags = self.values.pop(key)
+
+        for tag in tags:
+            keys = self.tagged[tag]
+            keys.discard(key)
+            if not keys:
+                del self.tagged[tag]
+
+
+class CachingStorage(SozlukStorage):
+    """Serves hot reads of another storage from memory.
+
+    Entries, topics and authors (whole or paged, with their versions), the
+    latest topics and the counts are cached.
+    Writes through this storage drop exactly the values they change. Writes
+    through other processes are seen at the next revalidate(), or once the
+    values expire.
+    """
+
+    def __init__(
+        self, storage: SozlukStorage, size: int = 1024, ttl: float = DEFAULT_TTL
+    ):
+        self.storage = storage
+        self.cache = TTLCache(size, ttl)
+        self.hits: Counter[str] = Counter()
+        self.misses: Counter[str] = Counter()
+        # bumped by every write, a value read from the storage during a write
+        # may be older than the write and is not cached
+        self.writes = 0
+        self.data_version: int | None = None
+
+    async def revalidate(self):
+        """Drop everything if the data changed since the last call.
+
+        This catches the writes of other processes too, for the price of
+        reading a counter. Call it at the start of every request.
+        """
+        data_version = await self.storage.get_data_version()
+
+        if data_version != self.data_version:
+            self.data_version = data_version
+            self.writes += 1
+            self.cache.clear()
+
+    async def _cached(
+        self,
+        key: tuple,
+        tags: tuple[Hashable, ...],
+        fetch: Callable[[], Awaitable[T]],
+    ) -> T:
+        kind = key[0]
+        value = self.cache.get(key, self)
+
+        if value is not self:
+            self.hits[kind] += 1
+            return value
+
+        self.misses[kind] += 1
+        writes = self.writes
+        value = await fetch()
+
+        if writes == self.writes:
+            self.cache.set(key, value, tags)
+
+        return value
+
+    def _forget(self, *tags: Hashable):
+        self.writes += 1
+        for tag in tags:
+            self.cache.invalidate(tag)
+
+    def _forget_entry(self, sketch: EntrySketch, entry_id: EntryID):
+        self._forget(
+            ("entry", entry_id.value),
+            ("topic", sketch.topic),
+            ("author", sketch.author),
+            ANY_ENTRY,
+        )
+
+    async def add_entry(
+        self, sketch: EntrySketch
+    ) -> tuple[EntryAddResponse, EntryID | None]:
+        result, entry_id = await self.storage.add_entry(sketch)
+
+        if result == EntryAddResponse.SUCCESS:
+            self._forget_entry(sketch, entry_id)
+
+        return result, entry_id
+
+    async def add_entries(
+        self, sketches: list[EntrySketch]
+    ) -> list[tuple[EntryAddResponse, EntryID | None]]:
+        responses = await self.storage.add_entries(sketches)
+
+        for sketch, (result, entry_id) in zip(sketches, responses):
+            if result == EntryAddResponse.SUCCESS:
+                self._forget_entry(sketch, entry_id)
+
+        return responses
+
+    async def del_entry(self, entry_id: EntryID) -> EntryDeleteResponse:
+        entry = await self.storage.get_entry(entry_id)
+        result = await self.storage.del_entry(entry_id)
+
+        if entry is not None:
+            self._forget_entry(entry, entry_id)
+
+        return result
+
+    async def get_entry(self, entry_id: EntryID) -> Entry | None:
+        key = ("entry", entry_id.value)
+        return await self._cached(key, (key,), lambda: self.storage.get_entry(entry_id))
+
+    async def get_topic(self, topic_name: TopicName) -> list[Entry]:
+        key = ("topic", topic_name)
+        entries = await self._cached(
+            key, (key,), lambda: self.storage.get_topic(topic_name)
+        )
+        return list(entries)
+
+    async def get_author(self, author_name: AuthorName) -> list[Entry]:
+        key = ("author", author_name)
+        entries = await self._cached(
+            key, (key,), lambda: self.storage.get_author(author_name)
+        )
+        return list(entries)
+
+    async def get_latest_topics(
+        self, limit: int | None = None, offset: int | None = None
+    ) -> list[TopicName]:
+        topics = await self._cached(
+            ("latest_topics", limit, offset),
+            (ANY_ENTRY,),
+            lambda: self.storage.get_latest_topics(limit=limit, offset=offset),
+        )
+        return list(topics)
+
+    @property
+    async def author_count(self) -> int:
+        return await self._cached(
+            ("count", "authors"), (ANY_ENTRY,), lambda: self.storage.author_count
+        )
+
+    @property
+    async def topic_count(self) -> int:
+        return await self._cached(
+            ("count", "topics"), (ANY_ENTRY,), lambda: self.storage.topic_count
+        )
+
+    @property
+    async def entry_count(self) -> int:
+        return await self._cached(
+            ("count", "entries"), (ANY_ENTRY,), lambda: self.storage.entry_count
+        )
+
+    async def get_entries(
+        self, after: EntryID | None = None, limit: int = 1000
+    ) -> list[Entry]:
+        return await self.storage.get_entries(after, limit)
+
+    async def get_first_entry(self) -> Entry | None:
+        return await self.storage.get_first_entry()
+
+    async def get_last_entry(self) -> Entry | None:
+        return await self.storage.get_last_entry()
+
+    async def get_topic_page(
+        self,
+        topic_name: TopicName,
+        before: EntryID | None = None,
+        after: EntryID | None = None,
+        limit: int = 25,
+    ) -> EntryPage:
+        return await self._cached(
+            ("topic_page", topic_name, before, after, limit),
+            (("topic", topic_name),),
+            lambda: self.storage.get_topic_page(topic_name, before, after, limit),
+        )
+
+    async def get_author_page(
+        self,
+        author_name: AuthorName,
+        before: EntryID | None = None,
+        after: EntryID | None = None,
+        limit: int = 25,
+    ) -> EntryPage:
+        return await self._cached(
+            ("author_page", author_name, before, after, limit),
+            (("author", author_name),),
+            lambda: self.storage.get_author_page(author_name, before, after, limit),
+        )
+
+    async def get_topic_version(self, topic_name: TopicName) -> ContentVersion:
+        return await self._cached(
+            ("topic_version", topic_name),
+            (("topic", topic_name),),
+            lambda: self.storage.get_topic_version(topic_name),
+        )
+
+    async def get_author_version(self, author_name: AuthorName) -> ContentVersion:
+        return await self._cached(
+            ("author_version", author_name),
+            (("author", author_name),),
+            lambda: self.storage.get_author_version(author_name),
+        )
+
+    async def get_entries_version(self) -> ContentVersion:
+        return await self._cached(
+            ("entries_version",),
+            (ANY_ENTRY,),
+            lambda: self.storage.get_entries_version(),
+        )
+
+    async def topic_search_basic(
+        self, query: str, limit: int | None = None, offset: int | None = None
+    ) -> list[TopicName]:
+        return await self.storage.topic_search_basic(query, limit, offset)
+
+    async def get_latest_authors(
+        self, limit: int | None = None, offset: int | None = None
+    ) -> list[AuthorName]:
+        return await self.storage.get_latest_authors(limit, offset)
+
+    async def get_data_version(self) -> int:
+        return await self.storage.get_data_version()
+
+    async def get_random_entries(self, limit: int = 10) -> list[Entry]:
+        return await self.storage.get_random_entries(limit)
@@ -0,0 +1,116 @@
+import logging
+import os
+import re
+import weakref
+from functools import partial
+from os import getenv
+
+import sqlalchemy
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+
+logger = logging.getLogger(__name__)
+
+# applied to every new sqlite connection, see https://sqlite.org/pragma.html.
+# SQLITE_PRAGMAS changes them, e.g. "synchronous=FULL,mmap_size=0", and
+# SQLITE_PRAGMAS=none applies none of them.
+SQLITE_PRAGMAS = {
+    # readers and the writer do not block each other
+    "journal_mode": "WAL",
+    # with wal, this only syncs at checkpoints and cannot corrupt the database
+    "synchronous": "NORMAL",
+    # milliseconds to wait for a lock before "database is locked"
+    "busy_timeout": "5000",
+    "mmap_size": str(256 * 1024 * 1024),
+    # negative sizes are in kibibytes
+    "cache_size": str(-64 * 1024),
+    "temp_store": "MEMORY",
+}
+
+PRAGMA = re.compile(r"[a-z_]+=-?\w+", re.IGNORECASE)
+
+
+def in_memory(url: sqlalchemy.URL) -> bool:
+    database = url.database or ":memory:"
+    return url.get_backend_name() == "sqlite" and database == ":memory:"
+
+
+def parse_pragmas(setting: str) -> dict[str, str]:
+    """Read pragmas like "synchronous=FULL,mmap_size=0" over the defaults."""
+    if setting.strip().lower() == "none":
+        return {}
+
+    pragmas = dict(SQLITE_PRAGMAS)
+
+    for assignment in setting.split(","):
+        if not assignment.strip():
+            continue
+
+        name, separator, value = assignment.partition("=")
+        if not separator or not PRAGMA.fullmatch(f"{name.strip()}={value.strip()}"):
+            raise ValueError(f"bad sqlite pragma {assignment!r}")
+
+        pragmas[name.strip().lower()] = value.strip()
+
+    return pragmas
+
+
+def create_storage_engine(
+    url: str, echo: bool = False, pragmas: dict[str, str] | None = None
+) -> sqlalchemy.Engine:
+    """Create an engine with the connection settings of the dialect.
+
+    Every database but an in-memory sqlite one gets a pool of DB_POOL_SIZE
+    (5) connections plus DB_POOL_MAX_OVERFLOW (10). An in-memory sqlite
+    database lives as long as its connection, so every thread shares the one
+    connection that holds it. Connections to database servers are checked
+    before use and replaced after DB_POOL_RECYCLE (3600) seconds. SQLite
+    connections get pragmas, SQLITE_PRAGMAS unless given.
+    """
+    url = sqlalchemy.make_url(url)
+    options = {}
+
+    if in_memory(url):
+        options.update(poolclass=StaticPool, connect_args={"check_same_thread": False})
+    else:
+        options.update(
+            pool_size=int(getenv("DB_POOL_SIZE", "5")),
+            max_overflow=int(getenv("DB_POOL_MAX_OVERFLOW", "10")),
+        )
+
+    if url.get_backend_name() != "sqlite":
+        options.update(
+            pool_recycle=int(getenv("DB_POOL_RECYCLE", "3600")), pool_pre_ping=True
+        )
+        engine = sqlalchemy.create_engine(url, echo=echo, **options)
+        forget_connections_after_fork(engine)
+        return engine
+
+    if pragmas is None:
+        pragmas = parse_pragmas(getenv("SQLITE_PRAGMAS", ""))
+
+    logger.debug("sqlite pragmas: %s", pragmas)
+    engine = sqlalchemy.create_engine(url, echo=echo, **options)
+    forget_connections_after_fork(engine)
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        for name, value in pragmas.items():
+            dbapi_connection.execute(f"PRAGMA {name} = {value}")
+
+    return engine
+
+
+def forget_connections_after_fork(engine: sqlalchemy.Engine):
+    """Give a forked child, like a uwsgi worker, a new pool of connections.
+
+    The connections of the parent are left to it and not closed, as closing
+    them in the child would close them for the parent too. See
+    https://docs.sqlalchemy.org/en/20/core/pooling.html#using-connection-pools-with-multiprocessing-or-os-fork
+    """
+    os.register_at_fork(after_in_child=partial(_dispose, weakref.ref(engine)))
+
+
+def _dispose(reference: weakref.ref):
+    if (engine := reference()) is not None:
+        engine.dispose(close=False)
@@ -0,0 +1,29 @@
+from sozluk.storage.engine import create_storage_engine, in_memory
+from sozluk.storage.sqlalchemydatabase import SQLAlchemyDatabase
+from sozluk.storage.threadedsqlalchemydatabase import ThreadedSQLAlchemyDatabase
+
+THREADED_SCHEME_PREFIX = "threaded+"
+
+
+def open_storage(
+    url: str, echo: bool = False, migrate: bool = True
+) -> SQLAlchemyDatabase:
+    """Create the storage backend for a database url.
+
+    Urls starting with "threaded+" (e.g. "threaded+sqlite:///sozluk.sqlite")
+    get a backend that runs database work in a thread pool, any other url is
+    handed to SQLAlchemy as is and gets the inline backend. With migrate,
+    missing tables and indexes are created first.
+    """
+    if url.startswith(THREADED_SCHEME_PREFIX):
+        engine = create_storage_engine(
+            url.removeprefix(THREADED_SCHEME_PREFIX), echo=echo
+        )
+        # the one connection of an in-memory database is used a thread at a time
+        max_workers = 1 if in_memory(engine.url) else None
+        return ThreadedSQLAlchemyDatabase(
+            engine, max_workers=max_workers, migrate=migrate
+        )
+
+    engine = create_storage_engine(url, echo=echo)
+    return SQLAlchemyDatabase(engine, migrate=migrate)
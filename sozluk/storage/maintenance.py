@@ -0,0 +1,134 @@
+import logging
+import time
+from abc import ABC, abstractmethod
+
+import sqlalchemy
+from sqlalchemy import select
+from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
+
+logger = logging.getLogger(__name__)
+
+# rows read per transaction
+MAINTENANCE_BATCH_SIZE = 1000
+
+# seconds to sleep between transactions, so that the site can write meanwhile
+MAINTENANCE_PAUSE = 0.1
+
+
+class MaintenanceBase(DeclarativeBase):
+    pass
+
+
+class SQLAlchemyMaintenanceCheckpoint(MaintenanceBase):
+    """The last row a maintenance job has gone through."""
+
+    __tablename__ = "maintenance_checkpoints"
+    name = sqlalchemy.Column("name", sqlalchemy.String(50), primary_key=True)
+    last_id = sqlalchemy.Column("last_id", sqlalchemy.Integer, nullable=False)
+
+
+class MaintenanceJob(ABC):
+    """A change to the rows of a table with an integer primary key.
+
+    Rows are read in primary key order, a batch per transaction. Only the
+    rows that change are written, together with a checkpoint, so a job that
+    is stopped continues where it was left the next time it runs.
+    """
+
+    # identifies the checkpoint of the job
+    name: str
+
+    model: type[DeclarativeBase]
+
+    # columns that change() needs
+    columns: tuple[str, ...]
+
+    def where(self) -> sqlalchemy.ColumnElement[bool]:
+        """Rows that can possibly change, to skip reading the others."""
+        return sqlalchemy.true()
+
+    @abstractmethod
+    def change(self, row: sqlalchemy.Row) -> dict | None:
+        """New values of a row, None for a row that stays as it is."""
+
+    def changed(self, session: Session, rows: int):
+        """Called in the transaction of a batch that changed some rows."""
+
+
+def run_job(
+    engine: sqlalchemy.Engine,
+    job: MaintenanceJob,
+    batch_size: int = MAINTENANCE_BATCH_SIZE,
+    pause: float = MAINTENANCE_PAUSE,
+    restart: bool = False,
+) -> int:
+    """Run a job to the end of its table, returning the number of changed rows."""
+    MaintenanceBase.metadata.create_all(engine)
+    JobSession = sessionmaker(engine)
+
+    (key,) = job.model.__table__.primary_key.columns
+    identifier = job.model.__mapper__.get_property_by_column(key).key
+    columns = [getattr(job.model, column) for column in job.columns]
+
+    with JobSession() as session:
+        checkpoint = session.get(SQLAlchemyMaintenanceCheckpoint, job.name)
+
+        if checkpoint is None:
+            checkpoint = SQLAlchemyMaintenanceCheckpoint(name=job.name, last_id=0)
+            session.add(checkpoint)
+        elif restart:
+            checkpoint.last_id = 0
+
+        session.commit()
+
+        last_id = checkpoint.last_id
+        end_id = session.scalar(select(sqlalchemy.func.max(key))) or 0
+
+    changed = 0
+
+    while True:
+        with JobSession() as session:
+            rows = session.execute(
+                select(key, *columns)
+                .where(key > last_id, job.where())
+                .order_by(key)
+                .limit(batch_size)
+            ).all()
+
+            if not rows:
+                break
+
+            changes = [
+                {identifier: row[0], **values}
+                for row in rows
+                if (values := job.change(row)) is not None
+            ]
+
+            if changes:
+                session.execute(sqlalchemy.update(job.model), changes)
+                job.changed(session, len(changes))
+
+            last_id = rows[-1][0]
+            session.execute(
+                sqlalchemy.update(SQLAlchemyMaintenanceCheckpoint)
+                .where(SQLAlchemyMaintenanceCheckpoint.name == job.name)
+                .values(last_id=last_id)
+            )
+            session.commit()
+
+        changed += len(changes)
+        logger.info(
+            "%s: up to #%d of #%d, %d rows changed",
+            job.name,
+            last_id,
+            end_id,
+            changed,
+        )
+
+        if len(rows) < batch_size:
+            break
+
+        time.sleep(pause)
+
+    logger.info("%s: done, %d rows changed", job.name, changed)
+    return changed
@@ -1,7 +1,13 @@
+import hashlib
+import logging
+import math
+import random
 from datetime import UTC, datetime
+from typing import Callable, TypeVar
 
 import sqlalchemy
-from sqlalchemy import event, select
+from sqlalchemy import event, select, text
+from sqlalchemy.dialects import mysql, postgresql, sqlite
 from sqlalchemy.orm import (
     DeclarativeBase,
     Session,
@@ -12,27 +18,129 @@ from sqlalchemy.orm import (
 
 from sozluk.authorname import AuthorName
 from sozluk.entry import Entry, EntryID, EntrySketch, EntryText
-from sozluk.storage import EntryAddResponse, EntryDeleteResponse, SozlukStorage
+from sozluk.storage import (
+    ContentVersion,
+    EntryAddResponse,
+    EntryDeleteResponse,
+    EntryPage,
+    SozlukStorage,
+)
+from sozluk.storage.maintenance import MaintenanceJob, run_job
 from sozluk.topicname import TopicName
+from sozluk.turkishlowercasedstring import TurkishLowercasedString
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# random entries are drawn as random ids, a few rounds to step over the gaps
+# left by deleted entries before giving up and sorting the table randomly
+RANDOM_SAMPLE_ROUNDS = 4
+
+# sqlite only: a trigram full text index over topic names, kept in sync with
+# the topics table by triggers. trigrams cannot match names shorter than
+# three characters, those are removed from the index with a plain scan.
+SEARCH_INDEX_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS topics_search"
+    " USING fts5(name, tokenize='trigram case_sensitive 1')",
+    "CREATE TRIGGER IF NOT EXISTS topics_search_insert AFTER INSERT ON topics"
+    " BEGIN INSERT INTO topics_search(name) VALUES (new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS topics_search_delete AFTER DELETE ON topics"
+    " WHEN length(old.name) >= 3 BEGIN DELETE FROM topics_search"
+    " WHERE topics_search MATCH '\"' || replace(old.name, '\"', '\"\"') || '\"'"
+    " AND name = old.name; END",
+    "CREATE TRIGGER IF NOT EXISTS topics_search_delete_short AFTER DELETE ON topics"
+    " WHEN length(old.name) < 3 BEGIN DELETE FROM topics_search"
+    " WHERE name = old.name; END",
+)
 
 
 @event.listens_for(Session, "after_flush")
 def delete_tag_orphans(session, ctx):
-    flag = False
+    """Delete the topics and authors left without entries by deleted entries."""
+    deleted = [
+        instance
+        for instance in session.deleted
+        if isinstance(instance, SQLAlchemyEntry)
+    ]
+
+    if not deleted:
+        return
+
+    for model, column in (
+        (SQLAlchemyTopic, SQLAlchemyEntry.topic_name),
+        (SQLAlchemyAuthor, SQLAlchemyEntry.author_name),
+    ):
+        names = {getattr(entry, column.key) for entry in deleted}
+        orphans = session.execute(
+            sqlalchemy.delete(model).where(
+                model.name.in_(names),
+                ~sqlalchemy.exists().where(column == model.name),
+            ),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+        bump_counter(session, model.__tablename__, -orphans)
 
-    for instance in session.deleted:
-        if isinstance(instance, SQLAlchemyEntry):
-            flag = True
-            break
 
-    if flag:
-        session.query(SQLAlchemyAuthor).filter(~SQLAlchemyAuthor.entries.any()).delete(
-            synchronize_session=False
+def bump_counter(session, name: str, delta: int):
+    """Change a row count kept in the counters table, in the current transaction."""
+    if delta:
+        session.execute(
+            sqlalchemy.update(SQLAlchemyCounter)
+            .where(SQLAlchemyCounter.name == name)
+            .values(value=SQLAlchemyCounter.value + delta)
         )
-        session.query(SQLAlchemyTopic).filter(~SQLAlchemyTopic.entries.any()).delete(
-            synchronize_session=False
+
+
+def _upsert(
+    session,
+    model,
+    values: dict | list[dict],
+    update: list[str] | None,
+    keep_greatest: bool = False,
+):
+    """Build an insert that skips or updates a row whose primary key is taken.
+
+    A list of values inserts many rows in one statement. With keep_greatest,
+    an updated column keeps the greater of its stored and new value, so
+    writers committing out of order cannot move it back. Returns None on
+    dialects without such a statement.
+    """
+    dialect = session.get_bind().dialect.name
+
+    def updated(column: str, new):
+        if not keep_greatest:
+            return new
+        stored = model.__table__.c[column]
+        return sqlalchemy.case((new > stored, new), else_=stored)
+
+    if dialect in ("sqlite", "postgresql"):
+        module = sqlite if dialect == "sqlite" else postgresql
+        statement = module.insert(model).values(values)
+        if update is None:
+            return statement.on_conflict_do_nothing()
+        return statement.on_conflict_do_update(
+            index_elements=model.__table__.primary_key.columns,
+            set_={
+                column: updated(column, statement.excluded[column]) for column in update
+            },
+        )
+
+    if dialect in ("mysql", "mariadb"):
+        statement = mysql.insert(model).values(values)
+        if update is None:
+            return statement.prefix_with("IGNORE")
+        return statement.on_duplicate_key_update(
+            {column: updated(column, statement.inserted[column]) for column in update}
         )
 
+    return None
+
+
+def entry_text_hash(text: str) -> str:
+    """Hash of an entry text, blind to differences in whitespace."""
+    return hashlib.sha256(" ".join(text.split()).encode()).hexdigest()
+
 
 class Base(DeclarativeBase):
     pass
@@ -40,24 +148,33 @@ class Base(DeclarativeBase):
 
 class SQLAlchemyEntry(Base):
     __tablename__ = "entries"
-    __table_args__ = {"sqlite_autoincrement": True}
+    __table_args__ = (
+        # a topic cannot have the same definition twice. text_hash is null only
+        # for duplicates that were stored before this was enforced.
+        sqlalchemy.Index(
+            "ux_entries_topic_name_text_hash", "topic_name", "text_hash", unique=True
+        ),
+        {"sqlite_autoincrement": True},
+    )
     identifier = sqlalchemy.Column(
         "id", sqlalchemy.Integer, primary_key=True, autoincrement=True
     )
-    topic_name = mapped_column(sqlalchemy.ForeignKey("topics.name"))
+    topic_name = mapped_column(sqlalchemy.ForeignKey("topics.name"), index=True)
     topic = relationship("SQLAlchemyTopic", back_populates="entries")
-    author_name = mapped_column(sqlalchemy.ForeignKey("authors.name"))
+    author_name = mapped_column(sqlalchemy.ForeignKey("authors.name"), index=True)
     author = relationship("SQLAlchemyAuthor", back_populates="entries")
     utc_time = sqlalchemy.Column("utc_time", sqlalchemy.DateTime(), nullable=False)
     text = sqlalchemy.Column("text", sqlalchemy.UnicodeText(), nullable=False)
+    text_hash = sqlalchemy.Column("text_hash", sqlalchemy.String(64))
 
     def to_Entry(self):
+        # validated when they were written
         return Entry(
-            topic=TopicName(self.topic_name),
-            author=AuthorName(self.author_name),
+            topic=TopicName.trusted(self.topic_name),
+            author=AuthorName.trusted(self.author_name),
             utc_time=self.utc_time,
             identifier=self.to_EntryID(),
-            text=EntryText(self.text),
+            text=EntryText.trusted(self.text),
         )
 
     def to_EntryID(self):
@@ -73,6 +190,7 @@ class SQLAlchemyTopic(Base):
         "SQLAlchemyEntry", back_populates="topic", cascade="all,delete"
     )
 
+
 class SQLAlchemyAuthor(Base):
     __tablename__ = "authors"
     name = sqlalchemy.Column(
@@ -83,29 +201,313 @@ class SQLAlchemyAuthor(Base):
     )
 
 
+class SQLAlchemyTopicActivity(Base):
+    __tablename__ = "topic_activity"
+    name = sqlalchemy.Column("name", sqlalchemy.String(50), primary_key=True)
+    last_entry_id = sqlalchemy.Column(
+        "last_entry_id", sqlalchemy.Integer, nullable=False, index=True
+    )
+
+
+class SQLAlchemyAuthorActivity(Base):
+    __tablename__ = "author_activity"
+    name = sqlalchemy.Column("name", sqlalchemy.String(40), primary_key=True)
+    last_entry_id = sqlalchemy.Column(
+        "last_entry_id", sqlalchemy.Integer, nullable=False, index=True
+    )
+
+
+class SQLAlchemyCounter(Base):
+    """Row counts of other tables, named after them."""
+
+    __tablename__ = "counters"
+    name = sqlalchemy.Column("name", sqlalchemy.String(20), primary_key=True)
+    value = sqlalchemy.Column("value", sqlalchemy.Integer, nullable=False)
+
+
+# tables with a row count in the counters table
+COUNTED = (SQLAlchemyEntry, SQLAlchemyTopic, SQLAlchemyAuthor)
+
+# a counter that goes up with every change of the stored data, so other
+# processes can tell when what they have cached is out of date
+DATA_VERSION = "data_version"
+
+# activity tables and the entry column they follow
+ACTIVITY = (
+    (SQLAlchemyTopicActivity, SQLAlchemyEntry.topic_name),
+    (SQLAlchemyAuthorActivity, SQLAlchemyEntry.author_name),
+)
+
+
+class FillTextHashes(MaintenanceJob):
+    name = "fill_text_hashes"
+    model = SQLAlchemyEntry
+    columns = ("text",)
+
+    def where(self):
+        return SQLAlchemyEntry.text_hash.is_(None)
+
+    def change(self, row):
+        return {"text_hash": entry_text_hash(row.text)}
+
+
+class FixCRLF(MaintenanceJob):
+    name = "fix_crlf"
+    model = SQLAlchemyEntry
+    columns = ("text",)
+
+    def where(self):
+        return SQLAlchemyEntry.text.contains("\r\n")
+
+    def change(self, row):
+        return {"text": row.text.replace("\r\n", "\n")}
+
+    def changed(self, session, rows):
+        bump_counter(session, DATA_VERSION, 1)
+
+
 class SQLAlchemyDatabase(SozlukStorage):
-    def __init__(
-        self,
-        engine: sqlalchemy.Engine,
-    ) -> None:
+    def __init__(self, engine: sqlalchemy.Engine, migrate: bool = True) -> None:
         self.engine = engine
+        self.has_search_index = False
+
+        self.Session = sessionmaker(self.engine)
+
+        if migrate:
+            self.migrate()
+        else:
+            self.has_search_index = self._find_search_index()
+
+    def migrate(self):
+        """Create missing tables and indexes, filling the new ones."""
+        existing = set(sqlalchemy.inspect(self.engine).get_table_names())
 
         Base.metadata.create_all(self.engine)
 
-        self.Session = sessionmaker(self.engine)
+        if SQLAlchemyEntry.__tablename__ in existing:
+            self._migrate_entries()
+
+        with self.engine.begin() as connection:
+            for model, column in ACTIVITY:
+                if model.__tablename__ not in existing:
+                    connection.execute(
+                        sqlalchemy.insert(model).from_select(
+                            ["name", "last_entry_id"],
+                            select(
+                                column, sqlalchemy.func.max(SQLAlchemyEntry.identifier)
+                            ).group_by(column),
+                        )
+                    )
+
+            self.has_search_index = self._create_search_index(connection)
+
+        if SQLAlchemyCounter.__tablename__ not in existing:
+            self.recount()
+
+        with self.Session() as session:
+            self._insert_missing_counter(session, DATA_VERSION)
+            session.commit()
+
+    def _migrate_entries(self):
+        """Bring an entries table created by an older version up to date.
+
+        text_hash is added and filled in small transactions, so the site can
+        keep serving meanwhile. Duplicate definitions from before the unique
+        index existed keep a null text_hash.
+        """
+        table = SQLAlchemyEntry.__table__
+        inspector = sqlalchemy.inspect(self.engine)
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+
+        if "text_hash" not in columns:
+            with self.engine.begin() as connection:
+                connection.execute(
+                    text(f"ALTER TABLE {table.name} ADD COLUMN text_hash VARCHAR(64)")
+                )
+
+        unique_index = "ux_entries_topic_name_text_hash"
+
+        if unique_index not in indexes:
+            run_job(self.engine, FillTextHashes(), pause=0)
+
+        with self.engine.begin() as connection:
+            if unique_index not in indexes:
+                self._forget_duplicate_text_hashes(connection)
+
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+    @staticmethod
+    def _forget_duplicate_text_hashes(connection: sqlalchemy.Connection):
+        entry = SQLAlchemyEntry.__table__.c
+        first = (
+            select(sqlalchemy.func.min(entry.id))
+            .group_by(entry.topic_name, entry.text_hash)
+            .where(entry.text_hash.is_not(None))
+        )
+
+        duplicates = connection.execute(
+            sqlalchemy.update(SQLAlchemyEntry.__table__)
+            .where(entry.text_hash.is_not(None), entry.id.not_in(first))
+            .values(text_hash=None)
+        ).rowcount
+
+        if duplicates:
+            logger.warning("%d duplicate definitions were left unhashed", duplicates)
+
+    def _find_search_index(self) -> bool:
+        """Whether an earlier migrate() has created the search index."""
+        if self.engine.dialect.name != "sqlite":
+            return False
+
+        with self.engine.connect() as connection:
+            return bool(
+                connection.scalar(
+                    text("SELECT 1 FROM sqlite_master WHERE name = 'topics_search'")
+                )
+            )
+
+    @staticmethod
+    def _create_search_index(connection: sqlalchemy.Connection) -> bool:
+        if connection.dialect.name != "sqlite":
+            return False
+
+        exists = connection.scalar(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'topics_search'")
+        )
+
+        try:
+            for statement in SEARCH_INDEX_DDL:
+                connection.execute(text(statement))
+        except sqlalchemy.exc.OperationalError as e:
+            logger.warning("no trigram search index, topic search will be slow: %s", e)
+            return False
+
+        if not exists:
+            connection.execute(
+                text("INSERT INTO topics_search(name) SELECT name FROM topics")
+            )
+
+        return True
+
+    async def _run(self, function: Callable[..., T], *args) -> T:
+        """Run a blocking storage operation.
+
+        Operations are run inline, subclasses may offload them elsewhere.
+        """
+        return function(*args)
+
+    @staticmethod
+    def _insert_missing(session, model, **values) -> bool:
+        """Insert a row unless its primary key is taken, telling if it did.
+
+        This is a single INSERT ... ON CONFLICT DO NOTHING (or the dialect's
+        equivalent), so no query is needed first and no race is possible.
+        """
+        statement = _upsert(session, model, values, update=None)
+
+        if statement is None:
+            key = model.__table__.primary_key.columns.keys()
+            if session.get(model, tuple(values[column] for column in key)):
+                return False
+            statement = sqlalchemy.insert(model).values(**values)
+
+        inserted = session.execute(statement).rowcount == 1
+        if inserted:
+            bump_counter(session, model.__tablename__, 1)
+
+        return inserted
+
+    @staticmethod
+    def _insert_all_missing(session, model, rows: list[dict]):
+        """_insert_missing for many rows, in one statement where possible."""
+        statement = _upsert(session, model, rows, update=None) if rows else None
+
+        if statement is None:
+            for values in rows:
+                SQLAlchemyDatabase._insert_missing(session, model, **values)
+            return
+
+        bump_counter(session, model.__tablename__, session.execute(statement).rowcount)
 
     @staticmethod
-    def _get_or_create(session, model, **kwargs):
-        instance = session.query(model).filter_by(**kwargs).first()
-        if instance:
-            return instance
+    def _insert_missing_counter(session, name: str):
+        values = {"name": name, "value": 0}
+        statement = _upsert(session, SQLAlchemyCounter, values, update=None)
+
+        if statement is not None:
+            session.execute(statement)
+        elif session.get(SQLAlchemyCounter, name) is None:
+            session.add(SQLAlchemyCounter(**values))
+
+    @staticmethod
+    def _record_activity(session, topic_name: str, author_name: str, entry_id: int):
+        """Mark an entry as the latest one of its topic and author."""
+        for (model, _), name in zip(ACTIVITY, (topic_name, author_name)):
+            SQLAlchemyDatabase._set_activity(session, model, name, entry_id)
+
+    @staticmethod
+    def _set_activity(session, model, name: str, entry_id: int):
+        values = {"name": name, "last_entry_id": entry_id}
+        statement = _upsert(
+            session, model, values, update=["last_entry_id"], keep_greatest=True
+        )
+
+        if statement is not None:
+            session.execute(statement)
+            return
+
+        moved = session.execute(
+            sqlalchemy.update(model)
+            .where(model.name == name, model.last_entry_id < entry_id)
+            .values(last_entry_id=entry_id)
+        )
+        if moved.rowcount == 0 and session.get(model, name) is None:
+            session.add(model(**values))
+
+    @staticmethod
+    def _set_all_activity(session, model, latest: dict[str, int]):
+        """_set_activity for many names, in one statement where possible."""
+        rows = [
+            {"name": name, "last_entry_id": entry_id}
+            for name, entry_id in latest.items()
+        ]
+        statement = (
+            _upsert(session, model, rows, update=["last_entry_id"], keep_greatest=True)
+            if rows
+            else None
+        )
+
+        if statement is None:
+            for name, entry_id in latest.items():
+                SQLAlchemyDatabase._set_activity(session, model, name, entry_id)
         else:
-            instance = model(**kwargs)
-            session.add(instance)
-            session.commit()
-            return instance
+            session.execute(statement)
+
+    @staticmethod
+    def _refresh_activity(session, topic_name: str, author_name: str):
+        """Find the latest entries of a topic and an author after a deletion."""
+        for (model, column), name in zip(ACTIVITY, (topic_name, author_name)):
+            last_entry_id = session.scalar(
+                select(sqlalchemy.func.max(SQLAlchemyEntry.identifier)).where(
+                    column == name
+                )
+            )
+
+            if last_entry_id is None:
+                session.execute(sqlalchemy.delete(model).where(model.name == name))
+            else:
+                session.execute(
+                    sqlalchemy.update(model)
+                    .where(model.name == name)
+                    .values(last_entry_id=last_entry_id)
+                )
 
     async def get_entry(self, entry_id: EntryID) -> Entry | None:
+        return await self._run(self._get_entry, entry_id)
+
+    def _get_entry(self, entry_id: EntryID) -> Entry | None:
         with self.Session() as session:
             entry = session.scalar(
                 select(SQLAlchemyEntry).where(
@@ -118,35 +520,190 @@ class SQLAlchemyDatabase(SozlukStorage):
 
             return entry.to_Entry()
 
+    async def get_first_entry(self) -> Entry | None:
+        return await self._run(self._get_edge_entry, SQLAlchemyEntry.identifier)
+
+    async def get_last_entry(self) -> Entry | None:
+        return await self._run(self._get_edge_entry, SQLAlchemyEntry.identifier.desc())
+
+    def _get_edge_entry(self, order) -> Entry | None:
+        with self.Session() as session:
+            entry = session.scalar(select(SQLAlchemyEntry).order_by(order).limit(1))
+
+            if entry is None:
+                return None
+
+            return entry.to_Entry()
+
+    async def get_entries(
+        self, after: EntryID | None = None, limit: int = 1000
+    ) -> list[Entry]:
+        return await self._run(self._get_entries, after, limit)
+
+    def _get_entries(self, after: EntryID | None, limit: int) -> list[Entry]:
+        with self.Session() as session:
+            rows = session.scalars(
+                select(SQLAlchemyEntry)
+                .where(SQLAlchemyEntry.identifier > (after.value if after else 0))
+                .order_by(SQLAlchemyEntry.identifier)
+                .limit(limit)
+            )
+
+            return [row.to_Entry() for row in rows]
+
     async def add_entry(
         self, sketch: EntrySketch
     ) -> tuple[EntryAddResponse, EntryID | None]:
-        with self.Session() as session:
-            if session.scalar(
-                select(SQLAlchemyEntry).where(
-                    (SQLAlchemyEntry.topic.has(SQLAlchemyTopic.name == sketch.topic))
-                    & (SQLAlchemyEntry.text == sketch.text)
-                )
-            ):
-                # not sure if some race condition could happen here
-                return EntryAddResponse.DEFINITION_EXISTS, None
+        return await self._run(self._add_entry, sketch)
 
+    def _add_entry(
+        self, sketch: EntrySketch
+    ) -> tuple[EntryAddResponse, EntryID | None]:
+        with self.Session() as session:
             new_entry = SQLAlchemyEntry(
                 text=sketch.text,
+                text_hash=entry_text_hash(sketch.text),
                 utc_time=datetime.now(UTC),
-                topic=self._get_or_create(session, SQLAlchemyTopic, name=sketch.topic),
-                author=self._get_or_create(
-                    session, SQLAlchemyAuthor, name=sketch.author
-                ),
+                topic_name=sketch.topic,
+                author_name=sketch.author,
             )
+
+            self._insert_missing(session, SQLAlchemyTopic, name=sketch.topic)
+            self._insert_missing(session, SQLAlchemyAuthor, name=sketch.author)
             session.add(new_entry)
-            session.commit()
 
+            try:
+                session.flush()
+            except sqlalchemy.exc.IntegrityError:
+                # the unique index on topic and text hash
+                session.rollback()
+                return EntryAddResponse.DEFINITION_EXISTS, None
+
+            self._record_activity(
+                session, sketch.topic, sketch.author, new_entry.identifier
+            )
+            bump_counter(session, SQLAlchemyEntry.__tablename__, 1)
+            bump_counter(session, DATA_VERSION, 1)
+            # read before the commit expires it, which would take a query
             new_id = new_entry.to_EntryID()
+            session.commit()
 
         return EntryAddResponse.SUCCESS, new_id
 
+    async def add_entries(
+        self, sketches: list[EntrySketch]
+    ) -> list[tuple[EntryAddResponse, EntryID | None]]:
+        return await self._run(self._add_entries, sketches)
+
+    def _add_entries(
+        self, sketches: list[EntrySketch]
+    ) -> list[tuple[EntryAddResponse, EntryID | None]]:
+        hashes = [entry_text_hash(sketch.text) for sketch in sketches]
+
+        with self.Session() as session:
+            taken = set(
+                session.execute(
+                    select(SQLAlchemyEntry.topic_name, SQLAlchemyEntry.text_hash).where(
+                        SQLAlchemyEntry.topic_name.in_({s.topic for s in sketches}),
+                        SQLAlchemyEntry.text_hash.in_(set(hashes)),
+                    )
+                ).all()
+            )
+
+            new_entries: list[dict | None] = []
+            utc_time = datetime.now(UTC)
+
+            for sketch, text_hash in zip(sketches, hashes):
+                if (sketch.topic, text_hash) in taken:
+                    new_entries.append(None)
+                    continue
+
+                taken.add((sketch.topic, text_hash))
+                new_entries.append(
+                    dict(
+                        text=sketch.text,
+                        text_hash=text_hash,
+                        utc_time=utc_time,
+                        topic_name=sketch.topic,
+                        author_name=sketch.author,
+                    )
+                )
+
+            added = [values for values in new_entries if values is not None]
+
+            for model, column in (
+                (SQLAlchemyTopic, "topic_name"),
+                (SQLAlchemyAuthor, "author_name"),
+            ):
+                names = dict.fromkeys(values[column] for values in added)
+                self._insert_all_missing(
+                    session, model, [{"name": name} for name in names]
+                )
+
+            try:
+                identifiers = self._insert_entries(session, added)
+            except sqlalchemy.exc.IntegrityError:
+                # a concurrent writer added one of the definitions after the
+                # lookup above, find out which one entry by entry
+                session.rollback()
+                return [self._add_entry(sketch) for sketch in sketches]
+
+            for model, column in ACTIVITY:
+                latest = {
+                    values[column.key]: identifier
+                    for values, identifier in zip(added, identifiers)
+                }
+                self._set_all_activity(session, model, latest)
+            bump_counter(session, SQLAlchemyEntry.__tablename__, len(added))
+            bump_counter(session, DATA_VERSION, 1 if added else 0)
+            session.commit()
+
+        identifiers = iter(identifiers)
+        return [
+            (
+                (EntryAddResponse.DEFINITION_EXISTS, None)
+                if values is None
+                else (EntryAddResponse.SUCCESS, EntryID(next(identifiers)))
+            )
+            for values in new_entries
+        ]
+
+    @staticmethod
+    def _insert_entries(session, rows: list[dict]) -> list[int]:
+        """Insert entries, returning their identifiers in the order of rows.
+
+        Where the dialect returns the rows of a many row insert, that takes a
+        single statement. The rows returned are matched to the given ones by
+        topic and text hash, which are unique, as their order is not defined.
+        """
+        if not rows:
+            return []
+
+        if not session.get_bind().dialect.insert_executemany_returning:
+            return [
+                session.execute(
+                    sqlalchemy.insert(SQLAlchemyEntry).values(values)
+                ).inserted_primary_key[0]
+                for values in rows
+            ]
+
+        inserted = session.execute(
+            sqlalchemy.insert(SQLAlchemyEntry).returning(
+                SQLAlchemyEntry.identifier,
+                SQLAlchemyEntry.topic_name,
+                SQLAlchemyEntry.text_hash,
+            ),
+            rows,
+        )
+        identifiers = {(topic, text_hash): i for i, topic, text_hash in inserted}
+        return [
+            identifiers[values["topic_name"], values["text_hash"]] for values in rows
+        ]
+
     async def get_topic(self, topic_name: TopicName) -> list[Entry]:
+        return await self._run(self._get_topic, topic_name)
+
+    def _get_topic(self, topic_name: TopicName) -> list[Entry]:
         with self.Session() as session:
             entries = session.scalars(
                 select(SQLAlchemyEntry).where(SQLAlchemyEntry.topic_name == topic_name)
@@ -157,6 +714,9 @@ class SQLAlchemyDatabase(SozlukStorage):
             return list(entries)
 
     async def get_author(self, author_name: AuthorName) -> list[Entry]:
+        return await self._run(self._get_author, author_name)
+
+    def _get_author(self, author_name: AuthorName) -> list[Entry]:
         with self.Session() as session:
             entries = session.scalars(
                 select(SQLAlchemyEntry).where(
@@ -168,7 +728,126 @@ class SQLAlchemyDatabase(SozlukStorage):
 
             return list(entries)
 
+    async def get_topic_page(
+        self,
+        topic_name: TopicName,
+        before: EntryID | None = None,
+        after: EntryID | None = None,
+        limit: int = 25,
+    ) -> EntryPage:
+        return await self._run(
+            self._get_entry_page,
+            SQLAlchemyEntry.topic_name == topic_name,
+            before,
+            after,
+            limit,
+        )
+
+    async def get_author_page(
+        self,
+        author_name: AuthorName,
+        before: EntryID | None = None,
+        after: EntryID | None = None,
+        limit: int = 25,
+    ) -> EntryPage:
+        return await self._run(
+            self._get_entry_page,
+            SQLAlchemyEntry.author_name == author_name,
+            before,
+            after,
+            limit,
+        )
+
+    async def get_topic_version(self, topic_name: TopicName) -> ContentVersion:
+        return await self._run(
+            self._get_version, SQLAlchemyEntry.topic_name == topic_name
+        )
+
+    async def get_author_version(self, author_name: AuthorName) -> ContentVersion:
+        return await self._run(
+            self._get_version, SQLAlchemyEntry.author_name == author_name
+        )
+
+    async def get_entries_version(self) -> ContentVersion:
+        return await self._run(self._get_version, None)
+
+    def _get_version(
+        self, condition: sqlalchemy.ColumnElement[bool] | None
+    ) -> ContentVersion:
+        identifier = SQLAlchemyEntry.identifier
+
+        with self.Session() as session:
+            if condition is None:
+                # counting the whole table is a scan, the counter is not
+                last_entry_id = session.scalar(select(sqlalchemy.func.max(identifier)))
+                entry_count = session.scalar(
+                    select(SQLAlchemyCounter.value).where(
+                        SQLAlchemyCounter.name == SQLAlchemyEntry.__tablename__
+                    )
+                )
+            else:
+                last_entry_id, entry_count = session.execute(
+                    select(
+                        sqlalchemy.func.max(identifier), sqlalchemy.func.count()
+                    ).where(condition)
+                ).one()
+
+            last_modified = session.scalar(
+                select(SQLAlchemyEntry.utc_time).where(identifier == last_entry_id)
+            )
+
+            return ContentVersion(
+                last_entry_id=last_entry_id or 0,
+                entry_count=entry_count,
+                last_modified=last_modified and last_modified.replace(tzinfo=UTC),
+            )
+
+    def _get_entry_page(
+        self,
+        condition: sqlalchemy.ColumnElement[bool],
+        before: EntryID | None,
+        after: EntryID | None,
+        limit: int,
+    ) -> EntryPage:
+        identifier = SQLAlchemyEntry.identifier
+
+        def exists(where):
+            return session.scalar(select(sqlalchemy.exists().where(condition, where)))
+
+        with self.Session() as session:
+            if before is not None:
+                rows = session.scalars(
+                    select(SQLAlchemyEntry)
+                    .where(condition, identifier < before.value)
+                    .order_by(identifier.desc())
+                    .limit(limit)
+                ).all()
+                rows.reverse()
+            else:
+                rows = session.scalars(
+                    select(SQLAlchemyEntry)
+                    .where(condition, identifier > (after.value if after else 0))
+                    .order_by(identifier)
+                    .limit(limit)
+                ).all()
+
+            if rows:
+                has_previous = exists(identifier < rows[0].identifier)
+                has_next = exists(identifier > rows[-1].identifier)
+            else:
+                has_previous = after is not None and exists(identifier <= after.value)
+                has_next = before is not None and exists(identifier >= before.value)
+
+            return EntryPage(
+                entries=[row.to_Entry() for row in rows],
+                has_previous=has_previous,
+                has_next=has_next,
+            )
+
     async def del_entry(self, entry_id: EntryID) -> EntryDeleteResponse:
+        return await self._run(self._del_entry, entry_id)
+
+    def _del_entry(self, entry_id: EntryID) -> EntryDeleteResponse:
         with self.Session() as session:
             entry = session.scalar(
                 select(SQLAlchemyEntry).where(
@@ -178,87 +857,194 @@ class SQLAlchemyDatabase(SozlukStorage):
 
             if not entry:
                 return EntryDeleteResponse.ENTRY_NOT_FOUND
+            topic_name, author_name = entry.topic_name, entry.author_name
+
             session.delete(entry)
+            session.flush()
+
+            self._refresh_activity(session, topic_name, author_name)
+            bump_counter(session, SQLAlchemyEntry.__tablename__, -1)
+            bump_counter(session, DATA_VERSION, 1)
             session.commit()
         return EntryDeleteResponse.SUCCESS
 
-    @property
-    async def author_count(self) -> int:
+    def _count(self, model) -> int:
         with self.Session() as session:
             return session.scalar(
-                select(sqlalchemy.func.count()).select_from(SQLAlchemyAuthor)
+                select(SQLAlchemyCounter.value).where(
+                    SQLAlchemyCounter.name == model.__tablename__
+                )
             )
 
+    @property
+    async def author_count(self) -> int:
+        return await self._run(self._count, SQLAlchemyAuthor)
+
     @property
     async def topic_count(self) -> int:
-        with self.Session() as session:
-            return session.scalar(
-                select(sqlalchemy.func.count()).select_from(SQLAlchemyTopic)
-            )
+        return await self._run(self._count, SQLAlchemyTopic)
 
     @property
     async def entry_count(self) -> int:
+        return await self._run(self._count, SQLAlchemyEntry)
+
+    def recount(self):
+        """Count the rows of the counted tables again, fixing any drift."""
         with self.Session() as session:
-            return session.scalar(
-                select(sqlalchemy.func.count()).select_from(SQLAlchemyEntry)
+            for model in COUNTED:
+                session.merge(
+                    SQLAlchemyCounter(
+                        name=model.__tablename__,
+                        value=session.scalar(
+                            select(sqlalchemy.func.count()).select_from(model)
+                        ),
+                    )
+                )
+
+            bump_counter(session, DATA_VERSION, 1)
+            session.commit()
+
+    async def get_data_version(self) -> int:
+        return await self._run(self._get_data_version)
+
+    def _get_data_version(self) -> int:
+        # read on every request, a plain connection skips the orm overhead
+        with self.engine.connect() as connection:
+            return connection.scalar(
+                select(SQLAlchemyCounter.value).where(
+                    SQLAlchemyCounter.name == DATA_VERSION
+                )
             )
 
     async def topic_search_basic(
-        self, query: str, limit: int | None = None
+        self, query: str, limit: int | None = None, offset: int | None = None
     ) -> list[TopicName]:
+        return await self._run(self._topic_search_basic, query, limit, offset)
+
+    def _topic_search_basic(
+        self, query: str, limit: int | None, offset: int | None
+    ) -> list[TopicName]:
+        query = TurkishLowercasedString(query)
+
+        # prefix matches first, then alphabetically
+        order = (
+            sqlalchemy.func.substr(SQLAlchemyTopic.name, 1, len(query)) == query
+        ).desc(), SQLAlchemyTopic.name
+
+        if self.has_search_index and len(query) >= 3:
+            search = sqlalchemy.table("topics_search", sqlalchemy.column("name"))
+            phrase = '"' + query.replace('"', '""') + '"'
+            condition = SQLAlchemyTopic.name.in_(
+                select(search.c.name).where(
+                    sqlalchemy.literal_column("topics_search").op("MATCH")(phrase)
+                )
+            )
+        else:
+            condition = SQLAlchemyTopic.name.contains(query, autoescape=True)
+
         with self.Session() as session:
             topics = session.scalars(
                 select(SQLAlchemyTopic.name)
-                .where(SQLAlchemyTopic.name.like(rf"%{query}%"))
-                .order_by(SQLAlchemyTopic.name)
+                .where(condition)
+                .order_by(*order)
+                .offset(offset)
+                .limit(limit)
             )
 
-            return list(map(TopicName, topics))
+            return list(map(TopicName.trusted, topics))
 
     async def get_latest_authors(
         self, limit: int | None = None, offset: int | None = None
+    ) -> list[AuthorName]:
+        return await self._run(self._get_latest_authors, limit, offset)
+
+    def _get_latest_authors(
+        self, limit: int | None, offset: int | None
     ) -> list[AuthorName]:
         with self.Session() as session:
             authors = session.scalars(
-                sqlalchemy.select(SQLAlchemyEntry.author_name)
-                .distinct()
-                .order_by(SQLAlchemyEntry.identifier.desc())
+                select(SQLAlchemyAuthorActivity.name)
+                .order_by(SQLAlchemyAuthorActivity.last_entry_id.desc())
                 .offset(offset)
                 .limit(limit)
             )
 
-            authors = list(map(AuthorName, authors))
+            authors = list(map(AuthorName.trusted, authors))
 
             return authors
 
     async def get_latest_topics(
         self, limit: int | None = None, offset: int | None = None
+    ) -> list[TopicName]:
+        return await self._run(self._get_latest_topics, limit, offset)
+
+    def _get_latest_topics(
+        self, limit: int | None, offset: int | None
     ) -> list[TopicName]:
         with self.Session() as session:
             topics = session.scalars(
-                select(SQLAlchemyEntry.topic_name)
-                .distinct()
-                .order_by(SQLAlchemyEntry.identifier.desc())
+                select(SQLAlchemyTopicActivity.name)
+                .order_by(SQLAlchemyTopicActivity.last_entry_id.desc())
                 .offset(offset)
                 .limit(limit)
             )
 
-            topics = list(map(TopicName, topics))
+            topics = list(map(TopicName.trusted, topics))
 
             return topics
 
     async def get_random_entries(self, limit: int = 10) -> list[Entry]:
+        return await self._run(self._get_random_entries, limit)
+
+    def _get_random_entries(self, limit: int) -> list[Entry]:
+        identifier = SQLAlchemyEntry.identifier
+
         with self.Session() as session:
-            rows = session.scalars(
-                select(SQLAlchemyEntry).order_by(sqlalchemy.func.random()).limit(limit)
+            # separate queries, sqlite only reads min or max off the index alone
+            low = session.scalar(select(sqlalchemy.func.min(identifier)))
+            high = session.scalar(select(sqlalchemy.func.max(identifier)))
+
+            if low is None:
+                return []
+
+            count = session.scalar(
+                select(SQLAlchemyCounter.value).where(
+                    SQLAlchemyCounter.name == SQLAlchemyEntry.__tablename__
+                )
             )
-            return list(map(lambda row: row.to_Entry(), rows))
+            # share of the ids in [low, high] that still belong to an entry
+            density = max(count or 1, 1) / (high - low + 1)
 
-    def fix_crlf(self):
-        with self.Session() as session:
-            entries = session.scalars(select(SQLAlchemyEntry))
+            found = {}
 
-            for entry in entries:
-                entry.text = str(entry.text).replace("\r\n", "\n")
+            for _ in range(RANDOM_SAMPLE_ROUNDS):
+                wanted = limit - len(found)
+                if wanted <= 0:
+                    break
 
-            session.commit()
+                draws = min(math.ceil(wanted / density * 1.5), 10 * limit + 100)
+                candidates = {random.randint(low, high) for _ in range(draws)}
+                candidates.difference_update(found)
+
+                for row in session.scalars(
+                    select(SQLAlchemyEntry).where(identifier.in_(candidates))
+                ):
+                    found[row.identifier] = row
+
+            rows = list(found.values())
+            random.shuffle(rows)
+            rows = rows[:limit]
+
+            if len(rows) < limit:
+                rows += session.scalars(
+                    select(SQLAlchemyEntry)
+                    .where(identifier.not_in(found))
+                    .order_by(sqlalchemy.func.random())
+                    .limit(limit - len(rows))
+                )
+
+            return list(map(lambda row: row.to_Entry(), rows))
+
+    def fix_crlf(self, restart: bool = False) -> int:
+        """Replace CRLF line endings in the texts of entries."""
+        return run_job(self.engine, FixCRLF(), restart=restart)
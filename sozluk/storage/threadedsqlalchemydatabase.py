@@ -0,0 +1,54 @@
+import asyncio
+import contextvars
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, TypeVar
+
+import sqlalchemy
+
+from sozluk.storage.sqlalchemydatabase import SQLAlchemyDatabase
+
+T = TypeVar("T")
+
+
+class ThreadedSQLAlchemyDatabase(SQLAlchemyDatabase):
+    """SQLAlchemyDatabase that runs blocking session work in a thread pool.
+
+    The event loop stays free while a query or a commit is waiting on the
+    database, so concurrent coroutines can make progress in the meantime.
+    """
+
+    def __init__(
+        self,
+        engine: sqlalchemy.Engine,
+        max_workers: int | None = None,
+        migrate: bool = True,
+    ) -> None:
+        super().__init__(engine, migrate=migrate)
+
+        self.max_workers = max_workers
+        self.executor = self._new_executor()
+
+        # the threads of the pool do not survive a fork, a forked child like
+        # a uwsgi worker gets a pool of its own
+        os.register_at_fork(after_in_child=partial(_renew_executor, weakref.ref(self)))
+
+    def _new_executor(self) -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="sozluk-storage"
+        )
+
+    async def _run(self, function: Callable[..., T], *args) -> T:
+        loop = asyncio.get_running_loop()
+        # like asyncio.to_thread, so that the thread sees the caller's context
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self.executor, partial(context.run, function, *args)
+        )
+
+
+def _renew_executor(reference: weakref.ref):
+    if (database := reference()) is not None:
+        database.executor = database._new_executor()
@@ -2,3 +2,11 @@ class TurkishLowercasedString(str):
     def __new__(cls, o: object = ""):
         s = super().__new__(cls, str(o).replace("İ", "i").replace("I", "ı").lower())
         return s
+
+    @classmethod
+    def trusted(cls, o: str):
+        """Wrap a string that an earlier construction checked, like a stored one.
+
+        Nothing is lowercased or validated again.
+        """
+        return str.__new__(cls, o)
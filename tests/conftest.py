@@ -0,0 +1,8 @@
+import pytest
+
+from sozluk.storage.factory import open_storage
+
+
+@pytest.fixture
+def db(tmp_path):
+    return open_storage(f"sqlite:///{tmp_path / 'sozluk.sqlite'}")
@@ -0,0 +1,9 @@
+from sozluk.authorname import AuthorName
+from sozluk.entry import EntrySketch, EntryText
+from sozluk.topicname import TopicName
+
+
+def sketch(topic="baslik", author="yazar", text="girdi") -> EntrySketch:
+    return EntrySketch(
+        topic=TopicName(topic), author=AuthorName(author), text=EntryText(text)
+    )
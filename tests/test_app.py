@@ -0,0 +1,122 @@
+import asyncio
+import io
+import json
+import subprocess
+import sys
+
+import pytest
+import sqlalchemy
+
+import sozluk.app
+from sozluk.app import create_app
+from sozluk.bulk import CHUNK_SIZE
+from sozluk.storage.factory import open_storage
+from tests.helpers import sketch
+
+
+@pytest.fixture
+def url(tmp_path, monkeypatch):
+    monkeypatch.setenv("METRICS_DIR", str(tmp_path / "metrics"))
+    return f"sqlite:///{tmp_path / 'sozluk.sqlite'}"
+
+
+class TestCreateApp:
+    def test_import_opens_no_database(self, tmp_path):
+        subprocess.run(
+            [sys.executable, "-c", "import sozluk.app"],
+            cwd=tmp_path,
+            env={"PYTHONPATH": ":".join(sys.path)},
+            check=True,
+        )
+
+        assert list(tmp_path.iterdir()) == []
+
+    def test_leaves_schema_to_migrate(self, url):
+
+        app = create_app(url)
+
+        engine = app.extensions["sozluk"].db.engine
+        assert sqlalchemy.inspect(engine).get_table_names() == []
+
+    def test_migrates_in_debug(self, url, monkeypatch):
+        monkeypatch.setattr(sozluk.app, "DEBUG", True)
+
+        response = create_app(url).test_client().get("/topic/baslik")
+
+        assert response.status_code == 200
+
+    def test_apps_keep_their_databases(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("METRICS_DIR", str(tmp_path / "metrics"))
+        urls = [f"sqlite:///{tmp_path / name}" for name in ("bir.db", "iki.db")]
+        for url in urls:
+            open_storage(url)
+        asyncio.run(open_storage(urls[0]).add_entry(sketch(text="yalniz birinde")))
+
+        first, second = [create_app(url).test_client() for url in urls]
+
+        assert "yalniz birinde" in first.get("/topic/baslik").text
+        assert "yalniz birinde" not in second.get("/topic/baslik").text
+
+
+class TestPutBatch:
+    def test_crlf_text_records(self, url):
+        open_storage(url)
+        body = "topic: a\r\nauthor: b\r\nc\r\n%\r\ntopic: d\r\nauthor: e\r\nf\r\n"
+
+        response = (
+            create_app(url)
+            .test_client()
+            .post("/send/batch", data=body, content_type="text/plain")
+        )
+
+        outcomes = [json.loads(line) for line in response.text.splitlines()]
+        assert [outcome["result"] for outcome in outcomes] == ["created", "created"]
+
+    def test_streams_outcomes(self, url):
+        open_storage(url)
+        body = "".join(
+            json.dumps({"topic": "baslik", "author": "yazar", "text": f"girdi {i}"})
+            + "\n"
+            for i in range(CHUNK_SIZE * 3)
+        ).encode()
+        stream = io.BytesIO(body)
+
+        response = (
+            create_app(url)
+            .test_client()
+            .post(
+                "/send/batch",
+                input_stream=stream,
+                content_length=len(body),
+                content_type="application/x-ndjson",
+                buffered=False,
+            )
+        )
+        outcomes = iter(response.response)
+
+        assert json.loads(next(outcomes))["record"] == 1
+        # the first chunk is answered before the rest is read
+        assert stream.tell() < len(body)
+        assert len(list(outcomes)) == CHUNK_SIZE * 3 - 1
+
+
+class TestExport:
+    @pytest.mark.parametrize("query", ["", "?after=", "?after=0"])
+    def test_from_the_start(self, url, query):
+        asyncio.run(open_storage(url).add_entries([sketch(text="bir"), sketch()]))
+
+        response = create_app(url).test_client().get(f"/export{query}")
+
+        assert response.status_code == 200
+        assert [json.loads(line)["id"] for line in response.text.splitlines()] == [
+            1,
+            2,
+        ]
+
+    @pytest.mark.parametrize("after", ["-1", "x"])
+    def test_bad_after(self, url, after):
+        open_storage(url)
+
+        response = create_app(url).test_client().get(f"/export?after={after}")
+
+        assert response.status_code == 400
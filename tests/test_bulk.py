@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from sozluk.bulk import (
+    RecordFormatError,
+    RecordResult,
+    add_records,
+    parse_text_record,
+    read_ndjson,
+    read_text_records,
+)
+
+
+def collect(db, records, chunk_size=2):
+    return list(add_records(db, records, chunk_size))
+
+
+class TestParseTextRecord:
+    def test_record(self):
+        sketch = parse_text_record("topic: tost\nauthor: me\nbir girdi.\n\nuc")
+        assert sketch.topic == "tost"
+        assert sketch.author == "me"
+        assert sketch.text == "bir girdi.\n\nuc"
+
+    def test_prefix_letters_are_kept(self):
+        assert parse_text_record("topic: pic\nauthor: rot\ngirdi").topic == "pic"
+
+    @pytest.mark.parametrize(
+        "record",
+        ["topic: a\nauthor: b", "baslik: a\nauthor: b\nc", "topic: a\nyazar: b\nc"],
+    )
+    def test_bad_format(self, record):
+        with pytest.raises(RecordFormatError):
+            parse_text_record(record)
+
+    def test_bad_value(self):
+        with pytest.raises(ValueError) as raised:
+            parse_text_record("topic: a\nauthor: b c\nd")
+        assert not isinstance(raised.value, RecordFormatError)
+
+
+class TestReaders:
+    def test_ndjson(self):
+        records = list(
+            read_ndjson(
+                [
+                    '{"topic": "a", "author": "b", "text": "c"}\n',
+                    "\n",
+                    '{"topic": "a", "author": "b"}\n',
+                    "[]\n",
+                    "{\n",
+                    '{"topic": "a", "author": "b", "text": 1}\n',
+                ]
+            )
+        )
+
+        assert records[0].text == "c"
+        assert len(records) == 5
+        assert all(isinstance(record, RecordFormatError) for record in records[1:])
+
+    def test_text_records(self):
+        lines = [
+            "topic: a\n",
+            "author: b\n",
+            "c\n",
+            "%\n",
+            "%\n",
+            "topic: d\n",
+            "author: e\n",
+            "f\n",
+            "\n",
+            "g\n",
+        ]
+        records = list(read_text_records(lines))
+
+        assert [record.topic for record in records] == ["a", "d"]
+        assert records[1].text == "f\n\ng"
+
+    def test_crlf_text_records(self):
+        lines = (
+            "topic: a\r\nauthor: b\r\nc\r\n\r\nd\r\n%\r\ntopic: e\r\nauthor: f\r\ng\r\n"
+        )
+        records = list(read_text_records(lines.splitlines(keepends=True)))
+
+        assert [record.topic for record in records] == ["a", "e"]
+        assert records[0].text == "c\n\nd"
+
+
+class TestAddRecords:
+    def test_outcomes(self, db):
+        records = read_text_records(
+            (
+                "topic: a\nauthor: b\nc\n%\n"
+                "topic: a\nauthor: b\nc\n%\n"
+                "topic: a\nauthor: b c\nd\n%\n"
+                "topic: a\nauthor: b\n  c  \n%\n"
+                "topic: e\nauthor: b\nc\n"
+            ).splitlines(keepends=True)
+        )
+
+        outcomes = collect(db, records)
+
+        assert [outcome.record for outcome in outcomes] == [1, 2, 3, 4, 5]
+        assert [outcome.result for outcome in outcomes] == [
+            RecordResult.CREATED,
+            RecordResult.DUPLICATE,
+            RecordResult.INVALID,
+            RecordResult.DUPLICATE,
+            RecordResult.CREATED,
+        ]
+        assert outcomes[2].error == "Author name cannot contain spaces"
+        assert asyncio.run(db.get_entry(outcomes[4].entry_id)).topic == "e"
+
+    def test_consumes_lazily(self, db):
+        read = []
+
+        def records():
+            for i in range(10):
+                read.append(i)
+                yield from read_ndjson(
+                    [f'{{"topic": "a", "author": "b", "text": "girdi {i}"}}']
+                )
+
+        next(add_records(db, records(), chunk_size=3))
+
+        assert len(read) == 3
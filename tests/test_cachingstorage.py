@@ -0,0 +1,174 @@
+import asyncio
+import multiprocessing
+
+import pytest
+
+from sozluk.authorname import AuthorName
+from sozluk.storage.cachingstorage import CachingStorage, TTLCache
+from sozluk.storage.factory import open_storage
+from sozluk.topicname import TopicName
+from tests.helpers import sketch
+
+
+def worker(url, index, barrier, results):
+    """Reads a topic around a write made by the first worker."""
+    db = CachingStorage(open_storage(url), ttl=3600)
+    topic = TopicName("baslik")
+
+    async def run():
+        await db.revalidate()
+        before = len(await db.get_topic(topic))
+
+        barrier.wait()
+        if index == 0:
+            await db.add_entry(sketch(text="yeni"))
+        barrier.wait()
+
+        stale = len(await db.get_topic(topic))
+        await db.revalidate()
+        after = len(await db.get_topic(topic))
+
+        return before, stale, after
+
+    results.put((index, asyncio.run(run())))
+
+
+@pytest.fixture
+def db(db):
+    return CachingStorage(db)
+
+
+class TestTTLCache:
+    def test_least_recently_used_goes(self):
+        cache = TTLCache(size=2, ttl=60)
+        cache.set("a", 1, ())
+        cache.set("b", 2, ())
+        cache.get("a")
+        cache.set("c", 3, ())
+
+        assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+    def test_expiry(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr("time.monotonic", lambda: now[0])
+        cache = TTLCache(size=2, ttl=5)
+        cache.set("a", 1, ())
+
+        now[0] = 104.0
+        assert cache.get("a") == 1
+        now[0] = 106.0
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_invalidate(self):
+        cache = TTLCache(size=10, ttl=60)
+        cache.set("a", 1, ("x", "y"))
+        cache.set("b", 2, ("y",))
+        cache.set("c", 3, ("z",))
+
+        cache.invalidate("y")
+
+        assert (cache.get("a"), cache.get("b"), cache.get("c")) == (None, None, 3)
+        assert cache.tagged == {"z": {"c"}}
+
+
+class TestCachingStorage:
+    def test_hits_and_misses(self, db):
+        asyncio.run(db.add_entry(sketch()))
+
+        for _ in range(3):
+            asyncio.run(db.get_topic_page(TopicName("baslik")))
+            asyncio.run(db.entry_count)
+
+        assert db.misses == {"topic_page": 1, "count": 1}
+        assert db.hits == {"topic_page": 2, "count": 2}
+
+    def test_add_forgets_what_it_changes(self, db):
+        asyncio.run(db.add_entry(sketch()))
+        asyncio.run(db.add_entry(sketch(topic="diger", author="baskasi")))
+
+        async def read():
+            return (
+                await db.get_topic_page(TopicName("baslik")),
+                await db.get_topic_version(TopicName("baslik")),
+                await db.get_topic(TopicName("diger")),
+                await db.get_author(AuthorName("baskasi")),
+                await db.get_latest_topics(),
+                await db.entry_count,
+            )
+
+        asyncio.run(read())
+        asyncio.run(db.add_entry(sketch(text="yeni")))
+        page, version, other, other_author, latest, count = asyncio.run(read())
+
+        assert [entry.text for entry in page.entries] == ["girdi", "yeni"]
+        assert version.entry_count == 2
+        assert latest == ["baslik", "diger"]
+        assert count == 3
+        assert db.hits == {"topic": 1, "author": 1}
+
+    def test_delete(self, db):
+        _, entry_id = asyncio.run(db.add_entry(sketch()))
+        asyncio.run(db.get_entry(entry_id))
+        asyncio.run(db.get_author(AuthorName("yazar")))
+        asyncio.run(db.topic_count)
+
+        asyncio.run(db.del_entry(entry_id))
+
+        assert asyncio.run(db.get_entry(entry_id)) is None
+        assert asyncio.run(db.get_author(AuthorName("yazar"))) == []
+        assert asyncio.run(db.topic_count) == 0
+        assert not db.hits
+
+    def test_revalidate(self, db):
+        asyncio.run(db.revalidate())
+        asyncio.run(db.get_topic(TopicName("baslik")))
+        asyncio.run(db.storage.add_entry(sketch()))
+
+        asyncio.run(db.revalidate())
+        assert len(asyncio.run(db.get_topic(TopicName("baslik")))) == 1
+
+        asyncio.run(db.revalidate())
+        asyncio.run(db.get_topic(TopicName("baslik")))
+        assert db.hits == {"topic": 1}
+
+    def test_read_during_write_is_not_cached(self, db):
+        storage = db.storage
+
+        class SlowStorage:
+            async def add_entry(self, sketch):
+                return await storage.add_entry(sketch)
+
+            async def get_topic(self, topic_name):
+                entries = await storage.get_topic(topic_name)
+                # a write lands after the read, before it is cached
+                await db.add_entry(sketch(text="araya giren"))
+                return entries
+
+        db.storage = SlowStorage()
+        assert asyncio.run(db.get_topic(TopicName("baslik"))) == []
+
+        db.storage = storage
+        assert len(asyncio.run(db.get_topic(TopicName("baslik")))) == 1
+
+
+class TestWorkerProcesses:
+    def test_revalidate_sees_other_workers(self, tmp_path):
+        url = f"sqlite:///{tmp_path / 'sozluk.sqlite'}"
+        asyncio.run(open_storage(url).add_entry(sketch()))
+
+        context = multiprocessing.get_context("spawn")
+        barrier = context.Barrier(3)
+        results = context.Queue()
+        processes = [
+            context.Process(target=worker, args=(url, index, barrier, results))
+            for index in range(3)
+        ]
+
+        for process in processes:
+            process.start()
+        outcomes = dict(results.get(timeout=60) for _ in processes)
+        for process in processes:
+            process.join()
+
+        assert outcomes == {0: (1, 2, 2), 1: (1, 1, 2), 2: (1, 1, 2)}
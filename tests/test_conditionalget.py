@@ -0,0 +1,92 @@
+from datetime import UTC, datetime
+
+import pytest
+from flask import Flask, flash, make_response, session
+
+from sozluk.conditionalget import not_modified, page_etag, with_validators
+
+LAST_MODIFIED = datetime(2024, 5, 1, 12, tzinfo=UTC)
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.renders = 0
+
+    @app.route("/page")
+    def page():
+        etag = page_etag("page", app.version)
+        if response := not_modified(etag, LAST_MODIFIED):
+            return response
+
+        app.renders += 1
+        return with_validators(make_response("content"), etag, LAST_MODIFIED)
+
+    @app.route("/theme/<name>")
+    def theme(name):
+        session["theme"] = name
+        return ""
+
+    @app.route("/flash")
+    def flash_message():
+        flash("merhaba")
+        return ""
+
+    app.version = 1
+    client = app.test_client()
+    client.app = app
+    return client
+
+
+def revalidate(client, etag):
+    return client.get("/page", headers={"If-None-Match": etag})
+
+
+class TestConditionalGet:
+    def test_validators(self, client):
+        response = client.get("/page")
+
+        assert response.headers["ETag"]
+        assert response.last_modified == LAST_MODIFIED
+        assert response.cache_control.no_cache
+
+    def test_not_modified(self, client):
+        etag = client.get("/page").headers["ETag"]
+        response = revalidate(client, etag)
+
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        assert client.app.renders == 1
+
+    def test_content_changed(self, client):
+        etag = client.get("/page").headers["ETag"]
+        client.app.version = 2
+
+        assert revalidate(client, etag).status_code == 200
+
+    def test_query_string(self, client):
+        etag = client.get("/page").headers["ETag"]
+        response = client.get("/page?after=3", headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+
+    def test_theme(self, client):
+        etag = client.get("/page").headers["ETag"]
+        client.get("/theme/dark")
+
+        assert revalidate(client, etag).status_code == 200
+
+    def test_flashed_messages(self, client):
+        etag = client.get("/page").headers["ETag"]
+        client.get("/flash")
+
+        assert revalidate(client, etag).status_code == 200
+
+    def test_if_modified_since_alone(self, client):
+        client.get("/page")
+        response = client.get(
+            "/page", headers={"If-Modified-Since": "Wed, 01 May 2024 12:00:00 GMT"}
+        )
+
+        assert response.status_code == 200
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from sozluk.storage.engine import SQLITE_PRAGMAS, create_storage_engine, parse_pragmas
+
+
+def pragma(engine, name):
+    with engine.connect() as connection:
+        return connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+class TestParsePragmas:
+    def test_defaults(self):
+        assert parse_pragmas("") == SQLITE_PRAGMAS
+
+    def test_override(self):
+        pragmas = parse_pragmas("synchronous=FULL, mmap_size=0,foreign_keys=1")
+
+        assert pragmas["synchronous"] == "FULL"
+        assert pragmas["mmap_size"] == "0"
+        assert pragmas["foreign_keys"] == "1"
+        assert pragmas["journal_mode"] == "WAL"
+
+    def test_none(self):
+        assert parse_pragmas("none") == {}
+
+    @pytest.mark.parametrize("setting", ["synchronous", "a=1; DROP TABLE x", "=1"])
+    def test_bad(self, setting):
+        with pytest.raises(ValueError):
+            parse_pragmas(setting)
+
+
+class TestCreateStorageEngine:
+    def test_sqlite_pragmas(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("SQLITE_PRAGMAS", "busy_timeout=1234")
+        engine = create_storage_engine(f"sqlite:///{tmp_path / 'sozluk.sqlite'}")
+
+        assert pragma(engine, "journal_mode") == "wal"
+        assert pragma(engine, "synchronous") == 1
+        assert pragma(engine, "busy_timeout") == 1234
+
+    def test_given_pragmas(self, tmp_path):
+        engine = create_storage_engine(
+            f"sqlite:///{tmp_path / 'sozluk.sqlite'}", pragmas={}
+        )
+
+        assert pragma(engine, "journal_mode") == "delete"
+
+    def test_pool(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("DB_POOL_SIZE", "3")
+        engine = create_storage_engine(f"sqlite:///{tmp_path / 'sozluk.sqlite'}")
+
+        assert engine.pool.size() == 3
+
+    def test_memory(self):
+        engine = create_storage_engine("sqlite://")
+        assert pragma(engine, "temp_store") == 2
+
+    def test_new_pool_after_fork(self, tmp_path):
+        engine = create_storage_engine(f"sqlite:///{tmp_path / 'sozluk.sqlite'}")
+        pool = engine.pool
+        pragma(engine, "journal_mode")
+
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0 if engine.pool is not pool else 1)
+
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+        assert engine.pool is pool
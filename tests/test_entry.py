@@ -0,0 +1,134 @@
+import json
+from pathlib import Path
+
+import pytest
+from emoji import EMOJI_DATA, emoji_count
+
+from sozluk.entry import EntryText, has_emoji
+
+# texts of a made-up sozluk, with some punctuation and symbols of its own
+ENTRY_TEXTS = Path(__file__).parent / "data" / "entry_texts.ndjson"
+
+# outputs of the multi pass parser that preceded the single pass one
+GOLDEN_RENDERS = [
+    ("", ""),
+    ("duz bir girdi", "duz bir girdi"),
+    ("(bkz: sozluk)", "(bkz: <a href='/topic/sozluk'>sozluk</a>)"),
+    ("(ayrica bkz: sozluk)", "(ayrica bkz: <a href='/topic/sozluk'>sozluk</a>)"),
+    ("(ayrıca bkz: sozluk)", "(ayrıca bkz: <a href='/topic/sozluk'>sozluk</a>)"),
+    ("`sozluk`", "<a href='/topic/sozluk'>sozluk</a>"),
+    ("`@yazar`", "<a href='/author/yazar'>@yazar</a>"),
+    ("`#42`", "<a href='/entry/42'>#42</a>"),
+    (
+        "(bkz: @yazar) (bkz: #42) (bkz: baslik 2)",
+        "(bkz: <a href='/author/yazar'>@yazar</a>) (bkz: <a href='/entry/42'>#42</a>) (bkz: <a href='/topic/baslik 2'>baslik 2</a>)",
+    ),
+    (
+        "(bkz: a)(bkz: b)`c``d`",
+        "(bkz: <a href='/topic/a'>a</a>)(bkz: <a href='/topic/b'>b</a>)<a href='/topic/c'>c</a><a href='/topic/d'>d</a>",
+    ),
+    ("{} {0} {{}} {x} (bkz: {a})", "{} {0} {{}} {x} (bkz: {a})"),
+    (
+        "<script>alert('x')</script> & \"tirnak\" (bkz: guvenlik)",
+        "&lt;script&gt;alert(&#39;x&#39;)&lt;/script&gt; &amp; &#34;tirnak&#34; (bkz: <a href='/topic/guvenlik'>guvenlik</a>)",
+    ),
+    ("`a (bkz: b) c`", "`a (bkz: <a href='/topic/b'>b</a>) c`"),
+    ("(bkz: `x`)", "(bkz: <a href='/topic/x'>x</a>)"),
+    ("`(bkz: x)`", "`(bkz: <a href='/topic/x'>x</a>)`"),
+    ("(bkz: sozluk", "(bkz: sozluk"),
+    ("bkz: sozluk)", "bkz: sozluk)"),
+    ("(bkz:sozluk)", "(bkz:sozluk)"),
+    ("(BKZ: sozluk)", "(bkz: <a href='/topic/sozluk'>sozluk</a>)"),
+    ("`a`b`c`", "<a href='/topic/a'>a</a>b<a href='/topic/c'>c</a>"),
+    (
+        "(bkz: ##1) (bkz: @@a) (bkz: a#b)",
+        "(bkz: ##1) (bkz: @@a) (bkz: <a href='/topic/a#b'>a#b</a>)",
+    ),
+    (
+        "(bkz: ışık ğüşöç 123)",
+        "(bkz: <a href='/topic/ışık ğüşöç 123'>ışık ğüşöç 123</a>)",
+    ),
+    ("(bkz: baslik!)", "(bkz: baslik!)"),
+    (
+        "satir bir (bkz: a)\n\nsatir iki `b`\nsatir uc",
+        "satir bir (bkz: <a href='/topic/a'>a</a>)\n\nsatir iki <a href='/topic/b'>b</a>\nsatir uc",
+    ),
+    ("(ayrica bkz: (bkz: a))", "(ayrica bkz: (bkz: <a href='/topic/a'>a</a>))"),
+    (
+        "(bkz: a) {b} `c` {{d}} (ayrıca bkz: e)",
+        "(bkz: <a href='/topic/a'>a</a>) {b} <a href='/topic/c'>c</a> {{d}} (ayrıca bkz: <a href='/topic/e'>e</a>)",
+    ),
+    ("`#`", "`#`"),
+    ("`@`", "`@`"),
+    ("(bkz: #)", "(bkz: #)"),
+    ("% %s %(x)s", "% %s %(x)s"),
+]
+
+
+class TestEntryText:
+    def test_init_normalizes(self):
+        assert EntryText("  Merhaba\r\nDünya ") == "merhaba\ndünya"
+
+    def test_init_emoji(self):
+        with pytest.raises(ValueError):
+            EntryText("hello 🙂")
+
+    def test_render_references(self):
+        text = EntryText("(bkz: sozluk) `@yazar` `#5`")
+        assert text.render("/topic/", "/entry/", "/author/") == (
+            "(bkz: <a href='/topic/sozluk'>sozluk</a>) "
+            "<a href='/author/yazar'>@yazar</a> "
+            "<a href='/entry/5'>#5</a>"
+        )
+
+    def test_render_escapes(self):
+        assert EntryText("<b>{0}</b>").render() == "&lt;b&gt;{0}&lt;/b&gt;"
+
+    @pytest.mark.parametrize("given,expected", GOLDEN_RENDERS)
+    def test_render_golden(self, given, expected):
+        assert EntryText(given).render("/topic/", "/entry/", "/author/") == expected
+
+    def test_render_long(self):
+        text = EntryText("`x` (bkz: y) {} " * 500)
+        expected = "<a href='/topic/x'>x</a> (bkz: <a href='/topic/y'>y</a>) {} " * 500
+        assert text.render("/topic/", "/entry/", "/author/") == expected.strip()
+
+    @pytest.mark.parametrize("given", ["``", "(bkz: )", "a `` b"])
+    def test_render_empty_reference(self, given):
+        assert EntryText(given).render() == given
+
+    def test_parse(self):
+        string, matches = EntryText("{x} `a` (ayrica bkz: #2) `@b`").parse()
+        assert string == "{{x}} {} (ayrica bkz: {}) {}"
+        assert matches == ["a", "#2", "@b"]
+
+    def test_render_is_cached(self):
+        first = EntryText("(bkz: onbellek)").render("/topic/", "/entry/", "/author/")
+        second = EntryText("(bkz: onbellek)").render("/topic/", "/entry/", "/author/")
+        assert first is second
+
+        other_prefix = EntryText("(bkz: onbellek)").render("/t/", "/e/", "/a/")
+        assert other_prefix == "(bkz: <a href='/t/onbellek'>onbellek</a>)"
+
+
+class TestHasEmoji:
+    def test_agrees_with_emoji_library(self):
+        texts = [
+            json.loads(line)
+            for line in ENTRY_TEXTS.read_text(encoding="utf-8").splitlines()
+        ]
+        texts += [f"ışık {emoji} ğüşöç" for emoji in EMOJI_DATA]
+        # every character on its own, with the parts of emoji sequences
+        texts += map(chr, range(0x30000))
+        texts += ["#", "1\ufe0f", "\u20e3", "a\u200db", "©", "\U0001f3fb"]
+
+        for text in texts:
+            assert has_emoji(text) == (emoji_count(text) != 0), ascii(text)
+
+    def test_turkish(self):
+        assert not has_emoji("ıİşŞğĞüÜöÖçÇ “tırnak” – üç nokta…")
+
+    def test_symbols(self):
+        # the emoji library counts these as emoji, with or without U+FE0F
+        assert has_emoji("©")
+        assert has_emoji("™\ufe0f")
@@ -0,0 +1,63 @@
+import asyncio
+import csv
+import json
+
+import pytest
+
+from sozluk.bulk import read_ndjson
+from sozluk.entry import EntryID
+from sozluk.export import csv_lines, ndjson_lines, read_entries
+from tests.helpers import sketch
+
+
+@pytest.fixture
+def filled(db):
+    asyncio.run(
+        db.add_entries(
+            [
+                sketch(f"baslik {i % 3}", text=f'girdi {i}\nikinci, "satir"')
+                for i in range(10)
+            ]
+        )
+    )
+    return db
+
+
+class TestReadEntries:
+    def test_all_in_order(self, filled):
+        ids = [entry.identifier.value for entry in read_entries(filled, batch_size=3)]
+        assert ids == list(range(1, 11))
+
+    def test_after(self, filled):
+        asyncio.run(filled.del_entry(EntryID(7)))
+
+        entries = read_entries(filled, after=EntryID(5), batch_size=2)
+
+        assert [entry.identifier.value for entry in entries] == [6, 8, 9, 10]
+
+    def test_empty(self, db):
+        assert list(read_entries(db)) == []
+
+
+class TestFormats:
+    def test_ndjson_imports_back(self, filled):
+        entries = list(read_entries(filled))
+        lines = list(ndjson_lines(entries))
+
+        assert len(lines) == 10
+        assert json.loads(lines[0])["id"] == 1
+
+        sketches = list(read_ndjson(lines))
+        assert [s.text for s in sketches] == [entry.text for entry in entries]
+
+    def test_csv(self, filled):
+        entries = list(read_entries(filled))
+        rows = list(csv.DictReader("".join(csv_lines(entries)).splitlines(True)))
+
+        assert len(rows) == 10
+        assert rows[4]["id"] == "5"
+        assert rows[4]["topic"] == "baslik 1"
+        assert rows[4]["text"] == entries[4].text
+
+    def test_csv_header_only(self):
+        assert list(csv_lines([])) == ["id,topic,author,utc_time,text\r\n"]
@@ -0,0 +1,23 @@
+import time
+
+from sozluk.hostmetrics import HostMetrics, HostMetricsSampler
+
+
+class TestHostMetricsSampler:
+    def test_get(self):
+        metrics = HostMetricsSampler(period=60).get()
+
+        assert isinstance(metrics, HostMetrics)
+        assert metrics.cpu_count >= 1
+        assert 0 < metrics.ram_used_megabytes <= metrics.ram_total_megabytes
+        assert len(metrics.load_average) == 3
+
+    def test_samples_in_background(self):
+        sampler = HostMetricsSampler(period=0.01)
+        first = sampler.get()
+
+        deadline = time.monotonic() + 5
+        while sampler.latest is first and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert sampler.latest is not first
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+import sqlalchemy
+
+from sozluk.entry import EntryID
+from sozluk.storage.maintenance import MaintenanceJob, run_job
+from sozluk.storage.sqlalchemydatabase import SQLAlchemyEntry
+from tests.helpers import sketch
+
+
+class Shout(MaintenanceJob):
+    """Upper cases texts, failing once it reaches a given entry."""
+
+    name = "shout"
+    model = SQLAlchemyEntry
+    columns = ("text",)
+
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.seen = []
+
+    def change(self, row):
+        if row.id == self.fail_at:
+            raise RuntimeError("stopped")
+
+        self.seen.append(row.id)
+        return None if row.text.endswith("0") else {"text": row.text.upper()}
+
+
+@pytest.fixture
+def db(db):
+    asyncio.run(db.add_entries([sketch(text=f"girdi {i}") for i in range(1, 11)]))
+    return db
+
+
+def texts(db):
+    with db.engine.connect() as connection:
+        return connection.exec_driver_sql("SELECT text FROM entries ORDER BY id").all()
+
+
+class TestRunJob:
+    def test_changes(self, db):
+        assert run_job(db.engine, Shout(), batch_size=3, pause=0) == 9
+        assert [text for text, in texts(db)][-2:] == ["GIRDI 9", "girdi 10"]
+
+    def test_continues_from_checkpoint(self, db):
+        with pytest.raises(RuntimeError):
+            run_job(db.engine, Shout(fail_at=8), batch_size=3, pause=0)
+
+        job = Shout()
+        assert run_job(db.engine, job, batch_size=3, pause=0) == 3
+        assert job.seen == [7, 8, 9, 10]
+
+        job = Shout()
+        assert run_job(db.engine, job, batch_size=3, pause=0, restart=True) == 9
+        assert job.seen == list(range(1, 11))
+
+
+class TestFixCRLF:
+    def test_only_crlf_rows(self, db):
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql(
+                "UPDATE entries SET text = 'a' || char(13, 10) || 'b' WHERE id = 4"
+            )
+
+        statements = []
+        sqlalchemy.event.listen(
+            db.engine,
+            "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+
+        assert db.fix_crlf() == 1
+        assert asyncio.run(db.get_data_version()) == 2
+        assert texts(db)[3] == ("a\nb",)
+        assert asyncio.run(db.get_entry(EntryID(4))).text == "a\nb"
+        assert (
+            sum(statement.startswith("UPDATE entries") for statement in statements) == 1
+        )
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import os
+
+import psutil
+import pytest
+from flask import Flask, render_template_string
+
+from sozluk.metrics import (
+    CACHE_HITS,
+    REQUEST_DURATION,
+    REQUEST_QUERIES,
+    RESPONSES,
+    Metrics,
+    RequestTally,
+    current_tally,
+    instrument_app,
+    instrument_engine,
+    render,
+)
+from sozluk.storage import EntryAddResponse
+from sozluk.storage.factory import open_storage
+from sozluk.topicname import TopicName
+from tests.helpers import sketch
+
+
+def samples(text: str) -> dict[str, float]:
+    return {
+        line.rpartition(" ")[0]: float(line.rpartition(" ")[2])
+        for line in text.splitlines()
+        if not line.startswith("#")
+    }
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = Flask(__name__)
+    db = open_storage(f"threaded+sqlite:///{tmp_path / 'sozluk.sqlite'}")
+    instrument_engine(db.engine)
+    metrics = Metrics(directory=tmp_path / "metrics", period=60)
+    instrument_app(app, metrics)
+
+    @app.route("/topic/<name>")
+    async def topic(name):
+        await db.get_topic(TopicName(name))
+        await db.get_topic(TopicName(name))
+        return render_template_string("{{ name }}", name=name)
+
+    client = app.test_client()
+    client.metrics = metrics
+    return client
+
+
+class TestMetrics:
+    def test_counter(self):
+        metrics = Metrics()
+        metrics.inc(RESPONSES, {"route": "/", "status": "200"})
+        metrics.inc(RESPONSES, {"status": "200", "route": "/"}, 2)
+
+        text = metrics.render()
+
+        assert "# TYPE sozluk_responses_total counter" in text
+        assert samples(text)['sozluk_responses_total{route="/",status="200"}'] == 3
+
+    def test_histogram(self):
+        metrics = Metrics()
+        for value in (0.002, 0.02, 7):
+            metrics.observe(REQUEST_DURATION, {"route": "/"}, value)
+
+        found = samples(metrics.render())
+
+        name = "sozluk_request_duration_seconds"
+        assert found[f'{name}_bucket{{route="/",le="0.001"}}'] == 0
+        assert found[f'{name}_bucket{{route="/",le="0.0025"}}'] == 1
+        assert found[f'{name}_bucket{{route="/",le="0.025"}}'] == 2
+        assert found[f'{name}_bucket{{route="/",le="2.5"}}'] == 2
+        assert found[f'{name}_bucket{{route="/",le="+Inf"}}'] == 3
+        assert found[f'{name}_count{{route="/"}}'] == 3
+        assert found[f'{name}_sum{{route="/"}}'] == pytest.approx(7.022)
+
+    def test_escapes_labels(self):
+        snapshot = {
+            "counters": [["sozluk_cache_hits_total", [["kind", 'a"b\\c\n']], 1]],
+            "histograms": [],
+        }
+
+        text = render(snapshot, [CACHE_HITS])
+
+        assert r'sozluk_cache_hits_total{kind="a\"b\\c\n"} 1' in text
+
+    def test_collector(self):
+        metrics = Metrics()
+        hits = {"entry": 4}
+        metrics.add_collector(
+            lambda metrics: metrics.set(CACHE_HITS, {"kind": "entry"}, hits["entry"])
+        )
+
+        hits["entry"] = 5
+
+        assert samples(metrics.render())['sozluk_cache_hits_total{kind="entry"}'] == 5
+
+
+class TestWorkers:
+    def write(self, directory, pid, started, value):
+        snapshot = {
+            "started": started,
+            "counters": [["sozluk_responses_total", [["status", "200"]], value]],
+            "histograms": [],
+        }
+        (directory / f"{pid}.json").write_text(json.dumps(snapshot))
+
+    def test_adds_up_running_workers(self, tmp_path):
+        metrics = Metrics(directory=tmp_path)
+        metrics.inc(RESPONSES, {"status": "200"})
+        parent = psutil.Process(os.getppid())
+        self.write(tmp_path, parent.pid, parent.create_time(), 2)
+
+        found = samples(metrics.render())
+
+        assert found['sozluk_responses_total{status="200"}'] == 3
+
+    def test_drops_exited_workers(self, tmp_path):
+        metrics = Metrics(directory=tmp_path)
+        parent = psutil.Process(os.getppid())
+        # the same pid, but started at another time
+        self.write(tmp_path, parent.pid, parent.create_time() - 100, 2)
+
+        found = samples(metrics.render())
+
+        assert 'sozluk_responses_total{status="200"}' not in found
+        assert not list(tmp_path.glob("*.json"))
+
+    def test_writes_snapshot(self, tmp_path):
+        metrics = Metrics(directory=tmp_path)
+        metrics.inc(RESPONSES, {"status": "200"})
+
+        metrics.run_once()
+
+        snapshot = json.loads((tmp_path / f"{os.getpid()}.json").read_text())
+        assert snapshot["started"] == psutil.Process().create_time()
+        assert snapshot["counters"] == [
+            ["sozluk_responses_total", [["status", "200"]], 1]
+        ]
+
+
+class TestInstrumentEngine:
+    def test_failed_statement_leaves_nothing(self, db):
+        instrument_engine(db.engine)
+        asyncio.run(db.add_entry(sketch()))
+
+        # a duplicate definition fails its insert
+        tally = RequestTally(started=0)
+        current_tally.set(tally)
+        try:
+            result, _ = asyncio.run(db.add_entry(sketch()))
+        finally:
+            current_tally.set(None)
+
+        assert result == EntryAddResponse.DEFINITION_EXISTS
+        assert tally.queries > 0
+        with db.engine.connect() as connection:
+            assert connection.info == {}
+
+
+class TestInstrumentation:
+    def test_request(self, client):
+        client.get("/topic/merhaba")
+        client.get("/topic/dunya")
+
+        found = samples(client.get("/metrics").text)
+
+        labels = 'method="GET",route="/topic/<name>"'
+        assert found[f'sozluk_responses_total{{{labels},status="200"}}'] == 2
+        assert found[f"sozluk_request_duration_seconds_count{{{labels}}}"] == 2
+        assert found[f"sozluk_template_render_duration_seconds_count{{{labels}}}"] == 2
+        # two queries per request, counted in the storage's threads
+        assert found[f'sozluk_request_queries_bucket{{{labels},le="1"}}'] == 0
+        assert found[f'sozluk_request_queries_bucket{{{labels},le="2"}}'] == 2
+        assert found[f"sozluk_request_queries_sum{{{labels}}}"] == 4
+        assert found[f"sozluk_request_query_duration_seconds_sum{{{labels}}}"] > 0
+
+    def test_unmatched(self, client):
+        client.get("/nowhere")
+
+        found = samples(client.get("/metrics").text)
+
+        labels = 'method="GET",route="unmatched",status="404"'
+        assert found[f"sozluk_responses_total{{{labels}}}"] == 1
+
+    def test_content_type(self, client):
+        response = client.get("/metrics")
+
+        assert response.content_type == "text/plain; version=0.0.4; charset=utf-8"
+        assert f"# TYPE {REQUEST_QUERIES.name} histogram" in response.text
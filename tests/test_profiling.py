@@ -0,0 +1,133 @@
+import time
+
+import pytest
+from flask import Flask
+
+from sozluk.profiling import (
+    PROFILE_HEADER,
+    Profiler,
+    StackSampler,
+    header_signer,
+    profile_app,
+)
+
+
+def wait(seconds: float):
+    time.sleep(seconds)
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.secret_key = "test"
+
+    @app.route("/topic/<name>")
+    async def topic(name):
+        wait(0.05)
+        return name
+
+    @app.route("/")
+    async def index():
+        return ""
+
+    return app
+
+
+def profiled(app, tmp_path, **options) -> Profiler:
+    profiler = Profiler(tmp_path / "profiles", interval=0.001, **options)
+    profile_app(app, profiler)
+    return profiler
+
+
+def profiles(profiler: Profiler) -> list:
+    if not profiler.directory.exists():
+        return []
+    return sorted(profiler.directory.iterdir())
+
+
+class TestStackSampler:
+    def test_samples_other_threads(self):
+        sampler = StackSampler(interval=0.001)
+
+        assert sampler.begin()
+        wait(0.05)
+        stacks = sampler.end()
+
+        (stack,) = [stack for stack in stacks if "wait" in stack]
+        assert stack.startswith("MainThread;")
+        assert stack.split(";")[-1].startswith("wait (")
+        # its own thread, busy sampling, is left out
+        assert not any(
+            stack.split(";")[-1].startswith("StackSampler._loop (") for stack in stacks
+        )
+
+    def test_one_request_at_a_time(self):
+        sampler = StackSampler(interval=0.001)
+
+        assert sampler.begin()
+        assert not sampler.begin()
+        sampler.end()
+        assert sampler.begin()
+        sampler.end()
+
+
+class TestProfiler:
+    def test_off(self, app, tmp_path):
+        profiler = profiled(app, tmp_path)
+
+        app.test_client().get("/topic/merhaba")
+
+        assert profiles(profiler) == []
+
+    def test_rate(self, app, tmp_path):
+        profiler = profiled(app, tmp_path, rate=1)
+
+        app.test_client().get("/topic/merhaba")
+
+        (path,) = profiles(profiler)
+        assert path.suffix == ".folded"
+        assert "-topic-name=merhaba-" in path.name
+        stacks = path.read_text().splitlines()
+        assert any(";wait (" in stack for stack in stacks)
+        assert all(stack.rpartition(" ")[2].isdigit() for stack in stacks)
+
+    def test_slower_than(self, app, tmp_path):
+        profiler = profiled(app, tmp_path, slower_than=0.03)
+        client = app.test_client()
+
+        client.get("/")
+        client.get("/topic/merhaba")
+
+        (path,) = profiles(profiler)
+        assert "-topic-name=merhaba-" in path.name
+
+    def test_signed_header(self, app, tmp_path):
+        profiler = profiled(app, tmp_path)
+        header = header_signer("test").sign("profile").decode()
+
+        response = app.test_client().get("/", headers={PROFILE_HEADER: header})
+
+        (path,) = profiles(profiler)
+        assert response.headers["X-Sozluk-Profile-File"] == path.name
+        assert "-index-" in path.name
+
+    def test_badly_signed_header(self, app, tmp_path):
+        profiler = profiled(app, tmp_path)
+        header = header_signer("other").sign("profile").decode()
+
+        response = app.test_client().get("/", headers={PROFILE_HEADER: header})
+
+        assert profiles(profiler) == []
+        assert "X-Sozluk-Profile-File" not in response.headers
+
+    def test_keeps_newest(self, app, tmp_path):
+        profiler = profiled(app, tmp_path, rate=1, keep=2)
+        client = app.test_client()
+
+        for name in ("bir", "iki", "uc"):
+            client.get(f"/topic/{name}")
+
+        assert [path.name.split("-")[-2] for path in profiles(profiler)] == [
+            "name=iki",
+            "name=uc",
+        ]
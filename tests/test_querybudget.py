@@ -0,0 +1,223 @@
+import asyncio
+import json
+import logging
+import re
+
+import pytest
+from flask import Flask
+
+from sozluk.app import create_app
+from sozluk.entry import EntryID
+from sozluk.forms import ENTRY_DELETE_CONFIRMATION
+from sozluk.querybudget import (
+    QueryBudgetExceeded,
+    count_queries,
+    query_budget,
+    statement_shape,
+    watch_queries,
+    within_budget,
+)
+from sozluk.storage.factory import open_storage
+from sozluk.topicname import TopicName
+from tests.helpers import sketch
+
+# a request to every route, with the parts of the url filled in
+ROUTE_REQUESTS = {
+    "/robots.txt": ("GET", "/robots.txt", {}),
+    "/": ("GET", "/", {}),
+    "/add_entry": (
+        "POST",
+        "/add_entry",
+        {"data": {"topic": "yeni baslik", "author": "yeni", "text": "yeni girdi"}},
+    ),
+    "/del_entry": (
+        "POST",
+        "/del_entry",
+        {
+            "data": {
+                "entry_id": "2",
+                "text": ENTRY_DELETE_CONFIRMATION,
+                "checkbox": "y",
+            }
+        },
+    ),
+    "/entry/<entry_id>": ("GET", "/entry/1", {}),
+    "/topic/<name>": ("GET", "/topic/baslik 0?after=1", {}),
+    "/author/<name>": ("GET", "/author/yazar", {}),
+    "/stats": ("GET", "/stats", {}),
+    "/theemoji": ("GET", "/theemoji", {}),
+    "/about": ("GET", "/about", {}),
+    "/random": ("GET", "/random", {}),
+    "/search": ("GET", "/search?query=baslik", {}),
+    "/authors": ("GET", "/authors", {}),
+    "/topics": ("GET", "/topics", {}),
+    "/settings": ("GET", "/settings", {}),
+    "/theme": ("POST", "/theme", {"data": {"theme": "siyah"}}),
+    "/focus": ("POST", "/focus", {"data": {"focus": "y"}}),
+    "/send": (
+        "POST",
+        "/send",
+        {
+            "data": "topic: gonderilen\nauthor: yazar\ngirdi",
+            "content_type": "text/plain",
+        },
+    ),
+    "/send/batch": (
+        "POST",
+        "/send/batch",
+        {
+            "data": "".join(
+                json.dumps({"topic": "toplu", "author": "yazar", "text": f"{i}"}) + "\n"
+                for i in range(20)
+            ),
+            "content_type": "application/x-ndjson",
+        },
+    ),
+    "/export": ("GET", "/export", {}),
+    "/metrics": ("GET", "/metrics", {}),
+}
+
+
+@pytest.fixture(scope="module")
+def app(tmp_path_factory):
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("METRICS_DIR", str(tmp_path_factory.mktemp("metrics")))
+
+        url = f"sqlite:///{tmp_path_factory.mktemp('site') / 'sozluk.sqlite'}"
+        db = open_storage(url)
+        asyncio.run(
+            db.add_entries(
+                [sketch(f"baslik {i % 3}", text=f"girdi {i}") for i in range(30)]
+            )
+        )
+
+        yield create_app(url)
+
+
+@pytest.fixture
+def watched(db, caplog):
+    app = Flask(__name__)
+    watch_queries(app, db.engine, repeated_limit=3)
+
+    @app.route("/few")
+    @query_budget(2)
+    async def few():
+        await db.get_entry(EntryID(1))
+        return ""
+
+    @app.route("/many")
+    @query_budget(2)
+    async def many():
+        for i in range(1, 4):
+            await db.get_entry(EntryID(i))
+        return ""
+
+    caplog.set_level(logging.WARNING, logger="sozluk.querybudget")
+    return app.test_client()
+
+
+class TestStatementShape:
+    def test_expanding_in(self):
+        assert statement_shape("SELECT a FROM t WHERE a IN (?, ?,?)") == (
+            "SELECT a FROM t WHERE a IN (?)"
+        )
+
+    def test_whitespace(self):
+        assert statement_shape("SELECT a\n  FROM t ") == "SELECT a FROM t"
+
+
+class TestCountQueries:
+    def test_storage_call(self, db):
+
+        with count_queries(db.engine) as count:
+            asyncio.run(db.get_topic(TopicName("yok")))
+
+        assert count.count == 1
+
+    def test_to_entry_loads_nothing(self, tmp_path):
+        db = open_storage(f"threaded+sqlite:///{tmp_path / 'sozluk.sqlite'}")
+        asyncio.run(
+            db.add_entries(
+                [sketch(author=f"yazar{i}", text=f"girdi {i}") for i in range(10)]
+            )
+        )
+
+        with within_budget(db.engine, 1, "get_topic"):
+            entries = asyncio.run(db.get_topic(TopicName("baslik")))
+
+        assert len(entries) == 10
+
+    def test_repeated(self, db):
+
+        with count_queries(db.engine) as count:
+            for i in range(1, 6):
+                asyncio.run(db.get_entry(EntryID(i)))
+            asyncio.run(db.get_topic(TopicName("yok")))
+
+        (shape,) = count.repeated(limit=5)
+        assert shape.startswith("SELECT entries.id")
+        assert count.repeated(limit=5)[shape] == 5
+        assert count.repeated(limit=6) == {}
+
+    def test_over_budget(self, db):
+
+        with pytest.raises(QueryBudgetExceeded, match="2 statements, over .* of 1"):
+            with within_budget(db.engine, 1):
+                asyncio.run(db.get_entry(EntryID(1)))
+                asyncio.run(db.get_entry(EntryID(2)))
+
+    def test_stops_counting(self, db):
+
+        with count_queries(db.engine) as count:
+            pass
+        asyncio.run(db.get_entry(EntryID(1)))
+
+        assert count.count == 0
+
+
+class TestWatchQueries:
+    def test_within_budget(self, watched, caplog):
+        watched.get("/few")
+
+        assert caplog.records == []
+
+    def test_warns(self, watched, caplog):
+        watched.get("/many")
+
+        over, repeated = [record.getMessage() for record in caplog.records]
+        assert over == "/many ran 3 statements, over its budget of 2"
+        assert repeated.startswith("SELECT entries.id")
+        assert repeated.endswith("ran 3 times in /many")
+
+
+class TestRouteBudgets:
+    def test_every_route_has_a_budget(self, app):
+        for rule in app.url_map.iter_rules():
+            # flask's own, reading files
+            if rule.endpoint == "static":
+                continue
+
+            view = app.view_functions[rule.endpoint]
+            assert hasattr(view, "query_budget"), rule.rule
+            assert rule.rule in ROUTE_REQUESTS, rule.rule
+
+    @pytest.mark.parametrize("route", ROUTE_REQUESTS)
+    def test_within_budget(self, app, route):
+        method, url, options = ROUTE_REQUESTS[route]
+        endpoint, _ = app.url_map.bind("").match(url.partition("?")[0], method)
+        budget = app.view_functions[endpoint].query_budget
+
+        client = app.test_client()
+        if "data" in options and isinstance(options["data"], dict):
+            page = client.get("/").get_data(as_text=True)
+            token = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', page)
+            options = {"data": {**options["data"], "csrf_token": token[1]}}
+
+        with within_budget(app.extensions["sozluk"].db.engine, budget, route) as count:
+            response = client.open(url, method=method, **options)
+            # streamed bodies run their queries while being read
+            response.get_data()
+
+        assert response.status_code < 400, response.get_data(as_text=True)
+        # not turned away before reaching the database, by a form for example
+        assert count.count > 0 or budget == 0
@@ -0,0 +1,23 @@
+import asyncio
+
+from sozluk.randomentrypool import RandomEntryPool
+from tests.helpers import sketch
+
+
+class TestRandomEntryPool:
+    def test_sample(self, db):
+        ids = [
+            asyncio.run(db.add_entry(sketch(text=f"girdi {i}")))[1] for i in range(30)
+        ]
+
+        pool = RandomEntryPool(db, size=20, period=60)
+        entries = asyncio.run(pool.sample(limit=10))
+
+        assert len(entries) == len({entry.identifier for entry in entries}) == 10
+        assert len(pool.entries) == 20
+
+        for entry in pool.entries:
+            pool.discard(entry.identifier)
+
+        assert pool.entries == []
+        assert {entry.identifier for entry in asyncio.run(pool.sample())} <= set(ids)
@@ -0,0 +1,623 @@
+import asyncio
+import os
+import signal
+
+import pytest
+import sqlalchemy
+
+from sozluk.authorname import AuthorName
+from sozluk.entry import EntryText
+from sozluk.storage import EntryAddResponse, EntryDeleteResponse, sqlalchemydatabase
+from sozluk.storage.factory import open_storage
+from sozluk.storage.sqlalchemydatabase import (
+    SQLAlchemyDatabase,
+    SQLAlchemyEntry,
+    SQLAlchemyTopicActivity,
+)
+from sozluk.storage.threadedsqlalchemydatabase import ThreadedSQLAlchemyDatabase
+from sozluk.topicname import TopicName
+from tests.helpers import sketch
+
+
+@pytest.fixture(params=["sqlite", "threaded+sqlite"])
+def db(request, tmp_path):
+    return open_storage(f"{request.param}:///{tmp_path / 'sozluk.sqlite'}")
+
+
+class TestOpenStorage:
+    def test_plain_url(self, tmp_path):
+        db = open_storage(f"sqlite:///{tmp_path / 'sozluk.sqlite'}")
+        assert type(db) is SQLAlchemyDatabase
+
+    def test_threaded_url(self, tmp_path):
+        db = open_storage(f"threaded+sqlite:///{tmp_path / 'sozluk.sqlite'}")
+        assert isinstance(db, ThreadedSQLAlchemyDatabase)
+
+    @pytest.mark.parametrize("url", ["sqlite://", "threaded+sqlite://"])
+    def test_in_memory(self, url):
+        db = open_storage(url)
+
+        _, entry_id = asyncio.run(db.add_entry(sketch()))
+
+        assert asyncio.run(db.get_entry(entry_id)).text == "girdi"
+
+    def test_without_migrate(self, tmp_path):
+        url = f"sqlite:///{tmp_path / 'sozluk.sqlite'}"
+
+        db = open_storage(url, migrate=False)
+        assert sqlalchemy.inspect(db.engine).get_table_names() == []
+        assert not db.has_search_index
+
+        open_storage(url)
+        assert open_storage(url, migrate=False).has_search_index
+
+
+class TestSQLAlchemyDatabase:
+    def test_add_and_get_entry(self, db):
+        result, entry_id = asyncio.run(db.add_entry(sketch()))
+        assert result == EntryAddResponse.SUCCESS
+
+        entry = asyncio.run(db.get_entry(entry_id))
+        assert entry.topic == "baslik"
+        assert entry.author == "yazar"
+        assert entry.text == "girdi"
+
+    def test_add_duplicate_definition(self, db):
+        asyncio.run(db.add_entry(sketch()))
+        result, entry_id = asyncio.run(db.add_entry(sketch(author="baskasi")))
+        assert result == EntryAddResponse.DEFINITION_EXISTS
+        assert entry_id is None
+
+    def test_reads_without_validating(self, db, monkeypatch):
+        asyncio.run(db.add_entry(sketch()))
+        monkeypatch.setattr(EntryText, "__new__", None)
+
+        (entry,) = asyncio.run(db.get_topic(TopicName("baslik")))
+
+        assert type(entry.text) is EntryText
+        assert entry.text == "girdi"
+
+    def test_del_entry(self, db):
+        _, entry_id = asyncio.run(db.add_entry(sketch()))
+
+        assert asyncio.run(db.del_entry(entry_id)) == EntryDeleteResponse.SUCCESS
+        assert asyncio.run(db.get_entry(entry_id)) is None
+        assert (
+            asyncio.run(db.del_entry(entry_id)) == EntryDeleteResponse.ENTRY_NOT_FOUND
+        )
+
+    def test_concurrent_operations(self, db):
+        async def run():
+            await asyncio.gather(
+                *(db.add_entry(sketch(text=f"girdi {i}")) for i in range(20)),
+                *(db.get_topic(TopicName("baslik")) for _ in range(20)),
+            )
+            return await db.entry_count
+
+        assert asyncio.run(run()) == 20
+
+    def test_after_fork(self, db):
+        asyncio.run(db.add_entry(sketch()))
+
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                # a child left with the executor threads of its parent hangs
+                signal.alarm(10)
+                entries = asyncio.run(db.get_topic(TopicName("baslik")))
+                code = 0 if len(entries) == 1 else 1
+            finally:
+                os._exit(code)
+
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+
+
+class TestAddEntries:
+    def test_responses(self, db):
+        asyncio.run(db.add_entry(sketch(text="var")))
+
+        responses = asyncio.run(
+            db.add_entries(
+                [
+                    sketch(text="a"),
+                    sketch(text="var"),
+                    sketch(author="baskasi", text="a"),
+                    sketch(topic="yeni", text="a"),
+                ]
+            )
+        )
+
+        assert [result for result, _ in responses] == [
+            EntryAddResponse.SUCCESS,
+            EntryAddResponse.DEFINITION_EXISTS,
+            EntryAddResponse.DEFINITION_EXISTS,
+            EntryAddResponse.SUCCESS,
+        ]
+        assert asyncio.run(db.get_entry(responses[3][1])).topic == "yeni"
+
+    def test_counts_and_activity(self, db):
+        asyncio.run(
+            db.add_entries(
+                [
+                    sketch(topic="a", author="x", text="1"),
+                    sketch(topic="b", author="y", text="2"),
+                    sketch(topic="a", author="y", text="3"),
+                    sketch(topic="b", author="x", text="4"),
+                ]
+            )
+        )
+
+        assert asyncio.run(db.entry_count) == 4
+        assert asyncio.run(db.topic_count) == 2
+        assert asyncio.run(db.author_count) == 2
+        assert asyncio.run(db.get_latest_topics()) == ["b", "a"]
+        assert asyncio.run(db.get_latest_authors()) == ["x", "y"]
+
+    def test_empty(self, db):
+        assert asyncio.run(db.add_entries([])) == []
+        assert asyncio.run(db.entry_count) == 0
+
+
+class TestActivity:
+    @pytest.fixture(params=["upsert", "merge"])
+    def session(self, request, db, monkeypatch):
+        if request.param == "merge":
+            # as on dialects without an upsert
+            monkeypatch.setattr(sqlalchemydatabase, "_upsert", lambda *a, **k: None)
+
+        with db.Session() as session:
+            yield session
+
+    def last_entry_id(self, session, name):
+        return session.get(SQLAlchemyTopicActivity, name).last_entry_id
+
+    def test_keeps_greatest(self, session):
+        for entry_id in (5, 3, 7, 6):
+            SQLAlchemyDatabase._set_activity(
+                session, SQLAlchemyTopicActivity, "a", entry_id
+            )
+
+        assert self.last_entry_id(session, "a") == 7
+
+    def test_all_keep_greatest(self, session):
+        SQLAlchemyDatabase._set_all_activity(
+            session, SQLAlchemyTopicActivity, {"a": 5, "b": 2}
+        )
+        SQLAlchemyDatabase._set_all_activity(
+            session, SQLAlchemyTopicActivity, {"a": 3, "b": 4, "c": 1}
+        )
+
+        assert [self.last_entry_id(session, name) for name in "abc"] == [5, 4, 1]
+
+
+class TestGetEntries:
+    def test_batches(self, db):
+        asyncio.run(db.add_entries([sketch(text=f"girdi {i}") for i in range(5)]))
+
+        first = asyncio.run(db.get_entries(limit=3))
+        rest = asyncio.run(db.get_entries(after=first[-1].identifier, limit=3))
+
+        assert [entry.identifier.value for entry in first] == [1, 2, 3]
+        assert [entry.identifier.value for entry in rest] == [4, 5]
+        assert asyncio.run(db.get_entries(after=rest[-1].identifier)) == []
+
+
+class TestContentVersion:
+    def test_empty(self, db):
+        version = asyncio.run(db.get_entries_version())
+        assert (version.last_entry_id, version.entry_count) == (0, 0)
+        assert version.last_modified is None
+
+    def test_changes(self, db):
+        _, first = asyncio.run(db.add_entry(sketch(text="a")))
+        _, second = asyncio.run(db.add_entry(sketch(author="baskasi", text="b")))
+
+        topic = asyncio.run(db.get_topic_version(TopicName("baslik")))
+        author = asyncio.run(db.get_author_version(AuthorName("yazar")))
+        everything = asyncio.run(db.get_entries_version())
+
+        assert (topic.last_entry_id, topic.entry_count) == (second.value, 2)
+        assert (author.last_entry_id, author.entry_count) == (first.value, 1)
+        assert everything == topic
+        assert topic.last_modified.tzinfo is not None
+
+        asyncio.run(db.del_entry(first))
+
+        assert asyncio.run(db.get_topic_version(TopicName("baslik"))) != topic
+        assert asyncio.run(db.get_entries_version()) != everything
+        assert asyncio.run(db.get_author_version(AuthorName("yazar"))).entry_count == 0
+
+
+class TestTopicSearch:
+    @pytest.fixture
+    def db(self, db):
+        for i, topic in enumerate(["ışık", "ışıklar", "kış ışığı", "iş", "ab"]):
+            asyncio.run(db.add_entry(sketch(topic=topic, text=f"girdi {i}")))
+        return db
+
+    def test_substring(self, db):
+        assert asyncio.run(db.topic_search_basic("ışığ")) == ["kış ışığı"]
+
+    def test_prefix_first(self, db):
+        assert asyncio.run(db.topic_search_basic("ış")) == [
+            "ışık",
+            "ışıklar",
+            "kış ışığı",
+        ]
+
+    def test_turkish_folding(self, db):
+        assert asyncio.run(db.topic_search_basic("IŞIK")) == ["ışık", "ışıklar"]
+        assert asyncio.run(db.topic_search_basic("İŞ")) == ["iş"]
+
+    def test_limit_offset(self, db):
+        assert asyncio.run(db.topic_search_basic("ış", limit=1, offset=1)) == [
+            "ışıklar"
+        ]
+
+    def test_short_query(self, db):
+        assert asyncio.run(db.topic_search_basic("ab")) == ["ab"]
+
+    def test_wildcards_are_literal(self, db):
+        assert asyncio.run(db.topic_search_basic("%")) == []
+
+    def test_deleted_topic(self, db):
+        for topic in ["ışık", "ab"]:
+            (entry,) = asyncio.run(db.get_topic(TopicName(topic)))
+            asyncio.run(db.del_entry(entry.identifier))
+
+        assert asyncio.run(db.topic_search_basic("ışık")) == ["ışıklar"]
+        assert asyncio.run(db.topic_search_basic("ab")) == []
+
+    def test_index_built_for_existing_topics(self, db):
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql("DROP TABLE topics_search")
+
+        db.migrate()
+
+        assert db.has_search_index
+        assert asyncio.run(db.topic_search_basic("ışık")) == ["ışık", "ışıklar"]
+
+
+class TestEntryPages:
+    @pytest.fixture
+    def entry_ids(self, db):
+        ids = []
+        for i in range(7):
+            _, entry_id = asyncio.run(db.add_entry(sketch(text=f"girdi {i}")))
+            ids.append(entry_id)
+            asyncio.run(db.add_entry(sketch(topic="baska", text=f"girdi {i}")))
+        return ids
+
+    def ids(self, page):
+        return [entry.identifier for entry in page.entries]
+
+    def test_first_page(self, db, entry_ids):
+        page = asyncio.run(db.get_topic_page(TopicName("baslik"), limit=3))
+        assert self.ids(page) == entry_ids[:3]
+        assert not page.has_previous
+        assert page.has_next
+
+    def test_after(self, db, entry_ids):
+        page = asyncio.run(
+            db.get_topic_page(TopicName("baslik"), after=entry_ids[2], limit=3)
+        )
+        assert self.ids(page) == entry_ids[3:6]
+        assert page.has_previous
+        assert page.has_next
+
+    def test_last_page(self, db, entry_ids):
+        page = asyncio.run(
+            db.get_topic_page(TopicName("baslik"), after=entry_ids[5], limit=3)
+        )
+        assert self.ids(page) == entry_ids[6:]
+        assert page.has_previous
+        assert not page.has_next
+
+    def test_before(self, db, entry_ids):
+        page = asyncio.run(
+            db.get_topic_page(TopicName("baslik"), before=entry_ids[4], limit=3)
+        )
+        assert self.ids(page) == entry_ids[1:4]
+        assert page.has_previous
+        assert page.has_next
+
+    def test_past_the_end(self, db, entry_ids):
+        page = asyncio.run(
+            db.get_topic_page(TopicName("baslik"), after=entry_ids[6], limit=3)
+        )
+        assert page.entries == []
+        assert page.has_previous
+        assert not page.has_next
+
+    def test_author_page(self, db, entry_ids):
+        page = asyncio.run(db.get_author_page(AuthorName("yazar"), limit=20))
+        assert len(page.entries) == 14
+        assert not page.has_previous
+        assert not page.has_next
+
+
+class TestLatest:
+    @pytest.fixture
+    def entry_ids(self, db):
+        return [
+            asyncio.run(db.add_entry(sketch(topic=topic, author=author, text=text)))[1]
+            for topic, author, text in [
+                ("bir", "ali", "a"),
+                ("iki", "veli", "b"),
+                ("bir", "veli", "c"),
+                ("uc", "ali", "d"),
+            ]
+        ]
+
+    def test_latest_topics(self, db, entry_ids):
+        assert asyncio.run(db.get_latest_topics()) == ["uc", "bir", "iki"]
+        assert asyncio.run(db.get_latest_topics(limit=1, offset=1)) == ["bir"]
+
+    def test_latest_authors(self, db, entry_ids):
+        assert asyncio.run(db.get_latest_authors()) == ["ali", "veli"]
+
+    def test_after_deletion(self, db, entry_ids):
+        asyncio.run(db.del_entry(entry_ids[2]))
+        asyncio.run(db.del_entry(entry_ids[3]))
+
+        assert asyncio.run(db.get_latest_topics()) == ["iki", "bir"]
+        assert asyncio.run(db.get_latest_authors()) == ["veli", "ali"]
+
+    def test_filled_for_existing_entries(self, db, entry_ids):
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql("DROP TABLE topic_activity")
+            connection.exec_driver_sql("DROP TABLE author_activity")
+
+        db.migrate()
+
+        assert asyncio.run(db.get_latest_topics()) == ["uc", "bir", "iki"]
+        assert asyncio.run(db.get_latest_authors()) == ["ali", "veli"]
+
+
+class TestCounters:
+    def counts(self, db):
+        async def run():
+            return await db.entry_count, await db.topic_count, await db.author_count
+
+        return asyncio.run(run())
+
+    def real_counts(self, db):
+        with db.engine.connect() as connection:
+            return tuple(
+                connection.exec_driver_sql(f"SELECT count(*) FROM {table}").scalar()
+                for table in ("entries", "topics", "authors")
+            )
+
+    def test_empty(self, db):
+        assert self.counts(db) == (0, 0, 0)
+
+    def test_add_and_delete(self, db):
+        _, first = asyncio.run(db.add_entry(sketch(text="a")))
+        asyncio.run(db.add_entry(sketch(text="b")))
+        _, other = asyncio.run(
+            db.add_entry(sketch(topic="baska", author="o", text="c"))
+        )
+        assert self.counts(db) == (3, 2, 2)
+
+        asyncio.run(db.del_entry(first))
+        assert self.counts(db) == (2, 2, 2)
+
+        asyncio.run(db.del_entry(other))
+        assert self.counts(db) == (1, 1, 1)
+
+    def test_recount(self, db):
+        asyncio.run(db.add_entry(sketch()))
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql("UPDATE counters SET value = 42")
+
+        db.recount()
+
+        assert self.counts(db) == (1, 1, 1)
+
+    def test_data_version(self, db, tmp_path):
+        versions = [asyncio.run(db.get_data_version())]
+
+        _, entry_id = asyncio.run(db.add_entry(sketch()))
+        versions.append(asyncio.run(db.get_data_version()))
+        asyncio.run(db.add_entry(sketch()))
+        versions.append(asyncio.run(db.get_data_version()))
+        asyncio.run(db.add_entries([sketch(text="a"), sketch(text="b")]))
+        versions.append(asyncio.run(db.get_data_version()))
+        asyncio.run(db.del_entry(entry_id))
+        versions.append(asyncio.run(db.get_data_version()))
+
+        assert versions == [0, 1, 1, 2, 3]
+
+    def test_data_version_added_to_older_database(self, db, tmp_path):
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql(
+                "DELETE FROM counters WHERE name = 'data_version'"
+            )
+
+        db = open_storage(f"sqlite:///{tmp_path / 'sozluk.sqlite'}")
+
+        assert asyncio.run(db.get_data_version()) == 0
+
+    def test_concurrent_writes(self, tmp_path):
+        db = open_storage(f"threaded+sqlite:///{tmp_path / 'sozluk.sqlite'}")
+
+        async def writer(worker: int):
+            for i in range(10):
+                _, entry_id = await db.add_entry(
+                    sketch(topic=f"baslik {worker} {i}", author=f"yazar{worker}")
+                )
+                if i % 3 == 0:
+                    await db.del_entry(entry_id)
+
+        async def run():
+            await asyncio.gather(*(writer(worker) for worker in range(8)))
+
+        asyncio.run(run())
+
+        assert self.counts(db) == self.real_counts(db) == (48, 48, 8)
+
+    def test_concurrent_new_topic(self, tmp_path):
+        db = open_storage(f"threaded+sqlite:///{tmp_path / 'sozluk.sqlite'}")
+
+        async def run():
+            return await asyncio.gather(
+                *(
+                    db.add_entry(sketch(author=f"yazar{i}", text=f"girdi {i}"))
+                    for i in range(20)
+                )
+            )
+
+        results = asyncio.run(run())
+
+        assert {result for result, _ in results} == {EntryAddResponse.SUCCESS}
+        assert self.counts(db) == self.real_counts(db) == (20, 1, 20)
+
+
+class TestOrphans:
+    def names(self, db):
+        with db.engine.connect() as connection:
+            return tuple(
+                {
+                    name
+                    for name, in connection.exec_driver_sql(f"SELECT name FROM {table}")
+                }
+                for table in ("topics", "authors")
+            )
+
+    def test_last_entry(self, db):
+        asyncio.run(db.add_entry(sketch()))
+        _, entry_id = asyncio.run(db.add_entry(sketch(topic="tek", author="biri")))
+
+        asyncio.run(db.del_entry(entry_id))
+
+        assert self.names(db) == ({"baslik"}, {"yazar"})
+
+    def test_not_last_entry(self, db):
+        _, entry_id = asyncio.run(db.add_entry(sketch(text="a")))
+        asyncio.run(db.add_entry(sketch(text="b")))
+
+        asyncio.run(db.del_entry(entry_id))
+
+        assert self.names(db) == ({"baslik"}, {"yazar"})
+
+    def test_several_in_one_flush(self, db):
+        asyncio.run(
+            db.add_entries(
+                [
+                    sketch(topic="a", author="x", text="1"),
+                    sketch(topic="a", author="y", text="2"),
+                    sketch(topic="b", author="y", text="3"),
+                    sketch(topic="c", author="z", text="4"),
+                ]
+            )
+        )
+
+        with db.Session() as session:
+            for entry_id in (1, 2, 4):
+                session.delete(session.get(SQLAlchemyEntry, entry_id))
+            session.commit()
+
+        assert self.names(db) == ({"b"}, {"y"})
+        assert asyncio.run(db.topic_count) == 1
+        assert asyncio.run(db.author_count) == 1
+
+    def test_other_orphans_are_left_alone(self, db):
+        _, entry_id = asyncio.run(db.add_entry(sketch()))
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql("INSERT INTO topics (name) VALUES ('bos')")
+
+        asyncio.run(db.del_entry(entry_id))
+
+        assert self.names(db) == ({"bos"}, set())
+
+
+class TestEdgeEntries:
+    def test_empty(self, db):
+        assert asyncio.run(db.get_first_entry()) is None
+        assert asyncio.run(db.get_last_entry()) is None
+
+    def test_first_and_last(self, db):
+        ids = [
+            asyncio.run(db.add_entry(sketch(topic=topic, text=topic)))[1]
+            for topic in ["bir", "iki", "uc"]
+        ]
+
+        assert asyncio.run(db.get_first_entry()).identifier == ids[0]
+        assert asyncio.run(db.get_last_entry()).identifier == ids[-1]
+
+
+class TestRandomEntries:
+    def test_empty(self, db):
+        assert asyncio.run(db.get_random_entries()) == []
+
+    def test_fewer_entries_than_limit(self, db):
+        for i in range(3):
+            asyncio.run(db.add_entry(sketch(text=f"girdi {i}")))
+
+        assert len(asyncio.run(db.get_random_entries(limit=10))) == 3
+
+    def test_distinct_with_gaps(self, db):
+        ids = [
+            asyncio.run(db.add_entry(sketch(text=f"girdi {i}")))[1] for i in range(60)
+        ]
+        for entry_id in ids[5:50]:
+            asyncio.run(db.del_entry(entry_id))
+
+        for _ in range(20):
+            entries = asyncio.run(db.get_random_entries(limit=10))
+            sampled = [entry.identifier for entry in entries]
+
+            assert len(sampled) == len(set(sampled)) == 10
+            assert set(sampled) <= set(ids[:5] + ids[50:])
+
+
+class TestDefinitionUniqueness:
+    def test_whitespace_does_not_matter(self, db):
+        asyncio.run(db.add_entry(sketch(text="bir iki\nuc")))
+        result, _ = asyncio.run(db.add_entry(sketch(text="bir  iki uc")))
+        assert result == EntryAddResponse.DEFINITION_EXISTS
+
+    def test_same_text_other_topic(self, db):
+        asyncio.run(db.add_entry(sketch()))
+        result, _ = asyncio.run(db.add_entry(sketch(topic="baska")))
+        assert result == EntryAddResponse.SUCCESS
+
+    def test_duplicate_leaves_nothing_behind(self, db):
+        asyncio.run(db.add_entry(sketch()))
+        asyncio.run(db.add_entry(sketch(author="yeni")))
+
+        assert asyncio.run(db.get_latest_authors()) == ["yazar"]
+        assert asyncio.run(db.author_count) == 1
+        assert asyncio.run(db.entry_count) == 1
+
+    def test_migrate_older_database(self, db):
+        for text in ["a", "b", "c"]:
+            asyncio.run(db.add_entry(sketch(text=text)))
+
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql("DROP INDEX ux_entries_topic_name_text_hash")
+            connection.exec_driver_sql("DROP INDEX ix_entries_topic_name")
+            connection.exec_driver_sql("ALTER TABLE entries DROP COLUMN text_hash")
+            # a duplicate stored before definitions were unique
+            connection.exec_driver_sql(
+                "INSERT INTO entries (topic_name, author_name, utc_time, text)"
+                " SELECT topic_name, author_name, utc_time, text FROM entries"
+                " WHERE text = 'a'"
+            )
+
+        db.migrate()
+
+        with db.engine.connect() as connection:
+            assert connection.exec_driver_sql(
+                "SELECT id FROM entries WHERE text_hash IS NULL"
+            ).all() == [(4,)]
+            indexes = {
+                index["name"]
+                for index in sqlalchemy.inspect(connection).get_indexes("entries")
+            }
+        assert {"ux_entries_topic_name_text_hash", "ix_entries_topic_name"} <= indexes
+
+        result, _ = asyncio.run(db.add_entry(sketch(text="b")))
+        assert result == EntryAddResponse.DEFINITION_EXISTS
@@ -32,3 +32,9 @@ class TestTurkishLowercasedString:
         s = TurkishLowercasedString(given)
 
         assert s == expected
+
+    def test_trusted_is_taken_as_is(self):
+        s = TurkishLowercasedString.trusted("Işık")
+
+        assert type(s) is TurkishLowercasedString
+        assert s == "Işık"